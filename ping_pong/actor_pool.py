@@ -0,0 +1,383 @@
+import multiprocessing as mp
+import queue
+import time
+import numpy as np
+import torch
+from brain import Agent, BallAgent, build_network, load_network, select_actions
+from env import VecPongEnv
+from exploration import Exploration, ExponentialSchedule
+from inference import export_checked
+from nstep import NStepBuffer
+from league import LATEST, batched_q_values, learner_won
+from shm import TransitionRing, SharedWeights, STATE, ACTION, REWARD, NEXT_STATE, DONE, DISCOUNT, WHO, WHO_CODES
+
+# Pool di attori multi-processo: K processi worker giocano ognuno le proprie partite (con VecPongEnv)
+# usando una copia dei pesi di Agent.brain / BallAgent.brain, e mandano le esperienze al processo
+# principale che le mette nella memoria dell'agente che sta imparando. Ogni tanto il processo principale
+# rimanda ai worker i pesi aggiornati. Così la raccolta dei dati usa tutti i core e non uno solo.
+# Esperienze e pesi passano dalla memoria condivisa (shm.py): niente pickle, che con tanti worker
+# diventava il collo di bottiglia del processo principale. transport='queue' usa ancora multiprocessing.Queue.
+
+CHUNK_STEPS = 32 # quanti frame accumula un worker prima di spedire le esperienze
+TRANSPORTS = ('shm', 'queue') # memoria condivisa (shm.py) oppure multiprocessing.Queue con pickle
+
+
+def _send(transitions, ring, stop, gammas, packet):
+    # se il processo principale è indietro la coda / l'anello è pieno e il worker aspetta (back-pressure)
+    if ring is not None:
+        who, states, actions, rewards, next_states, dones, discounts = packet
+        if discounts is None:
+            discounts = np.full(len(actions), gammas[who], dtype=np.float32)
+        ring.write(who, states, actions, rewards, next_states, dones, discounts, stop)
+        return
+    while not stop.is_set():
+        try:
+            transitions.put(packet, timeout=0.1)
+            break
+        except queue.Full:
+            pass
+
+
+def _worker(worker_id, num_envs, seed, transitions, weights, stop, inference='float', n_steps=None,
+            ring=None, shared=None, networks=None, results=None):
+    torch.set_num_threads(1) # ogni worker usa un solo core, il parallelismo lo danno i processi
+    torch.manual_seed(seed)
+
+    # finestre dei ritorni a n passi: n_steps = {'PADDLE': (n, gamma), 'BALL': (n, gamma)}
+    n_steps = n_steps or {'PADDLE': (1, 0.99), 'BALL': (1, 0.99)}
+    windows = {who: NStepBuffer(n, gamma, num_envs, 5 if who == 'PADDLE' else 6) if n > 1 else None
+               for who, (n, gamma) in n_steps.items()}
+    gammas = {who: gamma for who, (_, gamma) in n_steps.items()}
+    last_who = None
+    # lega: per ogni partita la versione avversaria (LATEST = rete attuale), arriva con i pesi a ogni cambio di turno
+    league = None
+    templates = {'PADDLE': build_network(5, 3, networks['PADDLE']).requires_grad_(False),
+                 'BALL': build_network(6, 7, networks['BALL']).requires_grad_(False)}
+
+    if shared is not None:
+        # con la memoria condivisa i parametri delle reti float sono viste sullo slot attivo (vedi shm.py)
+        float_nets = {'PADDLE': build_network(5, 3, networks['PADDLE']).requires_grad_(False),
+                      'BALL': build_network(6, 7, networks['BALL']).requires_grad_(False)}
+        seen = {'PADDLE': 0, 'BALL': 0}
+        nets = {}
+
+    # aspetto i primi pesi prima di iniziare a giocare
+    msg = None
+    while msg is None and not stop.is_set():
+        try:
+            msg = weights.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    if msg is None:
+        return
+
+    env = VecPongEnv(num_envs, seed=seed)
+    obs_p, obs_b = env.reset()
+
+    while not stop.is_set():
+        # prendo sempre l'ultima versione dei pesi disponibile (le vecchie le salto)
+        try:
+            while True:
+                msg = weights.get_nowait()
+                if msg[4] is not None:
+                    league = msg[4] # gli avversari non si saltano anche se arrivano pesi più nuovi
+        except queue.Empty:
+            pass
+        paddle_sd, ball_sd, training_who, epsilon, opponents = msg
+        if opponents is not None:
+            league = opponents
+        if shared is not None:
+            for who in ('PADDLE', 'BALL'):
+                if shared[who].version != seen[who]:
+                    # scambio a caldo: sposto le viste sullo slot nuovo, senza copiare i pesi
+                    seen[who] = shared[who].bind(float_nets[who], worker_id)
+                    nets[who] = float_nets[who] if inference == 'float' else export_checked(float_nets[who], inference)
+            paddle_net, ball_net = nets['PADDLE'], nets['BALL']
+        elif paddle_sd is not None:
+            # l'architettura la ricavo dai pesi; per giocare uso la versione esportata (vedi inference.py)
+            paddle_net = export_checked(load_network(paddle_sd), inference)
+            ball_net = export_checked(load_network(ball_sd), inference)
+            msg = (None, None, training_who, epsilon, None) # non ricarico gli stessi pesi al prossimo giro
+
+        # cambio di turno: chi imparava chiude la sua finestra a n passi
+        if last_who is not None and last_who != training_who and windows[last_who] is not None:
+            out = windows[last_who].flush()
+            if out is not None:
+                _send(transitions, ring, stop, gammas, (last_who,) + out)
+        last_who = training_who
+
+        learner_dim = 5 if training_who == 'PADDLE' else 6
+        states = np.zeros((CHUNK_STEPS, num_envs, learner_dim), dtype=np.float32)
+        actions = np.zeros((CHUNK_STEPS, num_envs), dtype=np.int64)
+        rewards = np.zeros((CHUNK_STEPS, num_envs), dtype=np.float32)
+        next_states = np.zeros((CHUNK_STEPS, num_envs, learner_dim), dtype=np.float32)
+        dones = np.zeros((CHUNK_STEPS, num_envs), dtype=np.float32)
+        # partite che giocano contro una versione vecchia: (learner, id per partita, pesi impilati, slot per partita)
+        past = None
+        if league is not None and league[0] == training_who and (league[1] != LATEST).any():
+            past = league
+        played, won = [], []
+
+        for t in range(CHUNK_STEPS):
+            # solo chi sta imparando esplora, l'altro gioca in modalità inferenza
+            action_p = select_actions(paddle_net, obs_p, epsilon if training_who == 'PADDLE' else 0.0)
+            action_b = select_actions(ball_net, obs_b, epsilon if training_who == 'BALL' else 0.0)
+            if past is not None:
+                # un solo forward a batch per tutte le versioni avversarie di questo worker (vedi league.py)
+                _, ids, params, slots = past
+                mask = ids != LATEST
+                if training_who == 'PADDLE':
+                    action_b[mask] = batched_q_values(templates['BALL'], params, slots[mask], obs_b[mask]).argmax(1).numpy()
+                else:
+                    action_p[mask] = batched_q_values(templates['PADDLE'], params, slots[mask], obs_p[mask]).argmax(1).numpy()
+
+            next_p, next_b, reward_p, reward_b, done = env.step(action_p, action_b)
+            if past is not None and done.any():
+                played.append(past[1][done])
+                won.append(learner_won(training_who, env.goal_left[done]))
+
+            if training_who == 'PADDLE':
+                states[t], actions[t], rewards[t], next_states[t] = obs_p, action_p, reward_p, next_p
+            else:
+                states[t], actions[t], rewards[t], next_states[t] = obs_b, action_b, reward_b, next_b
+            dones[t] = done
+            obs_p, obs_b = next_p, next_b
+
+        if played and results is not None:
+            # risultati dei punti contro le versioni vecchie: pochi numeri per pezzo, basta una coda normale
+            results.put((training_who, np.concatenate(played), np.concatenate(won)))
+
+        window = windows[training_who]
+        if window is None:
+            packet = (training_who,
+                      states.reshape(-1, learner_dim), actions.reshape(-1), rewards.reshape(-1),
+                      next_states.reshape(-1, learner_dim), dones.reshape(-1), None)
+        else:
+            # i frame del pezzo passano dalla finestra: escono (s, a, R_n, s_n, done, gamma^k) di n frame fa
+            out = [window.add(states[t], actions[t], rewards[t], next_states[t], dones[t]) for t in range(CHUNK_STEPS)]
+            out = [o for o in out if o is not None]
+            if not out:
+                continue
+            packet = (training_who,) + tuple(np.concatenate(column) for column in zip(*out))
+        _send(transitions, ring, stop, gammas, packet)
+
+
+class ActorPool:
+    def __init__(self, agent, ball_agent, num_workers=4, envs_per_worker=16, seed=0, max_pending=8, inference='float',
+                 transport='shm', drop_when_full=False):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Trasporto sconosciuto: {transport!r} (usa {', '.join(TRANSPORTS)})")
+        self.agent = agent
+        self.ball_agent = ball_agent
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.seed = seed
+        self.transport = transport
+
+        n_steps = {'PADDLE': (agent.n_step, agent.gamma), 'BALL': (ball_agent.n_step, ball_agent.gamma)}
+        ctx = mp.get_context('spawn')
+        self.weight_queues = [ctx.Queue() for _ in range(num_workers)] # con shm portano solo chi impara ed epsilon
+        self.stop_event = ctx.Event()
+        self.results = ctx.Queue() # risultati dei punti contro le versioni della lega (vedi league.py)
+        if transport == 'shm':
+            # un anello per worker (un solo scrittore), grande come max_pending pacchetti
+            capacity = max_pending * CHUNK_STEPS * envs_per_worker
+            self.rings = [TransitionRing(capacity, 'drop' if drop_when_full else 'block') for _ in range(num_workers)]
+            self.shared = {'PADDLE': SharedWeights.for_network(agent.brain, num_workers),
+                           'BALL': SharedWeights.for_network(ball_agent.brain, num_workers)}
+            self.transitions = None
+        else:
+            self.rings = [None] * num_workers
+            self.shared = None
+            self.transitions = ctx.Queue(maxsize=max_pending)
+        networks = {'PADDLE': agent.network, 'BALL': ball_agent.network}
+        self.processes = [
+            ctx.Process(target=_worker,
+                        args=(i, envs_per_worker, seed + i, self.transitions, self.weight_queues[i], self.stop_event,
+                              inference, n_steps, self.rings[i], self.shared, networks, self.results),
+                        daemon=True)
+            for i in range(num_workers)
+        ]
+        self.collected = 0 # esperienze totali ricevute dai worker
+
+    def start(self, training_who='PADDLE', epsilon=1.0):
+        for p in self.processes:
+            p.start()
+        self.broadcast(training_who, epsilon)
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for p in self.processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        if self.transport == 'shm':
+            for block in self.rings + list(self.shared.values()):
+                block.close()
+
+    def broadcast(self, training_who, epsilon, league=None, opponents=None):
+        # mando a tutti i worker un'istantanea dei pesi attuali (sul processo principale girano i learner)
+        # epsilon può essere un numero oppure un array con un valore per partita (num_workers * envs_per_worker,
+        # es. LadderSchedule): in quel caso ogni worker riceve solo la sua fetta.
+        # opponents (solo al cambio di turno, con la lega): id della versione avversaria per ogni partita;
+        # ogni worker riceve i pesi impilati delle sole versioni che gli servono
+        if self.transport == 'shm':
+            # i pesi vanno nel blocco condiviso (se un worker usa ancora lo slot libero riprovo al prossimo giro)
+            self.shared['PADDLE'].publish(self.agent.brain)
+            self.shared['BALL'].publish(self.ball_agent.brain)
+            paddle_sd = ball_sd = None
+        else:
+            paddle_sd = {k: v.detach().clone() for k, v in self.agent.brain.state_dict().items()}
+            ball_sd = {k: v.detach().clone() for k, v in self.ball_agent.brain.state_dict().items()}
+        per_env = np.ndim(epsilon) > 0
+        for i, q in enumerate(self.weight_queues):
+            envs = slice(i * self.envs_per_worker, (i + 1) * self.envs_per_worker)
+            eps = epsilon[envs] if per_env else epsilon
+            q.put((paddle_sd, ball_sd, training_who, eps, self._opponents(training_who, league, opponents, envs)))
+
+    def _opponents(self, training_who, league, opponents, envs):
+        if opponents is None:
+            return None
+        ids = np.asarray(opponents[envs])
+        pool = league.pools[league.opponent_of(training_who)]
+        slots = pool.slots(ids)
+        used = np.unique(slots[ids != LATEST])
+        # slot del pool -> riga dei pesi spediti (le partite contro LATEST restano a -1)
+        rows = np.where(ids != LATEST, np.searchsorted(used, slots), -1)
+        return (training_who, ids, pool.params[used].clone(), rows)
+
+    def collect_results(self):
+        # risultati arrivati dai worker: [(learner, id avversari, vinto da chi impara), ...]
+        out = []
+        try:
+            while True:
+                out.append(self.results.get_nowait())
+        except queue.Empty:
+            pass
+        return out
+
+    def collect(self, max_packets=None, timeout=0.0):
+        # svuoto la coda (o gli anelli) e metto le esperienze nella memoria dell'agente giusto, restituisco quante sono
+        if self.transport == 'shm':
+            return self._collect_rings(timeout)
+        count = 0
+        packets = 0
+        block = timeout > 0 # aspetto al massimo timeout secondi solo per il primo pacchetto
+        while max_packets is None or packets < max_packets:
+            try:
+                packet = self.transitions.get(timeout=timeout) if block else self.transitions.get_nowait()
+            except queue.Empty:
+                break
+            block = False
+            training_who, states, actions, rewards, next_states, dones, discounts = packet
+            target = self.agent if training_who == 'PADDLE' else self.ball_agent
+            target.memory.push_batch(states, actions, rewards, next_states, dones, discounts)
+            count += len(actions)
+            packets += 1
+        self.collected += count
+        return count
+
+    def _collect_rings(self, timeout=0.0):
+        deadline = time.perf_counter() + timeout
+        count = 0
+        while True:
+            for ring in self.rings:
+                # al massimo due viste per anello: fino alla fine del buffer e poi dall'inizio
+                for _ in range(2):
+                    records = ring.peek()
+                    if len(records) == 0:
+                        break
+                    # copia diretta dalla memoria condivisa alla memoria dell'agente, senza pickle
+                    for who, agent, dim in (('PADDLE', self.agent, 5), ('BALL', self.ball_agent, 6)):
+                        rows = records[records[:, WHO] == WHO_CODES[who]]
+                        if len(rows):
+                            agent.memory.push_batch(rows[:, STATE:STATE + dim], rows[:, ACTION].astype(np.int64),
+                                                    rows[:, REWARD], rows[:, NEXT_STATE:NEXT_STATE + dim],
+                                                    rows[:, DONE], rows[:, DISCOUNT])
+                    ring.advance(len(records))
+                    count += len(records)
+            if count or time.perf_counter() >= deadline:
+                break
+            time.sleep(0.0005)
+        self.collected += count
+        return count
+
+    def transport_stats(self):
+        # back-pressure e scarti degli anelli, pesi pubblicati e saltati (solo con transport='shm')
+        if self.transport != 'shm':
+            return {'transport': self.transport, 'collected': self.collected}
+        rings = {}
+        for ring in self.rings:
+            for key, value in ring.stats().items():
+                rings[key] = rings.get(key, 0) + value
+        return {'transport': self.transport, 'collected': self.collected, 'rings': rings,
+                'weights': {who.lower(): shared.stats() for who, shared in self.shared.items()}}
+
+
+def train_with_pool(agent, ball_agent, total_frames, num_workers=4, envs_per_worker=16,
+                    swap_interval=10000, updates_per_step=0.25, broadcast_every=100,
+                    epsilon=1.0, epsilon_min=0.05, epsilon_decay=0.999999, seed=0,
+                    paddle_exploration=None, ball_exploration=None, inference='float', transport='shm',
+                    drop_when_full=False, league=None):
+    # stesso schema di game_loop() (addestramento alternato ogni swap_interval frame) ma con i dati
+    # raccolti in parallelo dai worker; i frame contati sono le esperienze totali di tutte le partite
+    # l'orologio 'steps' di ogni agente avanza con le esperienze raccolte nel suo turno (vedi exploration.py)
+    paddle_exploration = paddle_exploration or Exploration(ExponentialSchedule(epsilon, epsilon_min, epsilon_decay))
+    ball_exploration = ball_exploration or Exploration(ExponentialSchedule(epsilon, epsilon_min, epsilon_decay))
+    pool = ActorPool(agent, ball_agent, num_workers, envs_per_worker, seed, inference=inference,
+                     transport=transport, drop_when_full=drop_when_full).start('PADDLE', paddle_exploration.value(agent))
+    frames = 0
+    turn = 0
+    updates = 0
+    last_broadcast = 0
+    try:
+        while frames < total_frames:
+            new = pool.collect(timeout=0.1)
+            if new == 0:
+                continue
+            frames += new
+
+            learner = agent if turn % 2 == 0 else ball_agent
+            exploration = paddle_exploration if turn % 2 == 0 else ball_exploration
+            exploration.tick(new)
+            target_updates = int(frames * updates_per_step)
+            while updates < target_updates and len(learner.memory) >= learner.batch_size:
+                learner.train_step()
+                updates += 1
+
+            if league is not None:
+                for who, ids, won in pool.collect_results():
+                    league.record(who, ids, won)
+
+            # cambio di turno: chi imparava ora gioca in inferenza e viceversa
+            if frames // swap_interval != turn:
+                if league is not None:
+                    # la versione di chi ha appena finito il turno entra nel pool degli avversari
+                    league.snapshot('PADDLE' if turn % 2 == 0 else 'BALL', learner.brain, frames)
+                turn = frames // swap_interval
+                exploration, learner = (paddle_exploration, agent) if turn % 2 == 0 else (ball_exploration, ball_agent)
+                who = 'PADDLE' if turn % 2 == 0 else 'BALL'
+                opponents = league.opponents(who, num_workers * envs_per_worker) if league is not None else None
+                pool.broadcast(who, exploration.value(learner), league, opponents)
+                last_broadcast = updates
+            elif updates - last_broadcast >= broadcast_every:
+                pool.broadcast('PADDLE' if turn % 2 == 0 else 'BALL', exploration.value(learner))
+                last_broadcast = updates
+    finally:
+        stats = pool.transport_stats()
+        pool.stop()
+    if transport == 'shm':
+        rings, weights = stats['rings'], stats['weights']
+        print(f"📦 Trasporto shm: {rings['read']} esperienze | attese worker: {rings['waits']} | scartate: {rings['dropped']} | "
+              f"pesi pubblicati: {weights['paddle']['published'] + weights['ball']['published']} "
+              f"(saltati: {weights['paddle']['skipped'] + weights['ball']['skipped']})")
+    return frames, updates
+
+
+if __name__ == '__main__':
+    paddle = Agent(5, 3, memory_size=1000000)
+    ball = BallAgent(6, 7, memory_size=1000000)
+    start = time.time()
+    frames, updates = train_with_pool(paddle, ball, total_frames=2000000, num_workers=max(1, mp.cpu_count() - 1))
+    print(f"📊 Frames: {frames} | Updates: {updates} | FPS: {frames / (time.time() - start):.0f}")
@@ -0,0 +1,101 @@
+import argparse
+import random
+import sys
+import game
+import game_fused
+
+# Backend della fisica e delle reward per la partita singola (Trainer, server, train.py), scelto all'avvio:
+#   'python' -> game.py, il riferimento leggibile
+#   'fused'  -> game_fused.py, stessa logica con variabili locali e funzioni inline (più veloce)
+# Per molte partite in parallelo la formulazione NumPy è VecPongEnv (env.py): con una sola partita
+# il costo fisso di ogni operazione NumPy la renderebbe più lenta del Python puro, quindi non è un backend qui.
+#
+# Controllo di equivalenza (da lanciare dopo ogni modifica a game.py o game_fused.py):
+#   python backends.py --frames 500000
+
+BACKENDS = {
+    'python': game,
+    'fused': game_fused,
+}
+
+FUNCTIONS = ('move_ball_x', 'steer_ball', 'physics', 'calculate_reward', 'calculate_reward_ball')
+
+
+def get_backend(name):
+    # ritorna il modulo con le funzioni in FUNCTIONS (stesse firme di game.py)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend sconosciuto: {name!r} (disponibili: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
+
+
+def check_equivalence(name, frames=100000, seed=0, reference='python'):
+    # gioca la stessa partita con due backend (stesse azioni, stessi reset) e confronta
+    # stato di gioco e reward dopo ogni funzione; ritorna la lista delle differenze trovate
+    ref, other = get_backend(reference), get_backend(name)
+    rng = random.Random(seed)
+    state_ref, state_other = game.new_game_state(), game.new_game_state()
+    mismatches = []
+
+    def compare(frame, stage, out_ref=None, out_other=None):
+        # confronto esatto (==) e anche del tipo, così un int diventato float non passa inosservato
+        same = state_ref == state_other and out_ref == out_other
+        same = same and all(type(state_ref[k]) is type(state_other[k]) for k in state_ref)
+        if not same:
+            mismatches.append({'frame': frame, 'stage': stage, 'reference': (dict(state_ref), out_ref),
+                               'backend': (dict(state_other), out_other)})
+
+    for frame in range(frames):
+        # paddle quasi sempre scriptato (così ci sono scambi lunghi e rimbalzi sui paddle), a volte casuale
+        action = game.scripted_paddle_action(state_ref) if rng.random() < 0.8 else rng.randint(0, 2)
+        action_ball = rng.randint(0, 6)
+        for module, state in ((ref, state_ref), (other, state_other)):
+            module.move_ball_x(state)
+            module.steer_ball(state, action_ball)
+        compare(frame, 'steer_ball')
+
+        # il reset dopo un gol usa il modulo random: stessa sequenza per i due backend
+        rng_state = random.getstate()
+        out_ref = ref.calculate_reward_ball(state_ref, action_ball)
+        random.setstate(rng_state)
+        out_other = other.calculate_reward_ball(state_other, action_ball)
+        compare(frame, 'calculate_reward_ball', out_ref, out_other)
+
+        ref.physics(state_ref, action)
+        other.physics(state_other, action)
+        compare(frame, 'physics')
+
+        rng_state = random.getstate()
+        out_ref = ref.calculate_reward(state_ref)
+        random.setstate(rng_state)
+        out_other = other.calculate_reward(state_other)
+        compare(frame, 'calculate_reward', out_ref, out_other)
+
+        if mismatches:
+            break # dopo la prima differenza le due partite divergono, inutile continuare
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica che i backend diano reward e traiettorie identiche a game.py")
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--seed', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--backend', nargs='+', default=[b for b in BACKENDS if b != 'python'])
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.backend:
+        for seed in args.seed:
+            mismatches = check_equivalence(name, args.frames, seed)
+            if mismatches:
+                failed = True
+                m = mismatches[0]
+                print(f"❌ {name} (seed {seed}): diverso al frame {m['frame']} dopo {m['stage']}")
+                print(f"   riferimento: {m['reference']}")
+                print(f"   {name}: {m['backend']}")
+            else:
+                print(f"✅ {name} (seed {seed}): identico per {args.frames} frame")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import numpy as np
+import torch
+from brain import Agent, BallAgent
+from inference import INFERENCE_MODES
+from env import VecPongEnv
+from game import (new_game_state, reset_game, move_ball_x, steer_ball, physics,
+                  get_state_array_paddle, get_state_array_ball, WIDTH)
+from backends import BACKENDS
+
+# Benchmark riproducibili, uno per ogni pezzo del game loop, così si vede quale parte rallenta:
+#   python benchmark.py --out bench.json
+#   python benchmark.py --quick --only physics reward
+# Ogni misura viene ripetuta --repeat volte e si salva la mediana (più stabile del singolo giro).
+# I risultati finiscono in un JSON con versione del codice e dell'ambiente per confrontare le run nel tempo.
+
+SEED = 0
+
+
+def seed_everything(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def timeit(fn, number, repeat):
+    # restituisce i secondi per chiamata (mediana sulle ripetizioni)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(number)
+        times.append((time.perf_counter() - start) / number)
+    return statistics.median(times)
+
+
+def sample_game_states(count):
+    # stati di gioco "realistici" ottenuti giocando a caso, da usare come input dei benchmark delle reward
+    seed_everything()
+    game_state = new_game_state()
+    states = []
+    for _ in range(count):
+        move_ball_x(game_state)
+        steer_ball(game_state, random.randint(0, 6))
+        physics(game_state, random.randint(0, 2))
+        if game_state['ballX'] < 0 or game_state['ballX'] > WIDTH:
+            reset_game(game_state)
+        states.append(dict(game_state))
+    return states
+
+
+def bench_physics(args):
+    results = []
+    for backend_name, backend in BACKENDS.items():
+        seed_everything()
+        game_state = new_game_state()
+        actions = [(random.randint(0, 2), random.randint(0, 6)) for _ in range(args.number)]
+
+        def run(n):
+            for action, action_ball in actions[:n]:
+                backend.move_ball_x(game_state)
+                backend.steer_ball(game_state, action_ball)
+                backend.physics(game_state, action)
+                if game_state['ballX'] < 0 or game_state['ballX'] > WIDTH:
+                    reset_game(game_state)
+
+        per_call = timeit(run, args.number, args.repeat)
+        results.append({'name': f'physics.{backend_name}', 'unit': 'steps/s', 'value': 1.0 / per_call,
+                        'params': {'backend': backend_name}})
+
+    env = VecPongEnv(args.batch, seed=SEED)
+    env.reset()
+    rng = np.random.default_rng(SEED)
+    paddle_actions = rng.integers(0, 3, args.batch)
+    ball_actions = rng.integers(0, 7, args.batch)
+
+    def run_vec(n):
+        for _ in range(n):
+            env.step(paddle_actions, ball_actions)
+
+    per_call = timeit(run_vec, max(1, args.number // 100), args.repeat)
+    results.append({'name': 'physics.vectorized', 'unit': 'env-steps/s', 'value': args.batch / per_call,
+                    'params': {'num_envs': args.batch}})
+    return results
+
+
+def bench_reward(args):
+    states = sample_game_states(args.number)
+    results = []
+    stages = []
+    for backend_name, backend in BACKENDS.items():
+        stages.append((f'reward.paddle.{backend_name}', backend.calculate_reward))
+        stages.append((f'reward.ball.{backend_name}', lambda gs, backend=backend: backend.calculate_reward_ball(gs, 3)))
+    for name, fn in stages:
+        def run(n):
+            # lavoro su copie perché le reward modificano lo stato (reset, contatori)
+            copies = [dict(gs) for gs in states[:n]]
+            start = time.perf_counter()
+            for gs in copies:
+                fn(gs)
+            run.elapsed += time.perf_counter() - start
+        times = []
+        for _ in range(args.repeat):
+            run.elapsed = 0.0
+            run(args.number)
+            times.append(run.elapsed / args.number)
+        results.append({'name': name, 'unit': 'us/call', 'value': statistics.median(times) * 1e6})
+    return results
+
+
+def bench_inference(args):
+    seed_everything()
+    results = []
+    states = sample_game_states(args.batch)
+    for label, agent, to_array in (('paddle', Agent(5, 3), get_state_array_paddle),
+                                   ('ball', BallAgent(6, 7), get_state_array_ball)):
+        single = to_array(states[0])
+        batch = np.array([to_array(gs) for gs in states], dtype=np.float32)
+
+        per_call = timeit(lambda n: [agent.predict_action(single) for _ in range(n)], args.number // 10, args.repeat)
+        results.append({'name': f'inference.{label}.predict_action', 'unit': 'us/call', 'value': per_call * 1e6,
+                        'params': {'batch': 1}})
+        per_call = timeit(lambda n: [agent.get_action(single, 0.0) for _ in range(n)], args.number // 10, args.repeat)
+        results.append({'name': f'inference.{label}.get_action', 'unit': 'us/call', 'value': per_call * 1e6,
+                        'params': {'batch': 1}})
+        per_call = timeit(lambda n: [agent.predict_actions(batch) for _ in range(n)], max(1, args.number // 100), args.repeat)
+        results.append({'name': f'inference.{label}.predict_actions', 'unit': 'us/call', 'value': per_call * 1e6,
+                        'params': {'batch': args.batch}})
+        results.append({'name': f'inference.{label}.predict_actions_per_state', 'unit': 'us/state',
+                        'value': per_call * 1e6 / args.batch, 'params': {'batch': args.batch}})
+
+        # stesse reti esportate per gli attori (vedi inference.py)
+        for mode in INFERENCE_MODES[1:]:
+            agent.inference = mode
+            agent.publish_actor()
+            per_call = timeit(lambda n: [agent.predict_action(single) for _ in range(n)], args.number // 10, args.repeat)
+            results.append({'name': f'inference.{label}.predict_action.{mode}', 'unit': 'us/call', 'value': per_call * 1e6,
+                            'params': {'batch': 1}})
+            per_call = timeit(lambda n: [agent.predict_actions(batch) for _ in range(n)], max(1, args.number // 100), args.repeat)
+            results.append({'name': f'inference.{label}.predict_actions.{mode}', 'unit': 'us/call', 'value': per_call * 1e6,
+                            'params': {'batch': args.batch}})
+    return results
+
+
+def _filled_agent(prioritized, size):
+    seed_everything()
+    agent = Agent(5, 3, memory_size=size, prioritized=prioritized, seed=SEED)
+    rng = np.random.default_rng(SEED)
+    agent.memory.push_batch(rng.random((size, 5), dtype=np.float32), rng.integers(0, 3, size),
+                            rng.standard_normal(size).astype(np.float32), rng.random((size, 5), dtype=np.float32),
+                            (rng.random(size) < 0.01).astype(np.float32))
+    return agent
+
+
+def bench_replay(args):
+    results = []
+    for prioritized in (False, True):
+        agent = _filled_agent(prioritized, args.memory)
+        label = 'prioritized' if prioritized else 'uniform'
+        per_call = timeit(lambda n: [agent.memory.sample(agent.batch_size) for _ in range(n)], args.number // 10, args.repeat)
+        results.append({'name': f'replay.{label}.sample', 'unit': 'us/call', 'value': per_call * 1e6,
+                        'params': {'size': args.memory, 'batch_size': agent.batch_size}})
+        state = np.zeros(5, dtype=np.float32)
+        per_call = timeit(lambda n: [agent.remember(state, 1, 0.0, state, False) for _ in range(n)], args.number // 10, args.repeat)
+        results.append({'name': f'replay.{label}.insert', 'unit': 'us/call', 'value': per_call * 1e6,
+                        'params': {'size': args.memory}})
+    return results
+
+
+def bench_train(args):
+    results = []
+    for prioritized in (False, True):
+        agent = _filled_agent(prioritized, args.memory)
+        label = 'prioritized' if prioritized else 'uniform'
+        per_call = timeit(lambda n: [agent.train_step() for _ in range(n)], max(1, args.number // 100), args.repeat)
+        results.append({'name': f'train.{label}.train_step', 'unit': 'updates/s', 'value': 1.0 / per_call,
+                        'params': {'batch_size': agent.batch_size}})
+    return results
+
+
+BENCHMARKS = {
+    'physics': bench_physics,
+    'reward': bench_reward,
+    'inference': bench_inference,
+    'replay': bench_replay,
+    'train': bench_train,
+}
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'torch': torch.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'torch_threads': torch.get_num_threads(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark di simulazione, reward, inferenza, memoria e training")
+    parser.add_argument('--out', default=None, help="file JSON dove salvare i risultati")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="esegui solo questi benchmark")
+    parser.add_argument('--number', type=int, default=20000, help="chiamate per misura (i pezzi lenti ne usano meno)")
+    parser.add_argument('--repeat', type=int, default=5, help="ripetizioni di ogni misura (si salva la mediana)")
+    parser.add_argument('--batch', type=int, default=1024, help="dimensione del batch N per inferenza e ambiente vettoriale")
+    parser.add_argument('--memory', type=int, default=100000, help="esperienze in memoria per i benchmark di replay/training")
+    parser.add_argument('--threads', type=int, default=1, help="thread di PyTorch (fisso per avere numeri confrontabili)")
+    parser.add_argument('--quick', action='store_true', help="misure corte, per un controllo veloce")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.number, args.repeat = 2000, 3
+
+    torch.set_num_threads(args.threads)
+    report = {'meta': environment_info(), 'config': vars(args), 'results': []}
+    for name in args.only or BENCHMARKS:
+        for result in BENCHMARKS[name](args):
+            report['results'].append(result)
+            print(f"{result['name']:<45} {result['value']:>14.2f} {result['unit']}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Risultati salvati in {args.out}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -3,40 +3,161 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 import random
-from collections import deque
+import copy
+from replay import ReplayBuffer, PrioritizedReplayBuffer
+
+# Architetture disponibili per Agent / BallAgent (network='nome' oppure un dizionario con le stesse chiavi)
+#   hidden      neuroni di ogni layer nascosto
+#   dueling     testa dueling: Q = V(s) + A(s, a) - media(A), separa "quanto è buona la situazione" dall'azione
+#   layer_norm  LayerNorm dopo ogni layer nascosto (aiuta con input su scale diverse: posizioni vs velocità)
+NETWORKS = {
+    'default': {'hidden': [128, 64], 'dueling': False, 'layer_norm': False}, # la rete originale
+    'tiny': {'hidden': [64, 32], 'dueling': False, 'layer_norm': False}, # attori più veloci sulla CPU
+    'wide': {'hidden': [256, 256], 'dueling': False, 'layer_norm': False},
+    'deep': {'hidden': [256, 128, 64], 'dueling': False, 'layer_norm': False},
+    'dueling': {'hidden': [128, 64], 'dueling': True, 'layer_norm': False},
+    'dueling_ln': {'hidden': [256, 128], 'dueling': True, 'layer_norm': True},
+}
+
+def network_config(network='default'):
+    # nome del registro oppure dizionario (le chiavi mancanti prendono i valori di 'default')
+    if isinstance(network, str):
+        if network not in NETWORKS:
+            raise ValueError(f"Rete sconosciuta: {network!r} (disponibili: {', '.join(NETWORKS)})")
+        network = NETWORKS[network]
+    config = dict(NETWORKS['default'])
+    config.update(network)
+    config['hidden'] = list(config['hidden'])
+    return config
 
 class DQN(nn.Module):
-    def __init__(self, input_dim, output_dim): # serve per definire la struttura della rete
+    def __init__(self, input_dim, output_dim, hidden=(128, 64), dueling=False, layer_norm=False): # serve per definire la struttura della rete
         super(DQN, self).__init__()
-        self.fc1 = nn.Linear(input_dim, 128) # primo layer
-        self.fc2 = nn.Linear(128, 64) # secondo layer
-        self.fc3 = nn.Linear(64, output_dim) # layer di output
+        # i layer si chiamano fc1, fc2, ... come nella rete originale: i pesi già salvati si caricano ancora
+        self.hidden = []
+        self.norms = []
+        size = input_dim
+        for i, width in enumerate(hidden, 1):
+            self.add_module(f'fc{i}', nn.Linear(size, width))
+            self.hidden.append(getattr(self, f'fc{i}'))
+            if layer_norm:
+                self.add_module(f'ln{i}', nn.LayerNorm(width))
+                self.norms.append(getattr(self, f'ln{i}'))
+            size = width
+        self.dueling = dueling
+        if dueling:
+            self.value = nn.Linear(size, 1) # quanto vale lo stato
+            self.advantage = nn.Linear(size, output_dim) # quanto è meglio ogni azione rispetto alla media
+        else:
+            self.output = f'fc{len(hidden) + 1}'
+            self.add_module(self.output, nn.Linear(size, output_dim)) # layer di output
 
     def forward(self, x): # definisce il flusso dei dati attraverso la rete
-        x = F.relu(self.fc1(x)) # i dati che do in input passano per il primo layer e sono soggetti alla funzione di attivazione
-        x = F.relu(self.fc2(x)) # idem per i dati che escono dal secondo layer
-        x = self.fc3(x) # output dei layer
-        return x
-
-class Agent:
-    def __init__ (self, input_dim, action_dim):
-        self.brain = DQN(input_dim, action_dim) # creo il cervello del modello
-        self.optimizer = optim.Adam(self.brain.parameters(), lr=0.001) # va a imparare andando a minimizzare la loss
-        self.memory = deque(maxlen=10000) # memoria per l'esperienza 
-        self.batch_size = 64 #quanti campioni devo fare prima di andare a vedere se ho fatto giusto
-        self.gamma = 0.99 # fattore di sconto per le ricompense future
+        for i, layer in enumerate(self.hidden):
+            x = layer(x) # i dati passano per il layer
+            if self.norms:
+                x = self.norms[i](x)
+            x = F.relu(x) # e sono soggetti alla funzione di attivazione
+        if self.dueling:
+            advantage = self.advantage(x)
+            return self.value(x) + advantage - advantage.mean(1, keepdim=True)
+        return getattr(self, self.output)(x) # output dei layer
+
+def build_network(input_dim, output_dim, network='default'):
+    config = network_config(network)
+    return DQN(input_dim, output_dim, config['hidden'], config['dueling'], config['layer_norm'])
+
+def network_from_state_dict(state_dict):
+    # ricostruisce l'architettura dai soli pesi (per i .pth salvati senza configurazione)
+    # restituisce (input_dim, output_dim, config)
+    dueling = 'advantage.weight' in state_dict
+    widths = []
+    i = 1
+    while f'fc{i}.weight' in state_dict:
+        widths.append(state_dict[f'fc{i}.weight'].shape[0])
+        i += 1
+    input_dim = state_dict['fc1.weight'].shape[1]
+    if dueling:
+        output_dim = state_dict['advantage.weight'].shape[0]
+    else:
+        output_dim = widths.pop() # l'ultimo fc è il layer di output
+    config = {'hidden': widths, 'dueling': dueling, 'layer_norm': 'ln1.weight' in state_dict}
+    return input_dim, output_dim, config
+
+def load_network(state_dict):
+    input_dim, output_dim, config = network_from_state_dict(state_dict)
+    net = build_network(input_dim, output_dim, config)
+    net.load_state_dict(state_dict)
+    return net
+
+def select_actions(net, states, epsilons=0.0):
+    # scelta delle azioni per tante partite insieme: un solo forward su una matrice (N, input_dim)
+    # epsilons può essere un numero unico o un valore diverso per ogni riga
+    states = torch.as_tensor(states, dtype=torch.float32)
+    with torch.no_grad():
+        q_values = net(states)
+    actions = q_values.argmax(1) # sfruttamento per tutte le righe
+    epsilons = torch.as_tensor(epsilons, dtype=torch.float32)
+    if bool((epsilons > 0).any()):
+        # esplorazione vettoriale: estraggo insieme chi esplora e quale azione casuale fa
+        explore = torch.rand(actions.shape[0]) < epsilons
+        random_actions = torch.randint(0, q_values.shape[1], actions.shape)
+        actions = torch.where(explore, random_actions, actions)
+    return actions.numpy()
+
+class DQNAgent:
+    # nucleo di apprendimento comune a Agent e BallAgent: cambia solo il numero di input e di azioni
+    def __init__ (self, input_dim, action_dim, memory_size=10000, lr=0.001, batch_size=64, gamma=0.99,
+                  target_update=1000, tau=None, double_dqn=True, huber=True, grad_clip=10.0,
+                  prioritized=False, alpha=0.6, beta=0.4, seed=None, network='default', inference='float',
+                  publish_every=5000, n_step=1):
+        self.action_dim = action_dim
+        self.network = network_config(network) # architettura (vedi NETWORKS), salvata anche nei checkpoint
+        self.brain = build_network(input_dim, action_dim, self.network) # creo il cervello del modello
+        self.optimizer = optim.Adam(self.brain.parameters(), lr=lr) # va a imparare andando a minimizzare la loss
+        if prioritized:
+            # gli eventi rari (gol, colpi) vengono rivisti più spesso dei frame di sola "forma"
+            self.memory = PrioritizedReplayBuffer(memory_size, input_dim, alpha=alpha, beta=beta, seed=seed, gamma=gamma)
+        else:
+            self.memory = ReplayBuffer(memory_size, input_dim, seed=seed, gamma=gamma) # memoria per l'esperienza (array preallocati)
+        self.batch_size = batch_size #quanti campioni devo fare prima di andare a vedere se ho fatto giusto
+        self.gamma = gamma # fattore di sconto per le ricompense future
+        self.n_step = n_step # ritorni a n passi (1 = classico); la finestra la tiene chi produce le esperienze (nstep.py)
+        self.actor = self.brain # rete usata per scegliere le azioni (il Learner in background la sostituisce con una copia)
+        # versione della rete usata per giocare: 'float' (il cervello stesso), 'script' (TorchScript congelato)
+        # o 'int8' (quantizzazione dinamica + TorchScript), vedi inference.py. Le copie vengono rifatte
+        # ogni publish_every aggiornamenti (con il Learner in background ci pensa lui, con i suoi tempi).
+        # Senza Learner l'esportazione gira nel game loop e costa ~8 ms (script) o ~30 ms (int8): ogni 5000
+        # aggiornamenti sono 2-6 µs a frame contro i ~18 µs risparmiati a ogni azione; ogni 100 costava
+        # più di quanto faceva guadagnare. In cambio la rete che gioca resta indietro fino a 5000 aggiornamenti.
+        # A conteggio e non a tempo, così l'addestramento resta deterministico
+        self.inference = inference
+        self.publish_every = publish_every
+        if inference != 'float':
+            self.publish_actor()
+
+        # rete TARGET: copia "congelata" del cervello usata per calcolare expected_Q
+        # se calcolo il bersaglio con la stessa rete che sto aggiornando il bersaglio si sposta ad ogni passo
+        self.target = copy.deepcopy(self.brain)
+        self.target.requires_grad_(False)
+        self.target_update = target_update # ogni quanti aggiornamenti copio i pesi nella target (sync "hard")
+        self.tau = tau # se impostato la target segue il cervello in maniera morbida ad ogni passo (Polyak)
+        self.double_dqn = double_dqn # Double DQN: il cervello sceglie l'azione futura, la target la valuta
+        self.huber = huber # Huber loss invece di MSE, meno sensibile alle ricompense enormi (+150, -100...)
+        self.grad_clip = grad_clip # norma massima dei gradienti (None = nessun limite)
+        self.learn_steps = 0 # aggiornamenti dei pesi fatti finora
     
     def get_action(self, state, epsilon):
         if random.random() < epsilon: # esplorazione
-            return random.randint(0, 2) # azione casuale
+            return random.randint(0, self.action_dim - 1) # azione casuale
         else: # sfruttamento
             state = torch.FloatTensor(state).unsqueeze(0) # converto lo stato in tensore
             with torch.no_grad():
-                q_values = self.brain(state) # passo lo stato attraverso la rete
+                q_values = self.actor(state) # passo lo stato attraverso la rete
             return q_values.argmax().item() # ritorno l'azione con il valore Q più alto
         
-    def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done)) # memorizzo l'esperienza
+    def remember(self, state, action, reward, next_state, done, discount=None):
+        self.memory.push(state, action, reward, next_state, done, discount) # memorizzo l'esperienza
         # ogni volta che faccio una nuova esperienza vado a salvare queste 5 informaizioni in memoria
         # il done mi permette di sapere se l'episodio avrà ripercussioni future o meno
         # in questo caso facciamo che l'AI non vada a pianificare le sue mosse quindi non avrà ripercussioni future
@@ -47,92 +168,97 @@ class Agent:
             return
 
         # ho bisogno di prendere un batch di campioni in maniera casuale in modo tale che non ci siano correlazioni dovute alla successione temporale 
-        batch = random.sample(self.memory, self.batch_size)
-        # python fortissimo che mi riesce a dividere le tuple in 5 liste separate per categoria
-        states, actions, rewards, next_states, dones = zip(*batch)
+        batch = self.memory.sample(self.batch_size)
+        td_errors = self.learn(batch)
+        self.update_priorities(batch, td_errors)
+        if self.inference != 'float' and self.learn_steps % self.publish_every == 0:
+            self.publish_actor()
+
+    def publish_actor(self):
+        # ricrea la rete di inferenza dai pesi attuali del cervello (assegnazione atomica per chi gioca)
+        # (se la rete esportata sbaglia troppe azioni rispetto al cervello resta la copia float, vedi inference.py)
+        from inference import export_checked
+        self.actor = export_checked(self.brain, self.inference)
+
+    def update_priorities(self, batch, td_errors):
+        # con la memoria con priorità aggiorno la priorità delle esperienze appena usate in base al nuovo errore
+        if batch.indices is not None:
+            self.memory.update_priorities(batch.indices, td_errors)
 
-        # Converti tutto in tensori PyTorch -> da quel che ho capito facilita i calcoli
-        states = torch.tensor(states).float()     
-        actions = torch.tensor(actions).long().unsqueeze(1)
-        rewards = torch.FloatTensor(rewards).unsqueeze(1)
-        next_states = torch.FloatTensor(next_states)
-        dones = torch.FloatTensor(dones).unsqueeze(1)
+    def learn(self, batch):
+        # aggiornamento dei pesi su un batch già estratto (lo usa anche il Learner in background)
+        # restituisce l'errore TD di ogni esperienza del batch
+        # la memoria restituisce direttamente i tensori già divisi per categoria
+        states, actions, rewards, next_states, dones = batch.states, batch.actions, batch.rewards, batch.next_states, batch.dones
 
         # CALCOLO DELL'ERRORE (LOSS)
         # per ogni stato che è stato preso ed è nel batch vado a vedere quale è stata la azione scelta dall'AI e come la valutava
         curr_Q = self.brain(states).gather(1, actions)
-        # per ognuno degli stati appartenenti all batch vado a vedere lo stato futuro e prendo il valore più alto tra le tre azioni future
-        next_Q = self.brain(next_states).max(1)[0].unsqueeze(1) # questa quantità che vado a calcolare mi rappresenta la bontà dello stato futuro
-        expected_Q = rewards + (self.gamma * next_Q * (1 - dones)) # bellman equation
+        with torch.no_grad():
+            # per ognuno degli stati appartenenti all batch vado a vedere lo stato futuro e la sua bontà secondo la rete target
+            if self.double_dqn:
+                # il cervello sceglie quale sarebbe l'azione migliore, la target dice quanto vale davvero
+                # (usare la stessa rete per scegliere e valutare sovrastima sistematicamente i valori Q)
+                next_actions = self.brain(next_states).argmax(1, keepdim=True)
+                next_Q = self.target(next_states).gather(1, next_actions)
+            else:
+                next_Q = self.target(next_states).max(1)[0].unsqueeze(1)
+            # bellman equation: con i ritorni a n passi lo sconto di ogni esperienza è gamma^k invece di gamma
+            discounts = batch.discounts if batch.discounts is not None else self.gamma
+            expected_Q = rewards + (discounts * next_Q * (1 - dones))
         # sono a X = 50, compio un azione arrivo a X = 55, prendo azione massima in questa situazione e calcolo expected Q 
         # anche la prima volta che sono passato per X = 55 ho preso il valore massimo ma quel valore massimo era un valore stupido perché l'avrei potuto prendere casualmente 
         # con il movimento casuale mi sarei potuto muovere li ma non sarebbe stato il max -> torno indietro e vedo: "sono passato per X = 55 e la cosa migliore sarebbe state compiere questa azione (max)"
 
         # la differenza tra valore che avrebbe avuto se avessi saputo dove mi avrebbe portato - azione
-        loss = F.mse_loss(curr_Q, expected_Q.detach())
+        if self.huber:
+            losses = F.smooth_l1_loss(curr_Q, expected_Q, reduction='none')
+        else:
+            losses = F.mse_loss(curr_Q, expected_Q, reduction='none')
+        if batch.weights is not None:
+            losses = losses * batch.weights # correzione importance sampling della memoria con priorità
+        loss = losses.mean()
         # errore è semplicemtne differenza tra valore che era stato dato all'azione su dallo stato X = 50 con il valore della medesima azione nel medesimo stato sapendo che se vado a X = 55 c'è una mossa che mi da un sacco di punti
 
         # Aggiorna i pesi (Backpropagation)
         self.optimizer.zero_grad() # azzero i gradienti in modo da non mischiare i calcoli con i precedenti
         loss.backward() # torno indietro nella rete per vedere quale neurone ha contribuito di più all'errore
+        if self.grad_clip is not None:
+            nn.utils.clip_grad_norm_(self.brain.parameters(), self.grad_clip) # evito passi enormi sui gol
         self.optimizer.step() # aggiorno i pesi di quel neurone per minimizzare l'errore
 
-    def predict_action(self, state):
-        state = torch.FloatTensor(state).unsqueeze(0) # converto lo stato in tensore
-        with torch.no_grad():
-            q_values = self.brain(state) # passo lo stato attraverso la rete
-        return q_values.argmax().item() # ritorno l'azione con il valore Q più alto
+        self.learn_steps += 1
+        self.update_target()
+        return (expected_Q - curr_Q).detach().squeeze(1).abs().numpy()
 
-class BallAgent:
-    def __init__ (self, input_dim, action_dim):
-        self.brain = DQN(input_dim, action_dim) # creo il cervello del modello
-        self.optimizer = optim.Adam(self.brain.parameters(), lr=0.001) # va a imparare andando a minimizzare la loss
-        self.memory = deque(maxlen=10000) # memoria per l'esperienza 
-        self.batch_size = 64 #quanti campioni devo fare prima di andare a vedere se ho fatto giusto
-        self.gamma = 0.99 # fattore di sconto per le ricompense future
-    
-    def get_action(self, state, epsilon):
-        if random.random() < epsilon: # esplorazione
-            return random.randint(0, 6) # azione casuale
-        else: # sfruttamento
-            state = torch.FloatTensor(state).unsqueeze(0) # converto lo stato in tensore
+    def update_target(self):
+        if self.tau is not None:
+            # sync morbido: target = (1 - tau) * target + tau * cervello
             with torch.no_grad():
-                q_values = self.brain(state) # passo lo stato attraverso la rete
-            return q_values.argmax().item() # ritorno l'azione con il valore Q più alto
-        
-    def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done)) # memorizzo l'esperienza
-    
-    def train_step(self):
-        # controllo se ho abbastanza ricordi per fare un batch -> per imparare qualcosa
-        if len(self.memory) < self.batch_size:
-            return
+                for target_param, param in zip(self.target.parameters(), self.brain.parameters()):
+                    target_param.lerp_(param, self.tau)
+        elif self.learn_steps % self.target_update == 0:
+            # sync hard: copio i pesi del cervello nella target
+            self.target.load_state_dict(self.brain.state_dict())
 
-        # ho bisogno di prendere un batch di campioni in maniera casuale in modo tale che non ci siano correlazioni dovute alla successione temporale 
-        batch = random.sample(self.memory, self.batch_size)
-        # python fortissimo che mi riesce a dividere le tuple in 5 liste separate per categoria
-        states, actions, rewards, next_states, dones = zip(*batch)
-
-        # Converti tutto in tensori PyTorch -> da quel che ho capito facilita i calcoli
-        states = torch.tensor(states).float()     
-        actions = torch.tensor(actions).long().unsqueeze(1)
-        rewards = torch.FloatTensor(rewards).unsqueeze(1)
-        next_states = torch.FloatTensor(next_states)
-        dones = torch.FloatTensor(dones).unsqueeze(1)
-
-        # CALCOLO DELL'ERROE (LOSS)
-        # per ogni stato che è stato preso ed è nel batch vado a vedere quale è stata la azione scelta dall'AI e come la valutava
-        curr_Q = self.brain(states).gather(1, actions)
-        # per ognuno degli stati appartenenti all batch vado a vedere lo stato futuro e prendo il valore più alto tra le tre azioni future
-        next_Q = self.brain(next_states).max(1)[0].unsqueeze(1) # questa quantità che vado a calcolare mi rappresenta la bontà dello stato futuro
-        expected_Q = rewards + (self.gamma * next_Q * (1 - dones)) # bellman equation
-        # sono a X = 50, compio un azione arrivo a X = 55, prendo azione massima in questa situazione e calcolo expected Q 
-        # anche la prima volta che sono passato per X = 55 ho preso il valore massimo ma quel valore massimo era un valore stupido perché l'avrei potuto prendere casualmente 
-        # con il movimento casuale mi sarei potuto muovere li ma non sarebbe stato il max -> torno indietro e vedo: "sono passato per X = 55 e la cosa migliore sarebbe state compiere questa azione (max)"
-    
     def predict_action(self, state):
         state = torch.FloatTensor(state).unsqueeze(0) # converto lo stato in tensore
         with torch.no_grad():
-            q_values = self.brain(state) # passo lo stato attraverso la rete
+            q_values = self.actor(state) # passo lo stato attraverso la rete
         return q_values.argmax().item() # ritorno l'azione con il valore Q più alto
 
+    def get_actions(self, states, epsilons):
+        # come get_action ma per N stati insieme, restituisce un array di N azioni
+        return select_actions(self.actor, states, epsilons)
+
+    def predict_actions(self, states):
+        # come predict_action ma per N stati insieme (sempre l'azione con il valore Q più alto)
+        return select_actions(self.actor, states)
+
+class Agent(DQNAgent):
+    # paddle sinistro: 5 input e 3 azioni (0 = su, 1 = fermo, 2 = giù)
+    pass
+
+class BallAgent(DQNAgent):
+    # palla: 6 input e 7 azioni (accelerazioni verticali da Forte Su a Forte Giu)
+    pass
@@ -0,0 +1,76 @@
+import time
+
+# Invio dello stato al browser separato dalla velocità della simulazione.
+# Invece di mandare tutto game_state ad ogni frame (fino a 480 volte al secondo):
+# - se non c'è nessun browser collegato non serializzo niente
+# - invio al massimo max_hz pacchetti al secondo (il refresh dello schermo)
+# - posizioni e velocità dei frame simulati nel frattempo vanno in un array compatto 'f'
+# - gli altri campi (punteggi, chi sta imparando) vanno in 'd' solo quando cambiano
+# Con room il pacchetto va solo ai browser che guardano quella stanza (vedi rooms.py)
+
+# campi che cambiano ad ogni frame, spediti come array nell'ordine qui sotto
+FRAME_FIELDS = ('ballX', 'ballY', 'ballVX', 'ballVY', 'paddle1Y', 'paddle2Y')
+# campi che cambiano raramente, spediti solo quando sono diversi dall'ultimo invio
+DELTA_FIELDS = ('score1', 'score2', 'training_who', 'policy') # 'policy' ce l'hanno solo le stanze dimostrative
+
+class StateBroadcaster:
+    def __init__(self, socketio, max_hz=60, max_batch=8, namespace='/', event='state_delta', room=None):
+        self.socketio = socketio
+        self.interval = 1.0 / max_hz
+        self.max_batch = max_batch # quanti frame intermedi tengo al massimo in un pacchetto
+        self.namespace = namespace
+        self.event = event
+        self.room = room # None = tutti i browser collegati
+
+        self.clients = 0 # browser collegati
+        self.last_sent = {} # valori dei DELTA_FIELDS già inviati
+        self.pending = [] # frame compatti accumulati dall'ultimo invio
+        self.skipped = 0 # frame simulati dall'ultimo invio (anche quelli non tenuti in pending)
+        self.last_emit = 0.0
+
+    def client_connected(self):
+        if self.clients == 0: # niente frame vecchi rimasti da quando non guardava nessuno
+            self.pending = []
+            self.skipped = 0
+        self.clients += 1
+
+    def client_disconnected(self):
+        self.clients = max(0, self.clients - 1)
+
+    def full_packet(self, game_state):
+        # pacchetto completo per un browser che si è appena collegato (parte senza stato)
+        return {'d': {k: game_state[k] for k in DELTA_FIELDS if k in game_state},
+                'f': [self._frame(game_state)], 'n': 1}
+
+    def publish(self, game_state):
+        # chiamato ad ogni frame dal game loop: costa quasi niente finché non è il momento di inviare
+        if self.clients == 0:
+            return False
+
+        self.skipped += 1
+        self.pending.append(self._frame(game_state))
+        if len(self.pending) > self.max_batch:
+            del self.pending[0]
+
+        now = time.monotonic()
+        if now - self.last_emit < self.interval:
+            return False
+
+        delta = {}
+        for k in DELTA_FIELDS:
+            if k in game_state and self.last_sent.get(k) != game_state[k]:
+                delta[k] = game_state[k]
+        self.last_sent.update(delta)
+
+        packet = {'d': delta, 'f': self.pending, 'n': self.skipped}
+        self.socketio.emit(self.event, packet, namespace=self.namespace, to=self.room)
+
+        self.pending = []
+        self.skipped = 0
+        self.last_emit = now
+        return True
+
+    @staticmethod
+    def _frame(game_state):
+        # arrotondo a 1 decimale: per disegnare basta e il JSON è molto più corto
+        return [round(game_state[k], 1) for k in FRAME_FIELDS]
@@ -0,0 +1,126 @@
+import os
+import random
+import shutil
+import numpy as np
+import torch
+from contextlib import ExitStack
+
+# Checkpoint dell'addestramento COMPLETO, per riprendere esattamente da dove si era rimasti:
+# pesi (cervello + target), stato di Adam, memoria, orologi dell'esplorazione, contatori, turno, stato della partita
+# e i generatori casuali di random / NumPy / PyTorch.
+#
+# checkpoint/
+#   state.pt            tutto ciò che è piccolo (torch.save)
+#   paddle_memory/      memoria del paddle, una colonna per file .npy (caricata con mmap)
+#   ball_memory/        memoria della palla
+
+
+def _agent_state(agent):
+    return {
+        'brain': agent.brain.state_dict(),
+        'target': agent.target.state_dict(),
+        'optimizer': agent.optimizer.state_dict(),
+        'learn_steps': agent.learn_steps,
+    }
+
+
+def _load_agent_state(agent, state):
+    agent.brain.load_state_dict(state['brain'])
+    agent.target.load_state_dict(state['target'])
+    agent.optimizer.load_state_dict(state['optimizer'])
+    agent.learn_steps = state['learn_steps']
+    if agent.inference != 'float':
+        agent.publish_actor() # la rete esportata per giocare va rifatta dai pesi caricati
+
+
+def save_checkpoint(directory, trainer):
+    # scrivo tutto in una cartella temporanea e poi la sostituisco a quella vecchia:
+    # se il nodo viene interrotto a metà salvataggio resta valido il checkpoint precedente
+    tmp = directory.rstrip('/') + '.tmp'
+    old = directory.rstrip('/') + '.old'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    learners = [l for l in (trainer.paddle_learner, trainer.ball_learner) if l is not None]
+    with ExitStack() as stack:
+        # con i learner in background li fermo mentre salvo, altrimenti pesi e memoria non sarebbero coerenti
+        for learner in learners:
+            stack.enter_context(learner.paused())
+
+        state = {
+            'paddle': _agent_state(trainer.agent),
+            'ball': _agent_state(trainer.ball_agent),
+            'trainer': {
+                'exploration': {'paddle': trainer.paddle_exploration.steps, 'ball': trainer.ball_exploration.steps},
+                'frame_count': trainer.frame_count,
+                'episode_count': trainer.episode_count,
+                'turn': trainer.turn,
+                'frames_by_mode': dict(trainer.frames_by_mode),
+                # finestre dei ritorni a n passi ancora da completare (None se n_step = 1)
+                'nstep': {'paddle': trainer.paddle_nstep.state_dict() if trainer.paddle_nstep else None,
+                          'ball': trainer.ball_nstep.state_dict() if trainer.ball_nstep else None},
+                # lega di avversari: versioni salvate, risultati, generatore casuale e avversario del punto in corso
+                'league': trainer.league.state_dict() if trainer.league is not None else None,
+                'opponent': int(trainer.opponent),
+                # action repeat: azione in corso, frame che mancano, stato iniziale e reward sommate
+                'options': {'paddle': dict(trainer.paddle_option), 'ball': dict(trainer.ball_option)},
+                'state': trainer.state,
+                'game_state': dict(trainer.game_state),
+            },
+            'rng': {
+                'python': random.getstate(),
+                'numpy': np.random.get_state(),
+                'torch': torch.get_rng_state(),
+            },
+        }
+        torch.save(state, os.path.join(tmp, 'state.pt'))
+        trainer.agent.memory.save(os.path.join(tmp, 'paddle_memory'))
+        trainer.ball_agent.memory.save(os.path.join(tmp, 'ball_memory'))
+
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(directory):
+        os.rename(directory, old)
+    os.rename(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_checkpoint(directory, trainer):
+    # il file l'abbiamo scritto noi: contiene anche gli stati dei generatori casuali, non solo tensori
+    state = torch.load(os.path.join(directory, 'state.pt'), weights_only=False)
+
+    _load_agent_state(trainer.agent, state['paddle'])
+    _load_agent_state(trainer.ball_agent, state['ball'])
+    trainer.agent.memory.load(os.path.join(directory, 'paddle_memory'))
+    trainer.ball_agent.memory.load(os.path.join(directory, 'ball_memory'))
+
+    t = state['trainer']
+    trainer.frame_count = t['frame_count']
+    trainer.episode_count = t['episode_count']
+    trainer.turn = t['turn']
+    trainer.frames_by_mode = dict(t.get('frames_by_mode', trainer.frames_by_mode))
+    # i checkpoint vecchi hanno solo l'epsilon globale: l'orologio di ogni agente sono i frame giocati nel suo turno
+    exploration = t.get('exploration', {'paddle': trainer.frames_by_mode['PADDLE'], 'ball': trainer.frames_by_mode['BALL']})
+    trainer.paddle_exploration.steps = exploration['paddle']
+    trainer.ball_exploration.steps = exploration['ball']
+    nstep = t.get('nstep', {})
+    for window, saved in ((trainer.paddle_nstep, nstep.get('paddle')), (trainer.ball_nstep, nstep.get('ball'))):
+        if window is not None and saved is not None:
+            window.load_state_dict(saved)
+    if trainer.league is not None and t.get('league') is not None:
+        trainer.league.load_state_dict(t['league'])
+        trainer.opponent = t.get('opponent', trainer.opponent)
+    options = t.get('options', {})
+    trainer.paddle_option.update(options.get('paddle', {}))
+    trainer.ball_option.update(options.get('ball', {}))
+    trainer.state = t['state']
+    trainer.game_state.clear() # aggiorno lo stesso dizionario: app.py e il broadcaster ne tengono un riferimento
+    trainer.game_state.update(t['game_state'])
+
+    random.setstate(state['rng']['python'])
+    np.random.set_state(state['rng']['numpy'])
+    torch.set_rng_state(state['rng']['torch'])
+
+    # i learner in background devono ripartire dai pesi caricati
+    for learner in (trainer.paddle_learner, trainer.ball_learner):
+        if learner is not None:
+            learner.publish()
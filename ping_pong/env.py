@@ -0,0 +1,333 @@
+import numpy as np
+from game import WIDTH, HEIGHT, BALL_SIZE, PADDLE_WIDTH, PADDLE_HEIGHT, MAX_BALL_VY, BALL_ACCELERATION
+from game import calculate_bounce_angle # è solo aritmetica, funziona anche con gli array
+from game import SCRIPTED_DEADZONE, REWARDS
+import trajectory
+
+# Ambiente HEADLESS vettoriale: stessa fisica e stesse reward di game.py ma su N partite in parallelo.
+# Invece di un dizionario game_state con valori scalari ogni grandezza è un array NumPy di lunghezza N,
+# così un solo step avanza tutte le partite con operazioni su array (niente loop Python per partita)
+
+# Mappatura azioni palla (0-6) su accelerazione verticale, identica a physics()
+# 0=Forte Su, 1=Medio Su, 2=Piano Su, 3=Nulla, 4=Piano Giu, 5=Medio Giu, 6=Forte Giu
+BALL_ACCEL = BALL_ACCELERATION * np.array([-2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0])
+
+# Mappatura azioni paddle (0 = su, 1 = fermo, 2 = giù)
+PADDLE_MOVE = np.array([-4.0, 0.0, 4.0])
+
+# soglie delle fasce usate da calculate_reward_ball()
+BORDER_THRESHOLD = HEIGHT * 0.20
+INTERMEDIATE_THRESHOLD = HEIGHT * 0.35
+
+
+def scripted_paddle_actions(ball_x, ball_y, ball_vx, ball_vy, paddle1_y, deadzone=SCRIPTED_DEADZONE):
+    # versione vettoriale di game.scripted_paddle_action() per N partite (es. env.ball_x, env.ball_y, ...)
+    frames = trajectory.frames_to_arrival_array(ball_x, ball_vx, PADDLE_WIDTH)
+    arrival = trajectory.predict_y_array(ball_y, ball_vy, frames, HEIGHT - BALL_SIZE) + BALL_SIZE / 2
+    target = np.where(ball_vx < 0, arrival, HEIGHT / 2)
+    offset = target - (paddle1_y + PADDLE_HEIGHT / 2)
+    return np.where(offset < -deadzone, 0, np.where(offset > deadzone, 2, 1))
+
+
+class VecPongEnv:
+    def __init__(self, num_envs, seed=None):
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+
+        n = num_envs
+        self.ball_x = np.zeros(n)
+        self.ball_y = np.zeros(n)
+        self.ball_vx = np.zeros(n)
+        self.ball_vy = np.zeros(n)
+        self.paddle1_y = np.zeros(n)
+        self.paddle2_y = np.zeros(n)
+        self.score1 = np.zeros(n, dtype=np.int64)
+        self.score2 = np.zeros(n, dtype=np.int64)
+        self.episode_count = np.zeros(n, dtype=np.int64)
+
+        # stato "nascosto" usato da calculate_reward_ball (prev_ball_y, frames_at_top/bottom nel game_state)
+        self.prev_ball_y = np.zeros(n)
+        self.has_prev_ball_y = np.zeros(n, dtype=bool)
+        self.frames_at_top = np.zeros(n, dtype=np.int64)
+        self.frames_at_bottom = np.zeros(n, dtype=np.int64)
+
+        # eventi dell'ultimo step (per la valutazione): chi ha respinto la palla, da che parte è uscita
+        # e a che altezza (prima dell'auto-reset, che altrimenti cancellerebbe questa informazione)
+        self.hit_paddle1 = np.zeros(n, dtype=bool)
+        self.hit_paddle2 = np.zeros(n, dtype=bool)
+        self.goal_left = np.zeros(n, dtype=bool) # uscita a sinistra: punto per il paddle 2
+        self.goal_right = np.zeros(n, dtype=bool) # uscita a destra: punto per il paddle 1
+        self.goal_ball_y = np.zeros(n)
+
+    def reset(self):
+        # riporto TUTTE le partite allo stato iniziale e restituisco le prime osservazioni
+        self.paddle1_y[:] = (HEIGHT - PADDLE_HEIGHT) // 2
+        self.paddle2_y[:] = (HEIGHT - PADDLE_HEIGHT) // 2
+        self.score1[:] = 0
+        self.score2[:] = 0
+        self.episode_count[:] = 0
+        self.has_prev_ball_y[:] = False
+        self.frames_at_top[:] = 0
+        self.frames_at_bottom[:] = 0
+        self._reset_ball(np.ones(self.num_envs, dtype=bool))
+        return self.observe_paddle(), self.observe_ball()
+
+    def serve(self, mask):
+        # rimette in gioco la palla nelle partite indicate come dopo un gol (es. per chiudere uno scambio infinito)
+        self._reset_ball(np.asarray(mask, dtype=bool))
+        return self.observe_paddle(), self.observe_ball()
+
+    def _reset_ball(self, mask):
+        # equivalente di reset_game() ma solo per le partite indicate da mask (auto-reset per env)
+        k = int(mask.sum())
+        if k == 0:
+            return
+        vy = self.rng.integers(-3, 4, size=k).astype(np.float64)
+        vy[vy == 0] = 1
+        self.ball_x[mask] = WIDTH // 2
+        self.ball_y[mask] = HEIGHT // 2
+        self.ball_vx[mask] = np.where(self.rng.random(k) < 0.5, 4.0, -4.0)
+        self.ball_vy[mask] = vy
+
+    def observe_paddle(self):
+        # come get_state_array_paddle(), una riga per partita
+        return np.stack([
+            self.ball_x / WIDTH,
+            self.ball_y / HEIGHT,
+            self.ball_vx / 10,
+            self.ball_vy / 10,
+            self.paddle1_y / HEIGHT,
+        ], axis=1).astype(np.float32)
+
+    def observe_ball(self):
+        # come get_state_array_ball() nel momento in cui la palla sceglie l'azione:
+        # in physics() la X è già stata aggiornata con ballVX, quindi la anticipo qui
+        return np.stack([
+            self.paddle1_y / HEIGHT,
+            self.paddle2_y / HEIGHT,
+            self.ball_y / HEIGHT,
+            self.ball_vy / 10,
+            (self.ball_x + self.ball_vx) / WIDTH,
+            self.ball_vx / 10,
+        ], axis=1).astype(np.float32)
+
+    def step(self, paddle_actions, ball_actions):
+        # avanza di un frame tutte le partite, seguendo lo stesso ordine di physics() + calculate_reward()
+        paddle_actions = np.asarray(paddle_actions, dtype=np.int64)
+        ball_actions = np.asarray(ball_actions, dtype=np.int64)
+
+        # 1. Aggiorna Posizione X Palla
+        self.ball_x += self.ball_vx
+
+        # 2. Accelerazione verticale scelta dalla Ball AI
+        self.ball_vy = np.clip(self.ball_vy + BALL_ACCEL[ball_actions], -MAX_BALL_VY, MAX_BALL_VY)
+        self.ball_y += self.ball_vy
+
+        # come nel Trainer la reward della palla viene calcolata qui, prima dei rimbalzi
+        reward_ball = self._reward_ball(ball_actions)
+
+        # 2. Rimbalzi Pareti
+        top = self.ball_y <= 0
+        bottom = ~top & (self.ball_y >= HEIGHT - BALL_SIZE)
+        self.ball_y = np.where(top, 0.0, np.where(bottom, HEIGHT - BALL_SIZE, self.ball_y))
+        self.ball_vy = np.where(top, np.abs(self.ball_vy), np.where(bottom, -np.abs(self.ball_vy), self.ball_vy))
+
+        # 3. Rimbalzo Paddle 1 (Sinistra - AI DQN)
+        # conto come colpo solo la palla in arrivo (vicino al paddle il rimbalzo può ripetersi per più frame)
+        incoming = self.ball_vx < 0
+        self.hit_paddle1 = self._paddle_bounce(self.ball_x <= PADDLE_WIDTH, self.paddle1_y, 1.0) & incoming
+
+        # 4. Rimbalzo Paddle 2 (Destra - Simple AI)
+        incoming = self.ball_vx > 0
+        self.hit_paddle2 = self._paddle_bounce(self.ball_x >= WIDTH - PADDLE_WIDTH - BALL_SIZE, self.paddle2_y, -1.0) & incoming
+
+        # 5. AI Semplice per Paddle 2
+        center_paddle2 = self.paddle2_y + PADDLE_HEIGHT / 2
+        self.paddle2_y += np.where(self.ball_y > center_paddle2, 4.0, np.where(self.ball_y < center_paddle2, -4.0, 0.0))
+
+        # 6. AI DQN per Paddle 1
+        self.paddle1_y += PADDLE_MOVE[paddle_actions]
+
+        # 7. Limiti Paddle
+        np.clip(self.paddle2_y, 0, HEIGHT - PADDLE_HEIGHT, out=self.paddle2_y)
+        np.clip(self.paddle1_y, 0, HEIGHT - PADDLE_HEIGHT, out=self.paddle1_y)
+
+        reward_paddle, done = self._reward_paddle()
+        self.goal_left = self.ball_x < 0
+        self.goal_right = self.ball_x > WIDTH
+        self.goal_ball_y = self.ball_y.copy()
+
+        # auto-reset: al posto di reset_game() rimetto la palla al centro solo nelle partite finite
+        self.episode_count += done
+        self._reset_ball(done)
+
+        return self.observe_paddle(), self.observe_ball(), reward_paddle, reward_ball, done
+
+    def _paddle_bounce(self, side, paddle_y, direction):
+        hit = (side &
+               (self.ball_y + BALL_SIZE >= paddle_y) &
+               (self.ball_y <= paddle_y + PADDLE_HEIGHT))
+        if not hit.any():
+            return hit
+        angle = np.radians(calculate_bounce_angle(paddle_y, self.ball_y))
+        speed = np.sqrt(self.ball_vx ** 2 + self.ball_vy ** 2)
+        self.ball_vx = np.where(hit, direction * speed * np.cos(angle), self.ball_vx)
+        self.ball_vy = np.where(hit, speed * np.sin(angle), self.ball_vy)
+        return hit
+
+    def _reward_paddle(self):
+        # versione vettoriale di calculate_reward(): calcolo tutte le sezioni per ogni partita
+        # e poi applico in ordine di priorità gli "early return" (gol > colpo > shaping)
+        x, y, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+        paddle1_y = self.paddle1_y
+
+        # ===== CALCOLI PRELIMINARI =====
+        paddle_center = paddle1_y + PADDLE_HEIGHT / 2
+        ball_center = y + BALL_SIZE / 2
+        distance_to_ball = np.abs(paddle_center - ball_center)
+
+        ball_in_my_half = x < WIDTH / 2
+        ball_coming_to_me = vx < 0
+
+        # ===== PREDIZIONE =====
+        frames_to_arrival = trajectory.frames_to_arrival_array(x, vx, PADDLE_WIDTH)
+        predicted_ball_y = trajectory.predict_y_array(y, vy, frames_to_arrival, HEIGHT)
+        distance_to_predicted = np.abs(paddle_center - (predicted_ball_y + BALL_SIZE / 2))
+
+        reward = np.zeros(self.num_envs)
+
+        # ===== 3. CONTROLLO DELLO SPAZIO =====
+        ball_y_normalized = ball_center / HEIGHT
+        paddle_y_normalized = paddle_center / HEIGHT
+        ball_wants_center = (ball_y_normalized > 0.35) & (ball_y_normalized < 0.65)
+        paddle_in_center = (paddle_y_normalized > 0.35) & (paddle_y_normalized < 0.65)
+        reward += np.where(ball_in_my_half & ball_wants_center & paddle_in_center, 3.0, 0.0)
+
+        # ===== 4. FORZARE PALLA VERSO ZONE SVANTAGGIOSE =====
+        ball_in_danger_zone = (ball_y_normalized < 0.20) | (ball_y_normalized > 0.80)
+        reward += np.where(ball_in_my_half & ball_in_danger_zone,
+                           np.where(distance_to_ball < PADDLE_HEIGHT / 2, 4.0, 2.0), 0.0)
+
+        # ===== 5. ANTICIPAZIONE INTELLIGENTE =====
+        approaching = ball_in_my_half & ball_coming_to_me
+        near = frames_to_arrival < 20
+        near_reward = np.where(distance_to_predicted < 8, 5.0,
+                      np.where(distance_to_predicted < 15, 3.0,
+                      np.where(distance_to_predicted < 25, 1.0, -3.0)))
+        near_reward += np.where((frames_to_arrival > 10) & (distance_to_predicted < 10), 3.0, 0.0)
+        far_reward = np.where(distance_to_ball < 10, 2.0, np.where(distance_to_ball < 20, 1.0, 0.0))
+        reward += np.where(approaching, np.where(near, near_reward, far_reward), 0.0)
+
+        # ===== 6. STRATEGIA DI CACCIA =====
+        leaving = ball_in_my_half & ~ball_coming_to_me
+        distance_from_center = np.abs(paddle_center - HEIGHT / 2)
+        chase_reward = np.where(distance_to_ball < 15, 2.0, 0.0)
+        chase_reward += np.where(distance_from_center < 15, 1.5, np.where(distance_from_center > 30, -1.0, 0.0))
+        reward += np.where(leaving, chase_reward, 0.0)
+
+        # ===== 7. POSIZIONE DIFENSIVA DINAMICA =====
+        future_ball_y = trajectory.predict_y_array(y, vy, 30, HEIGHT)
+        distance_to_future_position = np.abs(paddle_center - (future_ball_y + BALL_SIZE / 2))
+        defensive_reward = np.where(distance_to_future_position < 20, 3.0,
+                           np.where(distance_to_future_position < 40, 1.5,
+                           np.where(distance_from_center < 10, 1.0, 0.0)))
+        reward += np.where(~ball_in_my_half, defensive_reward, 0.0)
+
+        # ===== 8. PENALITÀ BORDI =====
+        reward -= np.where((paddle1_y <= 5) | (paddle1_y >= HEIGHT - PADDLE_HEIGHT - 5), 3.0, 0.0)
+
+        # ===== 9. COPERTURA VERTICALE =====
+        max_reachable_up = np.maximum(0, paddle_center - PADDLE_HEIGHT)
+        max_reachable_down = np.minimum(HEIGHT, paddle_center + PADDLE_HEIGHT)
+        reward += np.where((max_reachable_down - max_reachable_up) / HEIGHT > 0.4, 1.0, 0.0)
+
+        # ===== 2. HIT DETECTION =====
+        hit_paddle = ((x <= PADDLE_WIDTH) &
+                      (y + BALL_SIZE >= paddle1_y) &
+                      (y <= paddle1_y + PADDLE_HEIGHT) &
+                      ball_coming_to_me)
+        precision_bonus = np.where(distance_to_ball < 5, 15.0,
+                          np.where(distance_to_ball < 10, 8.0,
+                          np.where(distance_to_ball < 15, 4.0, 1.0)))
+        hit_reward = REWARDS['paddle_hit'] + precision_bonus + np.where(distance_to_ball > 10, 10.0, 0.0)
+        reward = np.where(hit_paddle, hit_reward, reward)
+
+        # ===== 1. EVENTI TERMINALI =====
+        won = x > WIDTH
+        lost = ~won & (x < 0)
+        goal_reward = float(REWARDS['paddle_goal'])
+        reward = np.where(won, goal_reward, np.where(lost, -goal_reward, reward))
+        self.score1 += won
+        self.score2 += lost
+
+        return reward, won | lost
+
+    def _reward_ball(self, ball_actions):
+        # versione vettoriale di calculate_reward_ball()
+        x, y, vy = self.ball_x, self.ball_y, self.ball_vy
+
+        # ===== CALCOLI PRELIMINARI =====
+        ball_center_y = y + BALL_SIZE / 2
+        distance_from_top = y
+        distance_from_bottom = HEIGHT - (y + BALL_SIZE)
+
+        # ===== SISTEMA FASCE =====
+        top = distance_from_top < BORDER_THRESHOLD
+        bottom = ~top & (distance_from_bottom < BORDER_THRESHOLD)
+        intermediate = (~top & ~bottom &
+                        ((distance_from_top < INTERMEDIATE_THRESHOLD) | (distance_from_bottom < INTERMEDIATE_THRESHOLD)))
+        center = ~top & ~bottom & ~intermediate
+        reward = np.where(top, -50 * (1 + distance_from_top / BORDER_THRESHOLD) ** 2,
+                 np.where(bottom, -50 * (1 + distance_from_bottom / BORDER_THRESHOLD) ** 2,
+                 np.where(center, 5.0, 0.0)))
+
+        # ===== 1. EVENTI TERMINALI (GOL con PREMIO PRECISIONE) =====
+        goal = (x < 0) | (x > WIDTH)
+        precision_factor = 1.0 - np.abs(ball_center_y - HEIGHT / 2) / (HEIGHT / 2)
+        reward = np.where(goal, REWARDS['ball_goal'] + REWARDS['ball_precision_bonus'] * precision_factor ** 3, reward)
+
+        # ===== 2. HIT DETECTION =====
+        hit_by_paddle1 = ((x <= PADDLE_WIDTH) &
+                          (y + BALL_SIZE >= self.paddle1_y) &
+                          (y <= self.paddle1_y + PADDLE_HEIGHT) &
+                          (self.ball_vx < 0))
+        hit_by_paddle2 = ((x >= WIDTH - PADDLE_WIDTH - BALL_SIZE) &
+                          (y + BALL_SIZE >= self.paddle2_y) &
+                          (y <= self.paddle2_y + PADDLE_HEIGHT) &
+                          (self.ball_vx > 0))
+        hit = hit_by_paddle1 | hit_by_paddle2
+        # in calculate_reward_ball() il colpo fa return subito: le partite colpite non aggiornano prev_ball_y e i contatori
+        alive = ~hit
+
+        # ===== 3. REWARD MOVIMENTO =====
+        y_change = np.abs(y - self.prev_ball_y)
+        movement = np.where(y_change > 3, 5.0, np.where(y_change > 1, 2.0, np.where(y_change < 0.5, -5.0, 0.0)))
+        reward += np.where(self.has_prev_ball_y, movement, 0.0)
+        self.prev_ball_y = np.where(alive, y, self.prev_ball_y)
+        self.has_prev_ball_y |= alive
+
+        # ===== 4. REWARD VELOCITÀ VERTICALE =====
+        speed_y = np.abs(vy)
+        reward += np.where(speed_y > 3, 3.0, np.where(speed_y < 1.5, -8.0, 0.0))
+
+        # ===== 5. PENALITÀ TEMPO AI BORDI =====
+        self.frames_at_top = np.where(alive, np.where(top, self.frames_at_top + 1, 0), self.frames_at_top)
+        self.frames_at_bottom = np.where(alive, np.where(bottom, self.frames_at_bottom + 1, 0), self.frames_at_bottom)
+        reward += np.where(top, -3.0 * self.frames_at_top - np.where(self.frames_at_top > 20, 100.0, 0.0), 0.0)
+        reward += np.where(bottom, -3.0 * self.frames_at_bottom - np.where(self.frames_at_bottom > 20, 100.0, 0.0), 0.0)
+
+        # ===== 6. MOVIMENTO VERSO CENTRO =====
+        reward += np.where(top, np.where(vy > 1.0, 15.0, np.where(vy < -1.0, -15.0, 0.0)), 0.0)
+        reward += np.where(bottom, np.where(vy < -1.0, 15.0, np.where(vy > 1.0, -15.0, 0.0)), 0.0)
+
+        # ===== 7. PENALITÀ AZIONE CHE SPINGE VERSO BORDO =====
+        reward -= np.where(top & (ball_actions <= 2), 20.0, 0.0)
+        reward -= np.where(bottom & (ball_actions >= 4), 20.0, 0.0)
+
+        # ===== 8. REWARD STRATEGICO (evita paddle) =====
+        relevant_dist = np.where(x < WIDTH / 2,
+                                 np.abs(self.paddle1_y + PADDLE_HEIGHT / 2 - ball_center_y),
+                                 np.abs(self.paddle2_y + PADDLE_HEIGHT / 2 - ball_center_y))
+        reward += np.where(relevant_dist > PADDLE_HEIGHT, 2.0, np.where(relevant_dist < PADDLE_HEIGHT / 2, -2.0, 0.0))
+
+        return np.where(hit, float(REWARDS['ball_hit']), reward)
@@ -0,0 +1,204 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+import torch
+from brain import load_network, select_actions
+from env import VecPongEnv, scripted_paddle_actions
+from game import HEIGHT, BALL_SIZE
+
+# Valutazione delle politiche CONGELATE: niente esplorazione, niente addestramento.
+# Gioca migliaia di partite in parallelo con VecPongEnv (azioni greedy, un forward per tutte le partite)
+# contro il paddle destro che insegue la palla, e riporta:
+#   - gol per lato e percentuale di vittorie del paddle sinistro
+#   - hit rate dei due paddle (palle respinte / palle arrivate)
+#   - lunghezza degli scambi (frame e numero di colpi per punto)
+#   - distribuzione del precision factor dei gol (1 = uscita al centro, 0 = rasente al muro)
+#
+#   python evaluate.py --weights runs/exp1 --episodes 2000
+#   python evaluate.py --paddle runs/exp1/checkpoint --ball straight --min-hit-rate 0.8   # exit code 1 se sotto soglia
+#
+# Pesi accettati: file .pth con lo state_dict (come li salva train.py), cartella con paddle.pth/ball.pth
+# oppure cartella di un checkpoint (state.pt). Al posto dei pesi si possono usare delle baseline:
+#   paddle: 'scripted' (va dove arriverà la palla)       palla: 'straight' (non sterza) o 'random'
+
+PADDLE_BASELINES = ('scripted',)
+BALL_BASELINES = ('straight', 'random')
+
+
+def load_policy(path, who):
+    # who = 'paddle' o 'ball': serve per scegliere il file giusto in una cartella o in un checkpoint
+    # l'architettura (larghezza, profondità, dueling, LayerNorm) la ricavo dai pesi stessi
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, 'state.pt')):
+            state = torch.load(os.path.join(path, 'state.pt'), map_location='cpu', weights_only=False)[who]['brain']
+        else:
+            state = torch.load(os.path.join(path, f'{who}.pth'), map_location='cpu')
+    else:
+        state = torch.load(path, map_location='cpu')
+    return load_network(state).eval()
+
+
+def _percentiles(values, qs=(50, 90, 99)):
+    if len(values) == 0:
+        return {f'p{q}': 0.0 for q in qs}
+    return {f'p{q}': float(np.percentile(values, q)) for q in qs}
+
+
+def evaluate(paddle_policy, ball_policy, episodes=1000, num_envs=512, seed=0, max_rally=2000):
+    # paddle_policy: rete DQN oppure 'scripted'; ball_policy: rete DQN, 'straight' o 'random'
+    # ogni partita gioca lo stesso numero di punti (k): fermarsi ai primi M punti conclusi
+    # favorirebbe gli scambi corti e falserebbe le statistiche.
+    # Uno scambio più lungo di max_rally frame (es. palla incollata al muro e paddle perfetto) viene chiuso
+    # senza gol e contato in 'timeouts': così la valutazione dura al massimo k * max_rally step
+    num_envs = max(1, min(num_envs, episodes))
+    per_env = math.ceil(episodes / num_envs)
+    env = VecPongEnv(num_envs, seed=seed)
+    rng = np.random.default_rng(seed)
+    obs_paddle, obs_ball = env.reset()
+
+    finished = np.zeros(num_envs, dtype=np.int64) # punti conclusi per partita
+    rally_frames = np.zeros(num_envs, dtype=np.int64)
+    rally_hits = np.zeros(num_envs, dtype=np.int64)
+    hits1 = hits2 = 0
+    goals_left = goals_right = timeouts = 0
+    lengths, contacts, precision = [], [], []
+
+    start = time.time()
+    frames = 0
+    while (finished < per_env).any():
+        active = finished < per_env # le partite che hanno già giocato i loro k punti continuano ma non contano
+
+        if isinstance(paddle_policy, str):
+            paddle_actions = scripted_paddle_actions(env.ball_x, env.ball_y, env.ball_vx, env.ball_vy, env.paddle1_y)
+        else:
+            paddle_actions = select_actions(paddle_policy, obs_paddle)
+
+        if ball_policy == 'straight':
+            ball_actions = np.full(num_envs, 3)
+        elif ball_policy == 'random':
+            ball_actions = rng.integers(0, 7, num_envs)
+        else:
+            ball_actions = select_actions(ball_policy, obs_ball)
+
+        obs_paddle, obs_ball, _, _, done = env.step(paddle_actions, ball_actions)
+        frames += 1
+
+        # una palla già oltre la linea può ancora "rimbalzare" nello stesso frame del gol: conta come gol
+        hit1 = env.hit_paddle1 & ~env.goal_left
+        hit2 = env.hit_paddle2 & ~env.goal_right
+        rally_frames += 1
+        rally_hits += hit1 | hit2
+        hits1 += int((hit1 & active).sum())
+        hits2 += int((hit2 & active).sum())
+
+        ended = done & active
+        if ended.any():
+            goals_left += int((env.goal_left & ended).sum())
+            goals_right += int((env.goal_right & ended).sum())
+            lengths.append(rally_frames[ended])
+            contacts.append(rally_hits[ended])
+            # stessa formula del premio precisione di calculate_reward_ball()
+            precision.append(1.0 - np.abs(env.goal_ball_y[ended] + BALL_SIZE / 2 - HEIGHT / 2) / (HEIGHT / 2))
+        finished += done & active
+        rally_frames[done] = 0
+        rally_hits[done] = 0
+
+        stuck = rally_frames >= max_rally
+        if stuck.any():
+            timeouts += int((stuck & active).sum())
+            finished += stuck & active
+            rally_frames[stuck] = 0
+            rally_hits[stuck] = 0
+            obs_paddle, obs_ball = env.serve(stuck)
+
+    elapsed = time.time() - start
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0)
+    contacts = np.concatenate(contacts) if contacts else np.zeros(0)
+    precision = np.concatenate(precision) if precision else np.zeros(0)
+    played = len(lengths) + timeouts
+    scored = len(lengths)
+    histogram, edges = np.histogram(precision, bins=10, range=(0.0, 1.0))
+
+    return {
+        'episodes': played,
+        'timeouts': timeouts, # scambi chiusi senza gol dopo max_rally frame
+        'num_envs': num_envs,
+        'frames': frames,
+        'seconds': elapsed,
+        'goals': {'paddle1': goals_right, 'paddle2': goals_left},
+        'win_rate_paddle1': goals_right / played if played else 0.0,
+        'hits': {'paddle1': hits1, 'paddle2': hits2},
+        # palle respinte / palle arrivate (respinte + gol subiti)
+        'hit_rate_paddle1': hits1 / (hits1 + goals_left) if hits1 + goals_left else 0.0,
+        'hit_rate_paddle2': hits2 / (hits2 + goals_right) if hits2 + goals_right else 0.0,
+        # statistiche dei soli punti finiti con un gol
+        'rally_frames': {'mean': float(lengths.mean()) if scored else 0.0, **_percentiles(lengths),
+                         'max': int(lengths.max()) if scored else 0},
+        'rally_hits': {'mean': float(contacts.mean()) if scored else 0.0, **_percentiles(contacts),
+                       'max': int(contacts.max()) if scored else 0},
+        'precision_factor': {'mean': float(precision.mean()) if scored else 0.0,
+                             **_percentiles(precision, (10, 50, 90)),
+                             'histogram': histogram.tolist(), 'bin_edges': edges.round(2).tolist()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valutazione greedy di paddle e palla su tante partite in parallelo")
+    parser.add_argument('--weights', default=None, help="cartella con paddle.pth/ball.pth o un checkpoint (per entrambi)")
+    parser.add_argument('--paddle', default=None, help="pesi del paddle oppure 'scripted'")
+    parser.add_argument('--ball', default=None, help="pesi della palla oppure 'straight' / 'random'")
+    parser.add_argument('--episodes', type=int, default=2000, help="punti da giocare in totale")
+    parser.add_argument('--envs', type=int, default=512, help="partite in parallelo")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-rally', type=int, default=2000, help="frame massimi per scambio (poi si riparte senza gol)")
+    parser.add_argument('--threads', type=int, default=None, help="thread di PyTorch")
+    parser.add_argument('--out', default=None, help="file JSON dove salvare il report")
+    parser.add_argument('--min-hit-rate', type=float, default=None, help="soglia sull'hit rate del paddle 1 (exit code 1 se sotto)")
+    parser.add_argument('--min-win-rate', type=float, default=None, help="soglia sulle vittorie del paddle 1 (exit code 1 se sotto)")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    paddle = args.paddle or args.weights
+    ball = args.ball or args.weights
+    if paddle is None or ball is None:
+        parser.error("servono --weights oppure sia --paddle che --ball")
+
+    paddle_policy = paddle if paddle in PADDLE_BASELINES else load_policy(paddle, 'paddle')
+    ball_policy = ball if ball in BALL_BASELINES else load_policy(ball, 'ball')
+
+    report = evaluate(paddle_policy, ball_policy, args.episodes, args.envs, args.seed, args.max_rally)
+    report['paddle'] = paddle
+    report['ball'] = ball
+
+    print(f"🏓 {report['episodes']} punti in {report['seconds']:.1f}s ({report['frames']} step x {report['num_envs']} partite)")
+    print(f"   Gol: paddle1 {report['goals']['paddle1']} - paddle2 {report['goals']['paddle2']} | "
+          f"Vittorie paddle1: {report['win_rate_paddle1']:.1%}")
+    print(f"   Hit rate: paddle1 {report['hit_rate_paddle1']:.1%} | paddle2 {report['hit_rate_paddle2']:.1%}")
+    print(f"   Scambio: {report['rally_frames']['mean']:.0f} frame, {report['rally_hits']['mean']:.1f} colpi in media")
+    print(f"   Precision factor: media {report['precision_factor']['mean']:.2f} | "
+          f"p50 {report['precision_factor']['p50']:.2f} | p90 {report['precision_factor']['p90']:.2f}")
+    if report['timeouts']:
+        print(f"⚠️  {report['timeouts']} scambi chiusi senza gol dopo {args.max_rally} frame")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # gate per la promozione di un checkpoint
+    passed = True
+    if args.min_hit_rate is not None and report['hit_rate_paddle1'] < args.min_hit_rate:
+        print(f"❌ Hit rate {report['hit_rate_paddle1']:.1%} sotto la soglia {args.min_hit_rate:.1%}")
+        passed = False
+    if args.min_win_rate is not None and report['win_rate_paddle1'] < args.min_win_rate:
+        print(f"❌ Vittorie {report['win_rate_paddle1']:.1%} sotto la soglia {args.min_win_rate:.1%}")
+        passed = False
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
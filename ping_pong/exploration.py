@@ -0,0 +1,107 @@
+import numpy as np
+
+# Esplorazione (epsilon-greedy) separata per ogni agente.
+# Prima c'era un solo epsilon globale moltiplicato per 0.999999 ad ogni frame: servivano ~3M frame per
+# arrivare a 0.05 e l'epsilon del paddle calava anche durante i turni della palla, quando lui non impara.
+# Ora ogni agente ha la sua Exploration: una schedule (come cambia epsilon) e un orologio che conta
+# i passi di QUELL'agente:
+#   clock='steps'   -> frame giocati esplorando, cioè solo quelli del suo turno di addestramento
+#   clock='updates' -> passi di addestramento fatti (agent.learn_steps)
+#
+# Schedule disponibili:
+#   ConstantSchedule(0.05)
+#   LinearSchedule(1.0, 0.05, 200000)             da 1.0 a 0.05 in 200k passi, poi fermo
+#   ExponentialSchedule(1.0, 0.05, 0.99999)       come il vecchio epsilon *= decay, con un minimo
+#   PiecewiseSchedule([(0, 1.0), (50000, 0.1), (500000, 0.01)])   lineare tra i punti
+#   LadderSchedule(num_actors, base=0.4, alpha=7)  un epsilon fisso diverso per ogni attore (Ape-X)
+# Da riga di comando: parse_schedule('linear:1.0,0.05,200000'), 'exp:1.0,0.05,0.99999',
+#   'piecewise:0=1.0,50000=0.1,500000=0.01', 'const:0.05', 'ladder:0.4,7'
+
+
+class ConstantSchedule:
+    def __init__(self, value):
+        self.epsilon = value
+
+    def value(self, step):
+        return self.epsilon
+
+
+class LinearSchedule:
+    def __init__(self, start, end, steps):
+        self.start = start
+        self.end = end
+        self.steps = steps
+
+    def value(self, step):
+        fraction = min(step / self.steps, 1.0) if self.steps > 0 else 1.0
+        return self.start + fraction * (self.end - self.start)
+
+
+class ExponentialSchedule:
+    def __init__(self, start, end, decay):
+        self.start = start
+        self.end = end
+        self.decay = decay
+
+    def value(self, step):
+        return max(self.end, self.start * self.decay ** step)
+
+
+class PiecewiseSchedule:
+    def __init__(self, points):
+        # points: lista di (passo, epsilon) in ordine di passo; prima del primo e dopo l'ultimo resta costante
+        self.steps = [float(s) for s, _ in points]
+        self.values = [float(v) for _, v in points]
+
+    def value(self, step):
+        return float(np.interp(step, self.steps, self.values))
+
+
+class LadderSchedule:
+    # Ape-X: l'attore i (su N) esplora con epsilon = base ** (1 + alpha * i / (N - 1)), per sempre.
+    # Alcuni attori esplorano molto (0.4), altri quasi niente (0.4^8 ≈ 0.0007): i dati coprono
+    # tutti i livelli di esplorazione senza dover decidere quando abbassare epsilon.
+    def __init__(self, num_actors, base=0.4, alpha=7.0):
+        i = np.arange(num_actors)
+        exponent = 1 + alpha * i / max(num_actors - 1, 1)
+        self.epsilons = (base ** exponent).astype(np.float32)
+
+    def value(self, step):
+        return self.epsilons # un valore per attore (select_actions accetta un epsilon per riga)
+
+
+class Exploration:
+    def __init__(self, schedule, clock='steps'):
+        if clock not in ('steps', 'updates'):
+            raise ValueError(f"Orologio sconosciuto: {clock!r} (usa 'steps' o 'updates')")
+        self.schedule = schedule
+        self.clock = clock
+        self.steps = 0 # frame giocati esplorando da questo agente
+
+    def value(self, agent):
+        step = self.steps if self.clock == 'steps' else agent.learn_steps
+        return self.schedule.value(step)
+
+    def tick(self, n=1):
+        # chiamato per ogni frame (o esperienza) in cui l'agente ha giocato esplorando
+        self.steps += n
+
+
+def parse_schedule(spec, num_actors=1):
+    # 'tipo:argomenti' -> schedule (vedi in cima al file)
+    kind, _, args = spec.partition(':')
+    if kind == 'const':
+        return ConstantSchedule(float(args))
+    if kind == 'linear':
+        start, end, steps = args.split(',')
+        return LinearSchedule(float(start), float(end), int(float(steps)))
+    if kind == 'exp':
+        start, end, decay = args.split(',')
+        return ExponentialSchedule(float(start), float(end), float(decay))
+    if kind == 'piecewise':
+        points = [point.split('=') for point in args.split(',')]
+        return PiecewiseSchedule([(float(s), float(v)) for s, v in points])
+    if kind == 'ladder':
+        values = [float(v) for v in args.split(',')] if args else []
+        return LadderSchedule(num_actors, *values)
+    raise ValueError(f"Schedule sconosciuta: {spec!r}")
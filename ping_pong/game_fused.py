@@ -0,0 +1,289 @@
+import math
+from game import (WIDTH, HEIGHT, BALL_SIZE, PADDLE_WIDTH, PADDLE_HEIGHT, MAX_BALL_VY, BALL_ACCELERATION,
+                  REWARDS, reset_game, move_ball_x)
+from trajectory import NO_ARRIVAL_FRAMES
+
+# Backend "fused" della fisica e delle reward: STESSA logica di game.py (che resta il riferimento),
+# ma ogni funzione legge i valori di game_state una volta sola in variabili locali, fa i conti
+# e riscrive solo alla fine. In game.py ogni frame fa decine di accessi al dizionario e chiamate a funzioni
+# piccole (calculate_bounce_angle, predict_y...): qui sono tutte inline.
+# Le operazioni sono nello stesso ordine dell'originale, quindi i risultati sono identici bit per bit
+# (lo verifica backends.check_equivalence). Se si cambia una reward in game.py va cambiata anche qui.
+
+# accelerazione per azione della palla (0-6), come la catena di if di steer_ball()
+STEER_ACCEL = (-BALL_ACCELERATION * 2.0, -BALL_ACCELERATION * 1.0, -BALL_ACCELERATION * 0.5, 0,
+               BALL_ACCELERATION * 0.5, BALL_ACCELERATION * 1.0, BALL_ACCELERATION * 2.0)
+
+BORDER_THRESHOLD = HEIGHT * 0.20
+INTERMEDIATE_THRESHOLD = HEIGHT * 0.35
+HALF_PADDLE = PADDLE_HEIGHT / 2
+
+
+def steer_ball(game_state, action_ball):
+    accel = STEER_ACCEL[action_ball] if 0 <= action_ball <= 6 else 0
+    ball_vy = game_state['ballVY'] + accel
+    ball_vy = max(-MAX_BALL_VY, min(MAX_BALL_VY, ball_vy))
+    game_state['ballVY'] = ball_vy
+    game_state['ballY'] += ball_vy
+
+
+def physics(game_state, action):
+    ball_x = game_state['ballX']
+    ball_y = game_state['ballY']
+    ball_vx = game_state['ballVX']
+    ball_vy = game_state['ballVY']
+    paddle1_y = game_state['paddle1Y']
+    paddle2_y = game_state['paddle2Y']
+
+    # rimbalzi pareti
+    if ball_y <= 0:
+        ball_y = 0
+        ball_vy = abs(ball_vy)
+    elif ball_y >= HEIGHT - BALL_SIZE:
+        ball_y = HEIGHT - BALL_SIZE
+        ball_vy = -abs(ball_vy)
+
+    # rimbalzo paddle 1 (calculate_bounce_angle inline)
+    if ball_x <= PADDLE_WIDTH and ball_y + BALL_SIZE >= paddle1_y and ball_y <= paddle1_y + PADDLE_HEIGHT:
+        angle = (ball_y - (paddle1_y + PADDLE_HEIGHT / 2)) / (PADDLE_HEIGHT / 2) * 60
+        speed = math.sqrt(ball_vx**2 + ball_vy**2)
+        ball_vx = speed * math.cos(math.radians(angle))
+        ball_vy = speed * math.sin(math.radians(angle))
+
+    # rimbalzo paddle 2
+    if ball_x >= WIDTH - PADDLE_WIDTH - BALL_SIZE and ball_y + BALL_SIZE >= paddle2_y and ball_y <= paddle2_y + PADDLE_HEIGHT:
+        angle = (ball_y - (paddle2_y + PADDLE_HEIGHT / 2)) / (PADDLE_HEIGHT / 2) * 60
+        speed = math.sqrt(ball_vx**2 + ball_vy**2)
+        ball_vx = - speed * math.cos(math.radians(angle))
+        ball_vy = speed * math.sin(math.radians(angle))
+
+    # AI semplice paddle 2
+    center_paddle2 = paddle2_y + PADDLE_HEIGHT / 2
+    if ball_y > center_paddle2:
+        paddle2_y += 4
+    elif ball_y < center_paddle2:
+        paddle2_y -= 4
+
+    # paddle 1 (DQN)
+    if action == 0:
+        paddle1_y -= 4
+    elif action == 2:
+        paddle1_y += 4
+
+    game_state['ballY'] = ball_y
+    game_state['ballVX'] = ball_vx
+    game_state['ballVY'] = ball_vy
+    game_state['paddle2Y'] = max(0, min(HEIGHT - PADDLE_HEIGHT, paddle2_y))
+    game_state['paddle1Y'] = max(0, min(HEIGHT - PADDLE_HEIGHT, paddle1_y))
+
+
+def calculate_reward(game_state):
+    ball_x = game_state['ballX']
+
+    # eventi terminali (le predizioni in game.py vengono calcolate prima ma non servono al gol)
+    if ball_x > WIDTH:
+        game_state['score1'] += 1
+        reset_game(game_state)
+        return REWARDS['paddle_goal'], True
+    elif ball_x < 0:
+        game_state['score2'] += 1
+        reset_game(game_state)
+        return -REWARDS['paddle_goal'], True
+
+    ball_y = game_state['ballY']
+    ball_vx = game_state['ballVX']
+    ball_vy = game_state['ballVY']
+    paddle1_y = game_state['paddle1Y']
+
+    paddle_center = paddle1_y + PADDLE_HEIGHT / 2
+    ball_center = ball_y + BALL_SIZE / 2
+    distance_to_ball = abs(paddle_center - ball_center)
+    ball_in_my_half = ball_x < WIDTH / 2
+    ball_coming_to_me = ball_vx < 0
+
+    # hit
+    if ball_x <= PADDLE_WIDTH and ball_y + BALL_SIZE >= paddle1_y and ball_y <= paddle1_y + PADDLE_HEIGHT and ball_coming_to_me:
+        if distance_to_ball < 5:
+            precision_bonus = 15
+        elif distance_to_ball < 10:
+            precision_bonus = 8
+        elif distance_to_ball < 15:
+            precision_bonus = 4
+        else:
+            precision_bonus = 1
+        return REWARDS['paddle_hit'] + precision_bonus + (10 if distance_to_ball > 10 else 0), False
+
+    reward = 0
+
+    # controllo dello spazio
+    ball_y_normalized = ball_center / HEIGHT
+    paddle_y_normalized = paddle_center / HEIGHT
+    if ball_in_my_half and 0.35 < ball_y_normalized < 0.65 and 0.35 < paddle_y_normalized < 0.65:
+        reward += 3
+
+    # palla in zona svantaggiosa
+    if ball_in_my_half and (ball_y_normalized < 0.20 or ball_y_normalized > 0.80):
+        if distance_to_ball < PADDLE_HEIGHT / 2:
+            reward += 4
+        else:
+            reward += 2
+
+    if ball_in_my_half:
+        if ball_coming_to_me:
+            # anticipazione: predizione inline (trajectory.frames_to_arrival + predict_y)
+            frames_to_arrival = abs(ball_x - PADDLE_WIDTH) / abs(ball_vx) if ball_vx != 0 else NO_ARRIVAL_FRAMES
+            if frames_to_arrival < 20:
+                predicted_ball_y = (ball_y + ball_vy * frames_to_arrival) % (2 * HEIGHT)
+                if predicted_ball_y > HEIGHT:
+                    predicted_ball_y = 2 * HEIGHT - predicted_ball_y
+                distance_to_predicted = abs(paddle_center - (predicted_ball_y + BALL_SIZE / 2))
+                if distance_to_predicted < 8:
+                    reward += 5
+                elif distance_to_predicted < 15:
+                    reward += 3
+                elif distance_to_predicted < 25:
+                    reward += 1
+                else:
+                    reward -= 3
+                if frames_to_arrival > 10 and distance_to_predicted < 10:
+                    reward += 3
+            else:
+                if distance_to_ball < 10:
+                    reward += 2
+                elif distance_to_ball < 20:
+                    reward += 1
+        else:
+            # caccia
+            if distance_to_ball < 15:
+                reward += 2
+            distance_from_center = abs(paddle_center - HEIGHT / 2)
+            if distance_from_center < 15:
+                reward += 1.5
+            elif distance_from_center > 30:
+                reward -= 1
+    else:
+        # posizione difensiva: dove sarà la palla tra 30 frame
+        future_ball_y = (ball_y + ball_vy * 30) % (2 * HEIGHT)
+        if future_ball_y > HEIGHT:
+            future_ball_y = 2 * HEIGHT - future_ball_y
+        distance_to_future_position = abs(paddle_center - (future_ball_y + BALL_SIZE / 2))
+        if distance_to_future_position < 20:
+            reward += 3
+        elif distance_to_future_position < 40:
+            reward += 1.5
+        elif abs(paddle_center - HEIGHT / 2) < 10:
+            reward += 1
+
+    # bordi
+    if paddle1_y <= 5:
+        reward -= 3
+    elif paddle1_y >= HEIGHT - PADDLE_HEIGHT - 5:
+        reward -= 3
+
+    # copertura verticale
+    coverage = (min(HEIGHT, paddle_center + PADDLE_HEIGHT) - max(0, paddle_center - PADDLE_HEIGHT)) / HEIGHT
+    if coverage > 0.4:
+        reward += 1
+
+    return reward, False
+
+
+def calculate_reward_ball(game_state, action_ball):
+    ball_x = game_state['ballX']
+    ball_y = game_state['ballY']
+    ball_vx = game_state['ballVX']
+    ball_vy = game_state['ballVY']
+
+    ball_center_y = ball_y + BALL_SIZE / 2
+    distance_from_top = ball_y
+    distance_from_bottom = HEIGHT - (ball_y + BALL_SIZE)
+
+    # fasce: 0 = centro, 1 = intermedia, 2 = soffitto, 3 = pavimento
+    if distance_from_top < BORDER_THRESHOLD:
+        zone = 2
+        reward_ball = 0 + -50 * (1 + distance_from_top / BORDER_THRESHOLD)**2
+    elif distance_from_bottom < BORDER_THRESHOLD:
+        zone = 3
+        reward_ball = 0 + -50 * (1 + distance_from_bottom / BORDER_THRESHOLD)**2
+    elif distance_from_top < INTERMEDIATE_THRESHOLD or distance_from_bottom < INTERMEDIATE_THRESHOLD:
+        zone = 1
+        reward_ball = 0
+    else:
+        zone = 0
+        reward_ball = 5
+
+    # gol con premio precisione (sostituisce la reward della fascia)
+    if ball_x < 0 or ball_x > WIDTH:
+        precision_factor = 1.0 - (abs(ball_center_y - HEIGHT / 2) / (HEIGHT / 2))
+        reward_ball = REWARDS['ball_goal'] + REWARDS['ball_precision_bonus'] * (precision_factor ** 3)
+
+    # colpita da un paddle
+    if ((ball_x <= PADDLE_WIDTH and ball_y + BALL_SIZE >= game_state['paddle1Y'] and
+         ball_y <= game_state['paddle1Y'] + PADDLE_HEIGHT and ball_vx < 0) or
+        (ball_x >= WIDTH - PADDLE_WIDTH - BALL_SIZE and ball_y + BALL_SIZE >= game_state['paddle2Y'] and
+         ball_y <= game_state['paddle2Y'] + PADDLE_HEIGHT and ball_vx > 0)):
+        return REWARDS['ball_hit'], False
+
+    # movimento
+    if 'prev_ball_y' in game_state:
+        y_change = abs(ball_y - game_state['prev_ball_y'])
+        if y_change > 3:
+            reward_ball += 5
+        elif y_change > 1:
+            reward_ball += 2
+        elif y_change < 0.5:
+            reward_ball -= 5
+    game_state['prev_ball_y'] = ball_y
+
+    # velocità verticale
+    speed_y = abs(ball_vy)
+    if speed_y > 3:
+        reward_ball += 3
+    elif speed_y < 1.5:
+        reward_ball -= 8
+
+    # tempo ai bordi, direzione di uscita e azione che spinge verso il bordo
+    if zone == 2:
+        frames_at_top = game_state.get('frames_at_top', 0) + 1
+        game_state['frames_at_top'] = frames_at_top
+        game_state['frames_at_bottom'] = 0
+        reward_ball += -3 * frames_at_top
+        if frames_at_top > 20:
+            reward_ball -= 100
+        if ball_vy > 1.0:
+            reward_ball += 15
+        elif ball_vy < -1.0:
+            reward_ball -= 15
+        if action_ball in (0, 1, 2):
+            reward_ball -= 20
+    elif zone == 3:
+        frames_at_bottom = game_state.get('frames_at_bottom', 0) + 1
+        game_state['frames_at_top'] = 0
+        game_state['frames_at_bottom'] = frames_at_bottom
+        reward_ball += -3 * frames_at_bottom
+        if frames_at_bottom > 20:
+            reward_ball -= 100
+        if ball_vy < -1.0:
+            reward_ball += 15
+        elif ball_vy > 1.0:
+            reward_ball -= 15
+        if action_ball in (4, 5, 6):
+            reward_ball -= 20
+    else:
+        game_state['frames_at_top'] = 0
+        game_state['frames_at_bottom'] = 0
+
+    # distanza dal paddle della metà campo in cui si trova
+    if ball_x < WIDTH / 2:
+        relevant_dist = abs((game_state['paddle1Y'] + HALF_PADDLE) - ball_center_y)
+    else:
+        relevant_dist = abs((game_state['paddle2Y'] + HALF_PADDLE) - ball_center_y)
+    if relevant_dist > PADDLE_HEIGHT:
+        reward_ball += 2
+    elif relevant_dist < PADDLE_HEIGHT / 2:
+        reward_ball -= 2
+
+    return reward_ball, False
+
+
+__all__ = ['move_ball_x', 'steer_ball', 'physics', 'calculate_reward', 'calculate_reward_ball']
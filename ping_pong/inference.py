@@ -0,0 +1,172 @@
+import argparse
+import copy
+import json
+import sys
+import threading
+import time
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+from brain import NETWORKS, build_network
+from env import VecPongEnv
+
+# Reti "da gioco" per gli attori su CPU: stessi pesi del cervello, forward più economico.
+#   'float'  copia normale della rete (riferimento)
+#   'script' TorchScript tracciato e congelato (torch.jit.freeze): niente overhead Python tra un layer e l'altro
+#   'int8'   quantizzazione dinamica dei Linear a int8 + TorchScript: pesi 4x più piccoli, conviene con reti larghe
+# Le azioni devono restare quelle della rete float: agreement() misura su stati veri di gioco quante
+# azioni greedy coincidono e l'errore sui valori Q. export_checked() lo fa anche a ogni pubblicazione
+# (DQNAgent.publish_actor, worker di actor_pool) su pochi stati tenuti da parte: sotto MIN_AGREEMENT
+# l'attore gioca con la copia float invece che con una rete che sceglie azioni diverse da quelle del learner.
+#
+#   python inference.py --weights runs/exp1 --min-agreement 0.99     # exit code 1 se sotto soglia
+#   python inference.py --network wide                                # rete casuale, solo latenza
+
+INFERENCE_MODES = ('float', 'script', 'int8')
+MIN_AGREEMENT = 0.99 # azioni uguali alla rete float sotto cui la rete esportata viene scartata
+CHECK_STATES = 512 # stati del controllo a ogni pubblicazione (~0.1 ms in tutto)
+CHECK_SEED = 12345 # stati diversi da quelli del report della riga di comando (seed 0)
+_check_states = {} # dimensione dello stato -> stati di controllo, raccolti una volta sola
+_export_lock = threading.Lock() # il tracing non regge due thread insieme (i learner di paddle e palla pubblicano in parallelo)
+
+
+def export_network(net, mode='float'):
+    # net non viene toccata: si lavora sempre su una copia (il cervello continua ad allenarsi)
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Modalità di inferenza sconosciuta: {mode!r} (usa {', '.join(INFERENCE_MODES)})")
+    frozen = copy.deepcopy(net).eval()
+    frozen.requires_grad_(False)
+    if mode == 'float':
+        return frozen
+    if mode == 'int8':
+        frozen = torch.ao.quantization.quantize_dynamic(frozen, {nn.Linear}, dtype=torch.qint8)
+    example = torch.zeros(1, net.fc1.in_features)
+    with _export_lock, torch.no_grad():
+        # il controllo sulle uscite lo fa agreement(), non serve ritracciare
+        return torch.jit.freeze(torch.jit.trace(frozen, example, check_trace=False))
+
+
+def sample_states(num_states=4096, seed=0):
+    # stati veri di gioco (paddle e palla) raccolti con VecPongEnv e azioni casuali
+    num_envs = 256
+    env = VecPongEnv(num_envs, seed=seed)
+    rng = np.random.default_rng(seed)
+    obs_p, obs_b = env.reset()
+    paddle, ball = [obs_p], [obs_b]
+    while len(paddle) * num_envs < num_states:
+        obs_p, obs_b, _, _, _ = env.step(rng.integers(0, 3, num_envs), rng.integers(0, 7, num_envs))
+        paddle.append(obs_p)
+        ball.append(obs_b)
+    return np.concatenate(paddle)[:num_states], np.concatenate(ball)[:num_states]
+
+
+def _held_out_states(input_dim):
+    if not _check_states:
+        paddle, ball = sample_states(CHECK_STATES, CHECK_SEED)
+        _check_states.update({paddle.shape[1]: paddle, ball.shape[1]: ball})
+    return _check_states.get(input_dim)
+
+
+def export_checked(net, mode='float', min_agreement=MIN_AGREEMENT):
+    # come export_network, ma una rete esportata che non sceglie le stesse azioni della float non esce:
+    # al suo posto una copia float (più lenta ma giusta) e un avviso
+    exported = export_network(net, mode)
+    states = _held_out_states(net.fc1.in_features) if mode != 'float' else None
+    if states is None:
+        return exported
+    result = agreement(net, exported, states)
+    if result['action_agreement'] < min_agreement:
+        # messaggio fisso: con il filtro di default di warnings l'avviso esce una volta sola per modalità
+        warnings.warn(f"rete {mode} sotto la concordanza minima ({min_agreement:.0%}) con la rete float: "
+                      f"l'attore gioca con la copia float (controlla con python inference.py)", RuntimeWarning)
+        return export_network(net, 'float')
+    return exported
+
+
+def agreement(reference, candidate, states):
+    # quanto la rete esportata si discosta dalla rete float sugli stessi stati
+    states = torch.as_tensor(states, dtype=torch.float32)
+    with torch.no_grad():
+        q_ref = reference(states)
+        q_new = candidate(states)
+    error = (q_ref - q_new).abs()
+    return {
+        'action_agreement': float((q_ref.argmax(1) == q_new.argmax(1)).float().mean()),
+        'max_abs_q_error': float(error.max()),
+        'mean_abs_q_error': float(error.mean()),
+    }
+
+
+def latency(net, states, number=2000):
+    # microsecondi per chiamata: una riga (come predict_action) e tutto il batch (come gli attori)
+    single = torch.as_tensor(states[:1], dtype=torch.float32)
+    batch = torch.as_tensor(states, dtype=torch.float32)
+    with torch.no_grad():
+        for _ in range(50):
+            net(single)
+        start = time.perf_counter()
+        for _ in range(number):
+            net(single)
+        per_call = (time.perf_counter() - start) / number
+        start = time.perf_counter()
+        for _ in range(max(1, number // 20)):
+            net(batch)
+        per_batch = (time.perf_counter() - start) / max(1, number // 20)
+    return {'batch1_us': per_call * 1e6, f'batch{len(states)}_us': per_batch * 1e6}
+
+
+def compare(net, states, modes=INFERENCE_MODES, number=2000, batch=256):
+    # latenza sulle prime batch righe, concordanza su tutti gli stati
+    report = {}
+    for mode in modes:
+        exported = export_network(net, mode)
+        report[mode] = {**latency(exported, states[:batch], number), **agreement(net, exported, states)}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latenza e concordanza delle reti esportate per gli attori (TorchScript, int8)")
+    parser.add_argument('--weights', default=None, help="cartella con paddle.pth/ball.pth o un checkpoint (senza = reti casuali)")
+    parser.add_argument('--network', default='default', choices=sorted(NETWORKS), help="architettura delle reti casuali")
+    parser.add_argument('--modes', nargs='+', default=list(INFERENCE_MODES), choices=INFERENCE_MODES)
+    parser.add_argument('--states', type=int, default=4096, help="stati di gioco su cui confrontare le reti")
+    parser.add_argument('--batch', type=int, default=256, help="righe per la misura della latenza a batch")
+    parser.add_argument('--number', type=int, default=2000, help="chiamate per misura")
+    parser.add_argument('--threads', type=int, default=1, help="thread di PyTorch (gli attori ne usano 1)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="file JSON dove salvare il report")
+    parser.add_argument('--min-agreement', type=float, default=None, help="soglia sulle azioni uguali alla rete float (exit code 1 se sotto)")
+    args = parser.parse_args(argv)
+
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    paddle_states, ball_states = sample_states(args.states, args.seed)
+
+    if args.weights:
+        from evaluate import load_policy
+        nets = {'paddle': load_policy(args.weights, 'paddle'), 'ball': load_policy(args.weights, 'ball')}
+    else:
+        nets = {'paddle': build_network(5, 3, args.network).eval(), 'ball': build_network(6, 7, args.network).eval()}
+
+    report = {}
+    passed = True
+    for who, states in (('paddle', paddle_states), ('ball', ball_states)):
+        results = compare(nets[who], states, args.modes, args.number, args.batch)
+        report[who] = results
+        print(f"🧠 {who}")
+        for mode, r in results.items():
+            print(f"   {mode:<6} | batch 1: {r['batch1_us']:7.1f} us | batch {args.batch}: {r[f'batch{args.batch}_us']:8.1f} us | "
+                  f"azioni uguali: {r['action_agreement']:.2%} | errore Q max: {r['max_abs_q_error']:.4f}")
+            if args.min_agreement is not None and r['action_agreement'] < args.min_agreement:
+                print(f"❌ {who}/{mode}: concordanza {r['action_agreement']:.2%} sotto la soglia {args.min_agreement:.2%}")
+                passed = False
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
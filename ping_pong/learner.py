@@ -0,0 +1,98 @@
+import copy
+import threading
+import time
+from contextlib import contextmanager
+
+# Learner in background: separa l'addestramento dal game loop.
+# Il game loop (attore) si limita a produrre esperienze con remember(), mentre un thread separato
+# estrae i batch e fa i passi di Adam al proprio ritmo. Ogni publish_every aggiornamenti i pesi nuovi
+# vengono copiati nella rete che l'attore usa per scegliere le azioni.
+# NB: i calcoli di PyTorch rilasciano il GIL, quindi simulazione e backward girano davvero su core diversi
+# (con async_mode='threading' di Flask-SocketIO; con eventlet/gevent i thread diventano green thread)
+
+class Learner:
+    def __init__(self, agent, updates_per_step=1.0, publish_every=100, profiler=None, stage='train_step'):
+        self.agent = agent
+        self.profiler = profiler # se presente registra la durata di ogni aggiornamento come fase stage
+        self.stage = stage
+        self.updates_per_step = updates_per_step # quanti aggiornamenti fare per ogni esperienza prodotta
+        self.publish_every = publish_every # ogni quanti aggiornamenti pubblico i pesi all'attore
+
+        self.env_steps = 0 # esperienze ricevute dall'attore
+        self.updates = 0 # passi di addestramento fatti
+
+        # la memoria è condivisa tra attore e learner: il lock evita di campionare righe scritte a metà
+        self.lock = threading.Lock()
+        self.train_lock = threading.Lock() # tenuto dal thread durante ogni aggiornamento dei pesi
+        self._stop = threading.Event()
+        self._thread = None
+
+        # doppio buffer per la rete dell'attore: scrivo sempre nella copia che l'attore NON sta usando
+        # e poi scambio il riferimento (assegnazione atomica), così l'attore non vede mai pesi a metà
+        self._actors = [copy.deepcopy(agent.brain), copy.deepcopy(agent.brain)]
+        self._active = 0
+        for net in self._actors:
+            net.requires_grad_(False)
+        if agent.inference == 'float':
+            agent.actor = self._actors[self._active]
+        else:
+            agent.publish_actor() # rete esportata (TorchScript / int8): ogni pubblicazione ne crea una nuova
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.publish()
+
+    def remember(self, state, action, reward, next_state, done, discount=None):
+        # chiamato dal game loop al posto di agent.remember() + agent.train_step()
+        with self.lock:
+            self.agent.remember(state, action, reward, next_state, done, discount)
+            self.env_steps += 1
+
+    @contextmanager
+    def paused(self):
+        # ferma il learner tra un aggiornamento e l'altro (es. per salvare un checkpoint coerente)
+        with self.train_lock, self.lock:
+            yield
+
+    def publish(self):
+        if self.agent.inference != 'float':
+            self.agent.publish_actor()
+            return
+        idle = 1 - self._active
+        self._actors[idle].load_state_dict(self.agent.brain.state_dict())
+        self._active = idle
+        self.agent.actor = self._actors[idle]
+
+    def _run(self):
+        agent = self.agent
+        while not self._stop.is_set():
+            with self.lock:
+                ready = (len(agent.memory) >= agent.batch_size and
+                         self.updates < self.env_steps * self.updates_per_step)
+                if ready:
+                    batch = agent.memory.sample(agent.batch_size)
+
+            if not ready:
+                # niente da fare: l'attore non ha ancora prodotto abbastanza esperienze
+                time.sleep(0.001)
+                continue
+
+            with self.train_lock:
+                start = time.perf_counter()
+                td_errors = agent.learn(batch)
+                with self.lock:
+                    agent.update_priorities(batch, td_errors)
+                if self.profiler is not None and self.profiler.enabled:
+                    self.profiler.record(self.stage, time.perf_counter() - start)
+                self.updates += 1
+                if self.updates % self.publish_every == 0:
+                    self.publish()
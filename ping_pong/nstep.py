@@ -0,0 +1,82 @@
+import numpy as np
+
+# Ritorni a n passi: invece di (s, a, r, s') la memoria riceve (s, a, R, s_k, done, gamma^k) con
+#   R = r_0 + gamma * r_1 + ... + gamma^(k-1) * r_(k-1)
+# e k = n, oppure meno se nel frattempo la partita è finita (gol -> reset_game). Il bersaglio di Bellman
+# diventa R + gamma^k * max Q(s_k): un gol o un colpo arrivano fino a n frame indietro in un solo aggiornamento
+# invece di risalire un frame alla volta.
+#
+# Una finestra scorrevole di n passi per ogni partita. Tutte le partite avanzano insieme (VecPongEnv,
+# o una sola partita nel Trainer), quindi la finestra è un array (n, num_envs) e ogni add() restituisce
+# le esperienze dei passi che escono dalla finestra (num_envs righe, una volta piena).
+
+
+class NStepBuffer:
+    def __init__(self, n, gamma, num_envs=1, state_dim=5):
+        self.n = n
+        self.gamma = gamma
+        self.num_envs = num_envs
+        self.state_dim = state_dim
+        self.clear()
+
+    def clear(self):
+        # slot della finestra, dal più vecchio al più recente
+        self.states = []
+        self.actions = []
+        self.returns = [] # ritorno scontato accumulato finora
+        self.discounts = [] # gamma^k: sconto da applicare al valore dello stato finale
+        self.alive = [] # la partita di questo slot non è ancora finita: il ritorno continua ad accumulare
+        self.next_states = [] # stato finale (per gli slot chiusi da un gol resta quello del gol)
+
+    def __len__(self):
+        return len(self.states)
+
+    def add(self, states, actions, rewards, next_states, dones):
+        # un passo di tutte le partite; restituisce le esperienze complete (tuple di array) oppure None
+        rewards = np.asarray(rewards, dtype=np.float32)
+        dones = np.asarray(dones, dtype=bool)
+        next_states = np.asarray(next_states, dtype=np.float32)
+        for i in range(len(self.states)):
+            alive = self.alive[i]
+            self.returns[i] += np.where(alive, self.discounts[i] * rewards, 0.0).astype(np.float32)
+            self.discounts[i] = np.where(alive, self.discounts[i] * self.gamma, self.discounts[i]).astype(np.float32)
+            ended = alive & dones
+            self.next_states[i] = np.where(ended[:, None], next_states, self.next_states[i])
+            self.alive[i] = alive & ~dones
+
+        self.states.append(np.asarray(states, dtype=np.float32))
+        self.actions.append(np.asarray(actions, dtype=np.int64))
+        self.returns.append(rewards.copy())
+        self.discounts.append(np.full(self.num_envs, self.gamma, dtype=np.float32))
+        self.alive.append(~dones)
+        self.next_states.append(next_states.copy())
+
+        if len(self.states) < self.n:
+            return None
+        return self._pop(next_states)
+
+    def flush(self, next_states=None):
+        # chiude in anticipo tutti gli slot rimasti (es. cambio di turno: questo agente smette di imparare)
+        # gli slot ancora aperti fanno bootstrap dall'ultimo stato visto con il loro gamma^k
+        if not self.states:
+            return None
+        last = self.next_states[-1] if next_states is None else np.asarray(next_states, dtype=np.float32)
+        out = [self._pop(last) for _ in range(len(self.states))]
+        return tuple(np.concatenate(column) for column in zip(*out))
+
+    def _pop(self, last_next_states):
+        alive = self.alive.pop(0)
+        next_states = self.next_states.pop(0)
+        # chi è ancora aperto si ferma qui e fa bootstrap dallo stato più recente
+        next_states = np.where(alive[:, None], last_next_states, next_states)
+        return (self.states.pop(0), self.actions.pop(0), self.returns.pop(0), next_states,
+                (~alive).astype(np.float32), self.discounts.pop(0))
+
+    def state_dict(self):
+        # per i checkpoint: la finestra a metà fa parte dello stato dell'addestramento
+        return {name: [a.copy() for a in getattr(self, name)]
+                for name in ('states', 'actions', 'returns', 'discounts', 'alive', 'next_states')}
+
+    def load_state_dict(self, state):
+        for name, arrays in state.items():
+            setattr(self, name, [np.array(a) for a in arrays])
@@ -0,0 +1,106 @@
+import json
+import math
+import os
+import time
+
+# Tempi per fase del game loop (azione, fisica, reward, memoria, train_step, emit) per capire
+# quale parte rallenta quando gli FPS calano. Uso:
+#
+#   t = profiler.now()
+#   ... azione ...
+#   t = profiler.lap('action', t)
+#   ... fisica ...
+#   t = profiler.lap('physics', t)
+#
+# Con enabled=False now() e lap() ritornano subito 0.0: il costo è una chiamata a funzione per fase.
+
+class Histogram:
+    # istogramma a bucket logaritmici (8 per ogni raddoppio, da 100ns a ~20s):
+    # memoria fissa, inserimento O(1) e percentili con errore relativo < 10%
+    MIN_SECONDS = 1e-7
+    BUCKETS_PER_OCTAVE = 8
+    NUM_BUCKETS = 8 * 28
+
+    def __init__(self):
+        self.counts = [0] * self.NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds > self.MIN_SECONDS:
+            i = min(int(math.log2(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_OCTAVE), self.NUM_BUCKETS - 1)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= target:
+                # centro (geometrico) del bucket, senza superare il massimo visto davvero
+                return min(self.MIN_SECONDS * 2 ** ((i + 0.5) / self.BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+    def summary(self):
+        # tutto in microsecondi, più leggibile per fasi che durano pochi µs
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count * 1e6 if self.count else 0.0,
+            'p50_us': self.percentile(0.50) * 1e6,
+            'p95_us': self.percentile(0.95) * 1e6,
+            'p99_us': self.percentile(0.99) * 1e6,
+            'max_us': self.max * 1e6,
+            'total_s': self.total,
+        }
+
+
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.started = time.time()
+
+    def now(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, name, start):
+        # registra il tempo trascorso da start nella fase name e ritorna l'istante attuale (inizio della fase dopo)
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.record(name, now - start)
+        return now
+
+    def record(self, name, seconds):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.add(seconds)
+
+    def reset(self):
+        self.histograms = {}
+        self.started = time.time()
+
+    def snapshot(self):
+        return {
+            'enabled': self.enabled,
+            'seconds': time.time() - self.started, # da quanto tempo raccolgo i dati (dall'ultimo reset)
+            'stages': {name: h.summary() for name, h in list(self.histograms.items())},
+        }
+
+    @staticmethod
+    def dump(path, stats):
+        # scrivo su un file temporaneo e poi lo rinomino: chi legge il file non lo trova mai scritto a metà
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(stats, f, indent=2)
+        os.replace(tmp, path)
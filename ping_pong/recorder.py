@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import queue
+import shutil
+import threading
+import numpy as np
+
+# Registrazione delle partite frame per frame, per controllare le reward su centinaia di milioni di frame
+# senza tenerli in RAM e senza rallentare il game loop.
+#
+# Recorder: record() scrive una riga in colonne NumPy preallocate (nessuna allocazione per frame).
+#   Quando il blocco da chunk_frames righe è pieno lo passa a un thread di scrittura e continua su un blocco nuovo:
+#   il game loop non aspetta mai il disco. Se il disco non sta dietro (coda piena) il blocco viene scartato e contato.
+# Su disco ogni blocco è una cartella chunk_000000/ con un .npy per colonna (tipi compatti: float32 per posizioni,
+#   velocità e reward, int8 per le azioni, un byte per done e fase): 52 byte a frame, e np.load(mmap_mode='r') li legge senza copiarli.
+#   Con compress=True ogni blocco è un unico chunk_000000.npz compresso (zlib): più piccolo, ma niente mmap,
+#   le colonne si decomprimono quando servono.
+# index.json elenca i blocchi scritti (aggiornato dopo ogni blocco): se il processo muore i dati fino all'ultimo blocco restano leggibili.
+# Un Recorder aperto su una cartella che ha già index.json aggiunge blocchi in coda (ripresa da checkpoint: i frame
+#   registrati dopo il checkpoint compaiono due volte, la colonna 'frame' li distingue).
+#
+# TrajectoryReader: accesso per colonna o per riga e filtri, un blocco alla volta.
+#   reader = TrajectoryReader('runs/prova/trajectory')
+#   reader.column('paddle_reward', 1_000_000, 2_000_000)
+#   for rows in reader.filter(lambda c: (c['who'] == 1) & (c['ball_reward'] < -5)): ...
+#   python recorder.py runs/prova/trajectory          # riepilogo delle reward per fase
+
+# colonna -> tipo su disco
+COLUMNS = {
+    'frame': np.int64,
+    'ballX': np.float32,
+    'ballY': np.float32,
+    'ballVX': np.float32,
+    'ballVY': np.float32,
+    'paddle1Y': np.float32,
+    'paddle2Y': np.float32,
+    'score1': np.int32,
+    'score2': np.int32,
+    'paddle_action': np.int8,
+    'ball_action': np.int8,
+    'paddle_reward': np.float32,
+    'ball_reward': np.float32, # NaN nei frame in cui la palla non impara (la sua reward non viene calcolata)
+    'done': np.bool_,
+    'who': np.uint8, # training_who: 0 = PADDLE, 1 = BALL
+}
+GAME_FIELDS = ('ballX', 'ballY', 'ballVX', 'ballVY', 'paddle1Y', 'paddle2Y', 'score1', 'score2')
+WHO_CODES = {'PADDLE': 0, 'BALL': 1}
+
+
+class Recorder:
+    def __init__(self, directory, chunk_frames=65536, compress=False, max_pending=8):
+        self.directory = directory
+        self.chunk_frames = chunk_frames
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+        self.chunks = [] # (nome, righe, primo frame) dei blocchi già su disco
+        self.frames = 0 # righe registrate (comprese quelle ancora in memoria)
+        self.dropped = 0 # righe perse perché il thread di scrittura era indietro
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._block = self._new_block()
+        self._rows = 0
+        self._next_chunk = 0
+        self._error = None
+        index_path = os.path.join(directory, 'index.json')
+        if os.path.exists(index_path):
+            # ripresa da checkpoint: continuo la registrazione esistente con i blocchi successivi
+            with open(index_path) as f:
+                index = json.load(f)
+            if index['compressed'] != compress:
+                raise ValueError(f"La registrazione in {directory} ha compressed={index['compressed']}")
+            self.chunks = [(c['name'], c['rows'], c['first_frame']) for c in index['chunks']]
+            self._next_chunk = len(self.chunks)
+        self._thread = threading.Thread(target=self._write_loop, name='recorder', daemon=True)
+        self._thread.start()
+
+    def _new_block(self):
+        return {name: np.zeros(self.chunk_frames, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    def record(self, frame, game_state, paddle_action, ball_action, paddle_reward, ball_reward, done):
+        # una riga per frame, chiamata dal game loop (Trainer.step)
+        i = self._rows
+        block = self._block
+        block['frame'][i] = frame
+        for name in GAME_FIELDS:
+            block[name][i] = game_state[name]
+        block['paddle_action'][i] = paddle_action
+        block['ball_action'][i] = ball_action
+        block['paddle_reward'][i] = paddle_reward
+        block['ball_reward'][i] = np.nan if ball_reward is None else ball_reward
+        block['done'][i] = done
+        block['who'][i] = WHO_CODES[game_state.get('training_who', 'PADDLE')]
+        self._rows += 1
+        self.frames += 1
+        if self._rows == self.chunk_frames:
+            self._submit()
+
+    def _submit(self):
+        if self._rows == 0:
+            return
+        block = self._block if self._rows == self.chunk_frames else {n: c[:self._rows] for n, c in self._block.items()}
+        try:
+            self._queue.put_nowait((self._next_chunk, block))
+            self._next_chunk += 1
+        except queue.Full:
+            self.dropped += self._rows # il disco non sta dietro: meglio perdere dati che fermare il gioco
+        self._block = self._new_block()
+        self._rows = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write_chunk(*item)
+            except Exception as e: # lo rilancio in close(), il thread non deve morire in silenzio
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write_chunk(self, number, block):
+        name = f'chunk_{number:06d}'
+        if self.compress:
+            tmp = os.path.join(self.directory, name + '.tmp.npz')
+            np.savez_compressed(tmp, **block)
+            os.replace(tmp, os.path.join(self.directory, name + '.npz'))
+        else:
+            tmp = os.path.join(self.directory, name + '.tmp')
+            os.makedirs(tmp, exist_ok=True)
+            for column, values in block.items():
+                np.save(os.path.join(tmp, column + '.npy'), values)
+            target = os.path.join(self.directory, name)
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(tmp, target) # il blocco compare tutto insieme o per niente
+        self.chunks.append((name, len(block['frame']), int(block['frame'][0])))
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            'columns': {name: np.dtype(dtype).name for name, dtype in COLUMNS.items()},
+            'compressed': self.compress,
+            'chunks': [{'name': n, 'rows': r, 'first_frame': f} for n, r, f in self.chunks],
+            'dropped': self.dropped,
+        }
+        tmp = os.path.join(self.directory, 'index.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, os.path.join(self.directory, 'index.json'))
+
+    def flush(self):
+        # scrive anche il blocco a metà (es. prima di un checkpoint o alla fine) e aspetta il disco
+        self._submit()
+        self._queue.join()
+
+    def stats(self):
+        return {'frames': self.frames, 'chunks': len(self.chunks), 'pending': self._queue.qsize(), 'dropped': self.dropped}
+
+    def close(self):
+        self._submit()
+        self._queue.put(None) # qui posso aspettare: il gioco è finito
+        self._thread.join()
+        self._write_index()
+        if self._error is not None:
+            raise self._error
+
+
+class TrajectoryReader:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+        self.compressed = index['compressed']
+        self.columns = list(index['columns'])
+        self.chunk_names = [c['name'] for c in index['chunks']]
+        rows = np.array([c['rows'] for c in index['chunks']], dtype=np.int64)
+        self.offsets = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(rows)]) # riga globale da cui parte ogni blocco
+        self._cache = {}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def chunk(self, i):
+        # colonne del blocco i: viste in mmap (nessuna lettura finché non servono) o colonne npz
+        if i not in self._cache:
+            path = os.path.join(self.directory, self.chunk_names[i])
+            if self.compressed:
+                self._cache[i] = np.load(path + '.npz') # NpzFile: decomprime una colonna solo quando la chiedo
+            else:
+                self._cache[i] = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in self.columns}
+        return self._cache[i]
+
+    def chunks(self, columns=None):
+        for i in range(len(self.chunk_names)):
+            data = self.chunk(i)
+            yield {name: data[name] for name in (columns or self.columns)}
+
+    def column(self, name, start=0, stop=None):
+        # righe [start, stop) di una colonna, leggendo solo i blocchi che le contengono
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = []
+        for i in range(len(self.chunk_names)):
+            lo, hi = self.offsets[i], self.offsets[i + 1]
+            if hi <= start or lo >= stop:
+                continue
+            parts.append(self.chunk(i)[name][max(start - lo, 0):min(stop, hi) - lo])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=COLUMNS[name])
+
+    def __getitem__(self, row):
+        # una riga come dizionario
+        if row < 0:
+            row += len(self)
+        i = int(np.searchsorted(self.offsets, row, side='right')) - 1
+        data = self.chunk(i)
+        return {name: data[name][row - self.offsets[i]].item() for name in self.columns}
+
+    def filter(self, condition, columns=None):
+        # condition(colonne del blocco) -> maschera booleana; restituisce le righe scelte blocco per blocco
+        for data in self.chunks():
+            mask = condition(data)
+            if mask.any():
+                yield {name: np.asarray(data[name][mask]) for name in (columns or self.columns)}
+
+    def reward_summary(self):
+        # per fase (PADDLE / BALL): frame, gol e statistiche delle reward dei due agenti, senza caricare tutto
+        summary = {}
+        for who, code in WHO_CODES.items():
+            totals = {'frames': 0, 'done': 0}
+            for agent in ('paddle', 'ball'):
+                totals[agent] = {'count': 0, 'sum': 0.0, 'sum_sq': 0.0, 'min': np.inf, 'max': -np.inf}
+            for data in self.chunks(['who', 'done', 'paddle_reward', 'ball_reward']):
+                mask = np.asarray(data['who']) == code
+                totals['frames'] += int(mask.sum())
+                totals['done'] += int(np.asarray(data['done'])[mask].sum())
+                for agent in ('paddle', 'ball'):
+                    values = np.asarray(data[agent + '_reward'])[mask].astype(np.float64)
+                    values = values[~np.isnan(values)]
+                    if len(values):
+                        t = totals[agent]
+                        t['count'] += len(values)
+                        t['sum'] += float(values.sum())
+                        t['sum_sq'] += float((values ** 2).sum())
+                        t['min'] = min(t['min'], float(values.min()))
+                        t['max'] = max(t['max'], float(values.max()))
+            for agent in ('paddle', 'ball'):
+                t = totals.pop(agent)
+                n = t['count']
+                mean = t['sum'] / n if n else 0.0
+                totals[agent] = {'count': n, 'mean': mean,
+                                 'std': float(np.sqrt(max(t['sum_sq'] / n - mean ** 2, 0.0))) if n else 0.0,
+                                 'min': t['min'] if n else 0.0, 'max': t['max'] if n else 0.0}
+            summary[who] = totals
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Riepilogo delle reward di una registrazione (Recorder)")
+    parser.add_argument('directory', help="cartella della registrazione (quella con index.json)")
+    parser.add_argument('--out', default=None, help="file JSON dove salvare il riepilogo")
+    args = parser.parse_args(argv)
+
+    reader = TrajectoryReader(args.directory)
+    print(f"📼 {len(reader)} frame in {len(reader.chunk_names)} blocchi")
+    summary = reader.reward_summary()
+    for who, totals in summary.items():
+        print(f"   {who:<6} | frame: {totals['frames']:>10} | gol: {totals['done']:>7}")
+        for agent in ('paddle', 'ball'):
+            r = totals[agent]
+            if r['count']:
+                print(f"          {agent:<6} reward media {r['mean']:8.3f} ± {r['std']:.3f} (min {r['min']:.2f}, max {r['max']:.2f})")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import os
+import json
+import numpy as np
+import torch
+from collections import namedtuple
+
+# un batch estratto dalla memoria: tensori già pronti per train_step
+# discounts: sconto del valore dello stato successivo (gamma, oppure gamma^k con i ritorni a n passi, vedi nstep.py)
+# weights e indices li riempie solo la memoria con priorità (pesi di importance sampling e posizioni campionate)
+Batch = namedtuple('Batch', ['states', 'actions', 'rewards', 'next_states', 'dones', 'discounts', 'weights', 'indices'],
+                   defaults=(None, None, None))
+
+class ReplayBuffer:
+    # memoria circolare (ring buffer) con array preallocati e contigui al posto della deque di tuple:
+    # inserimento O(1), campionamento con indici vettoriali e conversione in tensori senza copie aggiuntive
+    def __init__(self, capacity, state_dim, seed=None, gamma=0.99):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.gamma = gamma # sconto di default per le esperienze a un passo
+        self.rng = np.random.default_rng(seed)
+
+        # np.zeros non tocca le pagine finché non vengono scritte, quindi anche con capacity = 1M
+        # la memoria occupata cresce solo man mano che arrivano le esperienze
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.discounts = np.zeros(capacity, dtype=np.float32)
+
+        self.ptr = 0 # prossima posizione da scrivere
+        self.size = 0 # quante esperienze valide ci sono
+
+    def __len__(self):
+        return self.size
+
+    def push(self, state, action, reward, next_state, done, discount=None):
+        i = self.ptr
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.discounts[i] = self.gamma if discount is None else discount
+        # quando arrivo in fondo ricomincio da capo sovrascrivendo le esperienze più vecchie (come deque(maxlen))
+        self.ptr = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def push_batch(self, states, actions, rewards, next_states, dones, discounts=None):
+        # inserisce in un colpo solo le esperienze di tante partite (es. dall'ambiente vettoriale)
+        k = len(actions)
+        if discounts is None:
+            discounts = np.full(k, self.gamma, dtype=np.float32)
+        if k > self.capacity: # tengo solo le ultime, le altre verrebbero comunque sovrascritte
+            states, actions, rewards, next_states, dones, discounts = (
+                x[-self.capacity:] for x in (states, actions, rewards, next_states, dones, discounts))
+            k = self.capacity
+        idx = (self.ptr + np.arange(k)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = dones
+        self.discounts[idx] = discounts
+        self.ptr = (self.ptr + k) % self.capacity
+        self.size = min(self.size + k, self.capacity)
+        return idx
+
+    def sample(self, batch_size):
+        # estraggo gli indici tutti insieme (con reinserimento, costo indipendente dalla dimensione della memoria)
+        idx = self.rng.integers(0, self.size, size=batch_size)
+        return self._gather(idx)
+
+    # colonne della memoria salvate su disco, una per file .npy
+    COLUMNS = ('states', 'actions', 'rewards', 'next_states', 'dones', 'discounts')
+
+    def save(self, directory):
+        # ogni colonna in un file .npy binario (niente pickle): al caricamento lo leggo con mmap_mode,
+        # quindi anche una memoria da milioni di esperienze non viene mai duplicata in RAM
+        os.makedirs(directory, exist_ok=True)
+        for name in self.COLUMNS:
+            np.save(os.path.join(directory, name + '.npy'), getattr(self, name)[:self.size])
+        meta = {'ptr': self.ptr, 'size': self.size, 'capacity': self.capacity,
+                'rng': self.rng.bit_generator.state}
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def load(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['size'] > self.capacity:
+            raise ValueError(f"la memoria salvata ha {meta['size']} esperienze, la capacità è {self.capacity}")
+        for name in self.COLUMNS:
+            path = os.path.join(directory, name + '.npy')
+            if name == 'discounts' and not os.path.exists(path):
+                self.discounts[:meta['size']] = self.gamma # memorie salvate prima dei ritorni a n passi
+                continue
+            column = np.load(path, mmap_mode='r')
+            getattr(self, name)[:meta['size']] = column # copio a pezzi dal file mappato
+        self.size = meta['size']
+        # se la capacità è la stessa riprendo dallo stesso punto del ring, altrimenti scrivo dopo l'ultima
+        self.ptr = meta['ptr'] if meta['capacity'] == self.capacity else self.size % self.capacity
+        self.rng.bit_generator.state = meta['rng']
+
+    def _gather(self, idx):
+        # torch.from_numpy condivide la memoria con l'array estratto: nessuna copia oltre al gather
+        return Batch(
+            states=torch.from_numpy(self.states[idx]),
+            actions=torch.from_numpy(self.actions[idx]).unsqueeze(1),
+            rewards=torch.from_numpy(self.rewards[idx]).unsqueeze(1),
+            next_states=torch.from_numpy(self.next_states[idx]),
+            dones=torch.from_numpy(self.dones[idx]).unsqueeze(1),
+            discounts=torch.from_numpy(self.discounts[idx]).unsqueeze(1),
+        )
+
+
+class SumTree:
+    # albero binario salvato in un array: ogni nodo contiene la somma dei due figli, le foglie le priorità.
+    # La radice (posizione 1) è la somma totale; trovare la foglia che corrisponde a un valore in [0, totale)
+    # e aggiornare una priorità costano O(log n), e lo faccio per tutto il batch insieme livello per livello
+    def __init__(self, capacity):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves)
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, idx, priorities):
+        if np.ndim(idx) == 0:
+            # una sola foglia (push di un'esperienza alla volta): risalgo nodo per nodo con indici python,
+            # np.unique a ogni livello costava ~100 volte di più. Ricalcolo le somme dai figli (non aggiungo
+            # la differenza) così il risultato è identico a quello del percorso a batch
+            tree = self.tree
+            node = int(idx) + self.leaves
+            tree[node] = priorities
+            while node > 1:
+                node //= 2
+                tree[node] = tree[2 * node] + tree[2 * node + 1]
+            return
+        nodes = np.asarray(idx) + self.leaves
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def get(self, idx):
+        return self.tree[np.asarray(idx) + self.leaves]
+
+    def find(self, values):
+        # scendo dalla radice: se il valore supera la somma del figlio sinistro vado a destra e tolgo quella somma
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            go_right = values >= left
+            values = np.where(go_right, values - left, values)
+            nodes = 2 * nodes + go_right
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    # memoria con priorità: le esperienze con errore TD alto (gol, colpi del paddle...) vengono estratte più spesso.
+    # Probabilità proporzionale a (|errore TD| + eps)^alpha, e per non falsare la stima i pesi di
+    # importance sampling (N * P(i))^-beta correggono la loss; beta cresce fino a 1 durante l'addestramento
+    def __init__(self, capacity, state_dim, alpha=0.6, beta=0.4, beta_increment=1e-5, eps=1e-3, seed=None, gamma=0.99):
+        super().__init__(capacity, state_dim, seed, gamma)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.eps = eps
+        self.max_priority = 1.0 # le esperienze nuove entrano con la priorità massima così vengono viste almeno una volta
+
+    def push(self, state, action, reward, next_state, done, discount=None):
+        i = super().push(state, action, reward, next_state, done, discount)
+        self.tree.update(i, self.max_priority)
+        return i
+
+    def push_batch(self, states, actions, rewards, next_states, dones, discounts=None):
+        idx = super().push_batch(states, actions, rewards, next_states, dones, discounts)
+        self.tree.update(idx, self.max_priority)
+        return idx
+
+    def sample(self, batch_size):
+        # campionamento stratificato: divido il totale in batch_size segmenti e pesco un valore in ognuno
+        segment = self.tree.total() / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        idx = np.minimum(self.tree.find(values), self.size - 1)
+
+        probs = self.tree.get(idx) / self.tree.total()
+        weights = (self.size * probs) ** -self.beta
+        weights /= weights.max() # normalizzo così i pesi riducono soltanto i passi, non li gonfiano
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        batch = self._gather(idx)
+        return batch._replace(weights=torch.from_numpy(weights.astype(np.float32)).unsqueeze(1), indices=idx)
+
+    def save(self, directory):
+        super().save(directory)
+        np.save(os.path.join(directory, 'priorities.npy'), self.tree.get(np.arange(self.size)))
+        with open(os.path.join(directory, 'priority_meta.json'), 'w') as f:
+            json.dump({'max_priority': self.max_priority, 'beta': self.beta}, f)
+
+    def load(self, directory):
+        super().load(directory)
+        priorities = np.load(os.path.join(directory, 'priorities.npy'), mmap_mode='r')
+        self.tree.update(np.arange(self.size), priorities)
+        with open(os.path.join(directory, 'priority_meta.json')) as f:
+            meta = json.load(f)
+        self.max_priority = meta['max_priority']
+        self.beta = meta['beta']
+
+    def update_priorities(self, idx, td_errors):
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
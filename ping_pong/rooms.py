@@ -0,0 +1,242 @@
+import threading
+import time
+import numpy as np
+from brain import DQN, network_from_state_dict
+from broadcast import StateBroadcaster
+from env import VecPongEnv, scripted_paddle_actions
+from evaluate import PADDLE_BASELINES, BALL_BASELINES, load_policy
+from game import WIDTH, HEIGHT, PADDLE_HEIGHT
+from league import SnapshotPool
+
+# Stanze: tante partite indipendenti servite dallo stesso processo, per guardare e confrontare politiche
+# diverse fianco a fianco (prima serviva un processo e una porta per partita).
+# La stanza 'train' è la partita dell'addestramento (game_loop in app.py); le altre sono partite dimostrative
+# che NON imparano, ognuna con il suo seme (una riga di RoomEnv con il suo generatore)
+# e la sua versione delle reti:
+#   'latest'            la rete che si sta allenando adesso (ricopiata ogni refresh_every secondi)
+#   percorso            pesi salvati: .pth, cartella con paddle.pth/ball.pth o checkpoint (come evaluate.py)
+#   'scripted'          (paddle) va dove arriverà la palla      'straight' / 'random' (palla)
+#
+# RoomScheduler fa avanzare tutte le stanze insieme a ogni tick: gli stati di tutte le stanze finiscono in una
+# matrice e ogni agente fa UN forward per tick (le versioni stanno in una SnapshotPool per architettura e
+# il forward a batch raggruppa le righe per versione, vedi league.py), la fisica è UNO step di RoomEnv
+# e poi c'è l'invio stanza per stanza: ogni stanza ha il suo StateBroadcaster e i browser ricevono solo
+# la stanza che guardano (?room=nome).
+
+DEFAULT_ROOM = 'train' # la partita dell'addestramento
+
+
+class PolicyBank:
+    # versioni delle reti di un agente usate dalle stanze, una SnapshotPool per architettura
+    def __init__(self, who, agent, capacity=32):
+        self.who = who
+        self.agent = agent
+        self.capacity = capacity
+        self.baselines = PADDLE_BASELINES if who == 'PADDLE' else BALL_BASELINES
+        self.pools = {} # architettura -> SnapshotPool
+        self.versions = {} # specifica ('latest', percorso) -> (architettura, id): gli stessi pesi si caricano una volta sola
+        self.refs = {} # specifica -> quante stanze la usano: a zero la versione lascia il suo slot
+
+    def _live(self):
+        # con il Learner in background agent.actor è la copia stabile dei pesi; con reti esportate uso il cervello
+        return self.agent.actor if isinstance(self.agent.actor, DQN) else self.agent.brain
+
+    def resolve(self, spec):
+        if spec in self.baselines:
+            return spec
+        if spec not in self.versions:
+            net = self._live() if spec == 'latest' else load_policy(spec, self.who.lower())
+            input_dim, output_dim, config = network_from_state_dict(net.state_dict())
+            key = f"{input_dim}x{output_dim} {config}"
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = SnapshotPool(net, self.capacity)
+            if len(pool) == pool.capacity: # una versione in più ne toglierebbe una a qualche stanza
+                raise ValueError(f"Troppe versioni diverse per {self.who.lower()} (massimo {self.capacity})")
+            self.versions[spec] = (key, pool.add(net))
+        self.refs[spec] = self.refs.get(spec, 0) + 1
+        return self.versions[spec]
+
+    def release(self, spec):
+        # una stanza non usa più spec (chiusa, o creazione fallita a metà)
+        if spec in self.baselines:
+            return
+        self.refs[spec] -= 1
+        if self.refs[spec] == 0:
+            del self.refs[spec]
+            key, version = self.versions.pop(spec)
+            pool = self.pools[key]
+            pool.remove(version)
+            if len(pool) == 0:
+                del self.pools[key]
+
+    def refresh(self):
+        if 'latest' in self.versions:
+            key, version = self.versions['latest']
+            self.pools[key].update(version, self._live())
+
+    def act(self, states, versions, env, slots):
+        # un'azione greedy per riga: le righe con pesi fanno un forward per architettura, le baseline a parte
+        actions = np.zeros(len(versions), dtype=np.int64)
+        for key, pool in self.pools.items():
+            rows = [i for i, v in enumerate(versions) if isinstance(v, tuple) and v[0] == key]
+            if rows:
+                ids = np.array([versions[i][1] for i in rows])
+                actions[rows] = pool.q_values(states[rows], ids).argmax(1).numpy()
+        scripted = [i for i, v in enumerate(versions) if v == 'scripted']
+        if scripted:
+            j = slots[scripted]
+            actions[scripted] = scripted_paddle_actions(env.ball_x[j], env.ball_y[j], env.ball_vx[j], env.ball_vy[j], env.paddle1_y[j])
+        for i, v in enumerate(versions):
+            if v == 'straight':
+                actions[i] = 3 # nessuna accelerazione
+            elif v == 'random':
+                actions[i] = env.rngs[slots[i]].integers(0, 7) # generatore della stanza: la partita dipende solo dal suo seme
+        return actions
+
+
+class RoomEnv(VecPongEnv):
+    # VecPongEnv con una riga per stanza e un generatore per riga: la fisica di tutte le stanze è UN solo step
+    # vettoriale (con una partita per VecPongEnv il costo fisso di numpy si pagava stanza per stanza)
+    # e ogni stanza si gioca esattamente come VecPongEnv(1, seed=il suo seme).
+    # Le righe libere continuano a giocare da sole: costano come le altre e nessuno le guarda.
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.rngs = [np.random.default_rng(slot) for slot in range(capacity)]
+        self.reset()
+
+    def open(self, slot, seed):
+        # riga nuova per una stanza: stato iniziale come reset(), palla servita con il generatore della stanza
+        self.rngs[slot] = np.random.default_rng(seed)
+        self.paddle1_y[slot] = self.paddle2_y[slot] = (HEIGHT - PADDLE_HEIGHT) // 2
+        self.score1[slot] = self.score2[slot] = self.episode_count[slot] = 0
+        self.has_prev_ball_y[slot] = False
+        self.frames_at_top[slot] = self.frames_at_bottom[slot] = 0
+        mask = np.zeros(self.num_envs, dtype=bool)
+        mask[slot] = True
+        self._reset_ball(mask)
+
+    def _reset_ball(self, mask):
+        # stesse estrazioni di VecPongEnv._reset_ball con k = 1, ognuna dal generatore della sua riga
+        for slot in np.flatnonzero(mask):
+            rng = self.rngs[slot]
+            vy = float(rng.integers(-3, 4))
+            self.ball_x[slot] = WIDTH // 2
+            self.ball_y[slot] = HEIGHT // 2
+            self.ball_vx[slot] = 4.0 if rng.random() < 0.5 else -4.0
+            self.ball_vy[slot] = vy if vy != 0 else 1.0
+
+
+class Room:
+    def __init__(self, name, slot, seed=0, paddle='latest', ball='latest', broadcaster=None):
+        self.name = name
+        self.slot = slot # riga in RoomEnv
+        self.seed = seed
+        self.paddle = paddle
+        self.ball = ball
+        self.paddle_version = None
+        self.ball_version = None
+        self.broadcaster = broadcaster
+        self.frames = 0
+        self.game_state = {'training_who': 'DEMO', 'policy': f"{paddle} vs {ball}"}
+
+    def sync(self, env):
+        # game_state nello stesso formato della partita di addestramento (lo usano broadcaster e browser)
+        i = self.slot
+        self.game_state.update({
+            'ballX': float(env.ball_x[i]), 'ballY': float(env.ball_y[i]),
+            'ballVX': float(env.ball_vx[i]), 'ballVY': float(env.ball_vy[i]),
+            'paddle1Y': float(env.paddle1_y[i]), 'paddle2Y': float(env.paddle2_y[i]),
+            'score1': int(env.score1[i]), 'score2': int(env.score2[i]),
+        })
+
+    def info(self):
+        return {'name': self.name, 'seed': self.seed, 'paddle': self.paddle, 'ball': self.ball,
+                'frames': self.frames, 'score': [self.game_state['score1'], self.game_state['score2']],
+                'clients': self.broadcaster.clients if self.broadcaster is not None else 0}
+
+
+class RoomScheduler:
+    def __init__(self, agent, ball_agent, socketio=None, max_rooms=16, fps=60, emit_hz=60, refresh_every=1.0, capacity=32):
+        self.socketio = socketio
+        self.max_rooms = max_rooms
+        self.fps = fps # tick al secondo per TUTTE le stanze
+        self.emit_hz = emit_hz
+        self.refresh_every = refresh_every # ogni quanti secondi le stanze 'latest' ricopiano i pesi in allenamento
+        self.banks = {'PADDLE': PolicyBank('PADDLE', agent, capacity), 'BALL': PolicyBank('BALL', ball_agent, capacity)}
+        self.env = RoomEnv(max_rooms)
+        self.obs_p, self.obs_b = self.env.observe_paddle(), self.env.observe_ball()
+        self.rooms = {}
+        self.lock = threading.Lock() # le stanze si creano e si chiudono dalle route HTTP mentre il tick gira
+        self.ticks = 0
+        self.tick_seconds = 0.0 # durata dell'ultimo tick
+        self.last_refresh = 0.0
+
+    def add_room(self, name, seed=0, paddle='latest', ball='latest'):
+        with self.lock:
+            if name == DEFAULT_ROOM or name in self.rooms:
+                raise ValueError(f"La stanza {name!r} esiste già")
+            free = sorted(set(range(self.max_rooms)) - {room.slot for room in self.rooms.values()})
+            if not free:
+                raise ValueError(f"Troppe stanze (massimo {self.max_rooms})")
+            broadcaster = StateBroadcaster(self.socketio, self.emit_hz, room=name) if self.socketio is not None else None
+            room = Room(name, free[0], seed, paddle, ball, broadcaster)
+            room.paddle_version = self.banks['PADDLE'].resolve(paddle)
+            try:
+                room.ball_version = self.banks['BALL'].resolve(ball)
+            except Exception:
+                self.banks['PADDLE'].release(paddle) # la versione del paddle non deve restare occupata
+                raise
+            self.env.open(room.slot, seed)
+            self.obs_p, self.obs_b = self.env.observe_paddle(), self.env.observe_ball()
+            room.sync(self.env)
+            self.rooms[name] = room
+            return room
+
+    def remove_room(self, name):
+        with self.lock:
+            room = self.rooms.pop(name, None)
+            if room is None:
+                return False
+            self.banks['PADDLE'].release(room.paddle)
+            self.banks['BALL'].release(room.ball)
+            return True
+
+    def step(self):
+        # un frame per ogni stanza: un forward per agente per tutte le stanze, uno step di fisica per tutte,
+        # poi l'invio stanza per stanza
+        start = time.perf_counter()
+        with self.lock:
+            rooms = list(self.rooms.values())
+            if not rooms:
+                return 0
+            if time.time() - self.last_refresh >= self.refresh_every:
+                for bank in self.banks.values():
+                    bank.refresh()
+                self.last_refresh = time.time()
+            slots = np.array([room.slot for room in rooms])
+            paddle_actions = np.ones(self.max_rooms, dtype=np.int64) # righe libere: paddle fermo, palla dritta
+            ball_actions = np.full(self.max_rooms, 3, dtype=np.int64)
+            paddle_actions[slots] = self.banks['PADDLE'].act(self.obs_p[slots], [r.paddle_version for r in rooms], self.env, slots)
+            ball_actions[slots] = self.banks['BALL'].act(self.obs_b[slots], [r.ball_version for r in rooms], self.env, slots)
+            self.obs_p, self.obs_b, _, _, _ = self.env.step(paddle_actions, ball_actions)
+            for room in rooms:
+                room.frames += 1
+                room.sync(self.env)
+                if room.broadcaster is not None:
+                    room.broadcaster.publish(room.game_state)
+        self.ticks += 1
+        self.tick_seconds = time.perf_counter() - start
+        return len(rooms)
+
+    def run(self):
+        # background task del server: fps tick al secondo (con zero stanze gira a vuoto)
+        while True:
+            start = time.time()
+            self.step()
+            remaining = 1.0 / self.fps - (time.time() - start)
+            self.socketio.sleep(max(remaining, 0.0))
+
+    def stats(self):
+        return {'rooms': len(self.rooms), 'ticks': self.ticks, 'tick_us': self.tick_seconds * 1e6,
+                'versions': {who.lower(): sum(len(p) for p in bank.pools.values()) for who, bank in self.banks.items()}}
@@ -0,0 +1,198 @@
+import time
+import numpy as np
+import torch
+from multiprocessing import shared_memory
+
+# Trasporto in memoria condivisa tra i worker di actor_pool.py e il processo principale, al posto di
+# multiprocessing.Queue (che fa pickle di ogni pacchetto, lo manda in una pipe e lo ricostruisce dall'altra parte).
+#
+# TransitionRing: un anello di record float32 a layout fisso per ogni worker (un solo scrittore, un solo lettore).
+#   Il worker scrive i record e poi pubblica il contatore head; il processo principale legge una vista
+#   (nessuna copia) dei record tra tail e head, li copia direttamente nella memoria dell'agente e avanza tail.
+#   Niente lock: head lo scrive solo il worker, tail solo il lettore (interi a 64 bit allineati).
+#   Se l'anello è pieno il worker aspetta (back-pressure) oppure, con policy='drop', scarta i record nuovi;
+#   attese e scarti vengono contati.
+#
+# SharedWeights: i parametri di una rete DQN in due slot (doppio buffer). Il learner scrive sempre nello slot
+#   che nessun attore sta usando e poi lo rende attivo (version + 1). Gli attori usano i parametri come viste
+#   sullo slot attivo (nessuna copia): quando la versione cambia spostano le viste sull'altro slot e lo
+#   confermano scrivendo la versione che usano. Se un attore è ancora sullo slot vecchio il learner non
+#   aspetta: salta la pubblicazione (contata in 'skipped') e riprova alla prossima.
+#
+# NB: l'ordine delle scritture (prima i dati, poi il contatore) è garantito su x86-64; su ARM servirebbe una barriera.
+
+# layout di un record: stato (6) | azione | reward | stato successivo (6) | done | sconto | chi impara
+STATE_SLOTS = 6 # il paddle usa i primi 5
+STATE, ACTION, REWARD, NEXT_STATE, DONE, DISCOUNT, WHO = 0, 6, 7, 8, 14, 15, 16
+RECORD_SIZE = 17
+WHO_CODES = {'PADDLE': 0.0, 'BALL': 1.0}
+
+
+def _attach(name):
+    # i worker (mp spawn) condividono il resource tracker del processo principale: il blocco lo distrugge
+    # solo chi l'ha creato, con close() -> unlink()
+    return shared_memory.SharedMemory(name=name)
+
+
+class TransitionRing:
+    HEAD, TAIL, DROPPED, WAITS = range(4) # contatori nell'intestazione (int64)
+    HEADER = 8 # int64 riservati
+
+    def __init__(self, capacity, policy='block', name=None):
+        if policy not in ('block', 'drop'):
+            raise ValueError(f"Policy sconosciuta: {policy!r} (usa 'block' o 'drop')")
+        self.capacity = capacity
+        self.policy = policy
+        size = self.HEADER * 8 + capacity * RECORD_SIZE * 4
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(create=True, size=size) if self.owner else _attach(name)
+        self._map()
+        if self.owner:
+            self.header[:] = 0
+
+    def _map(self):
+        self.header = np.ndarray(self.HEADER, dtype=np.int64, buffer=self.shm.buf)
+        self.records = np.ndarray((self.capacity, RECORD_SIZE), dtype=np.float32, buffer=self.shm.buf,
+                                  offset=self.HEADER * 8)
+
+    # con mp spawn l'anello arriva al worker per nome e lui si collega allo stesso blocco
+    def __getstate__(self):
+        return {'capacity': self.capacity, 'policy': self.policy, 'name': self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['capacity'], state['policy'], state['name'])
+
+    def __len__(self):
+        return int(self.header[self.HEAD] - self.header[self.TAIL])
+
+    def write(self, who, states, actions, rewards, next_states, dones, discounts, stop=None):
+        # lato worker: restituisce quanti record sono stati scritti (0 se scartati o se stop è stato impostato)
+        n = len(actions)
+        if n > self.capacity:
+            raise ValueError(f"{n} record non entrano in un anello da {self.capacity}")
+        head = int(self.header[self.HEAD])
+        if self.capacity - (head - int(self.header[self.TAIL])) < n:
+            if self.policy == 'drop':
+                self.header[self.DROPPED] += n
+                return 0
+            self.header[self.WAITS] += 1
+            while self.capacity - (head - int(self.header[self.TAIL])) < n:
+                if stop is not None and stop.is_set():
+                    return 0
+                time.sleep(0.0005)
+
+        dim = states.shape[1]
+        idx = (head + np.arange(n)) % self.capacity
+        block = np.zeros((n, RECORD_SIZE), dtype=np.float32)
+        block[:, STATE:STATE + dim] = states
+        block[:, ACTION] = actions
+        block[:, REWARD] = rewards
+        block[:, NEXT_STATE:NEXT_STATE + dim] = next_states
+        block[:, DONE] = dones
+        block[:, DISCOUNT] = discounts
+        block[:, WHO] = WHO_CODES[who]
+        self.records[idx] = block
+        self.header[self.HEAD] = head + n # pubblico solo dopo aver scritto i dati
+        return n
+
+    def peek(self, max_records=None):
+        # lato lettore: vista (senza copia) sui record pronti, contigui in memoria (al giro dell'anello si ferma
+        # alla fine: il resto arriva alla chiamata dopo). Dopo averli usati chiamare advance(len(vista))
+        tail = int(self.header[self.TAIL])
+        ready = int(self.header[self.HEAD]) - tail
+        start = tail % self.capacity
+        n = min(ready, self.capacity - start)
+        if max_records is not None:
+            n = min(n, max_records)
+        return self.records[start:start + n]
+
+    def advance(self, n):
+        self.header[self.TAIL] += n
+
+    def stats(self):
+        return {'written': int(self.header[self.HEAD]), 'read': int(self.header[self.TAIL]),
+                'pending': len(self), 'dropped': int(self.header[self.DROPPED]),
+                'waits': int(self.header[self.WAITS])}
+
+    def close(self):
+        self.header = self.records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedWeights:
+    VERSION, ACTIVE, PUBLISHED, SKIPPED = range(4)
+    HEADER = 4 # int64, seguiti da un int64 per attore (versione che sta usando)
+
+    def __init__(self, num_params, num_readers, name=None):
+        self.num_params = num_params
+        self.num_readers = num_readers
+        size = (self.HEADER + num_readers) * 8 + 2 * num_params * 4
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(create=True, size=size) if self.owner else _attach(name)
+        self._map()
+        if self.owner:
+            self.header[:] = 0
+            self.header[self.ACTIVE] = 1 # la prima pubblicazione scrive lo slot 0
+            self.acks[:] = 0
+
+    def _map(self):
+        self.header = np.ndarray(self.HEADER, dtype=np.int64, buffer=self.shm.buf)
+        self.acks = np.ndarray(self.num_readers, dtype=np.int64, buffer=self.shm.buf, offset=self.HEADER * 8)
+        self.slots = np.ndarray((2, self.num_params), dtype=np.float32, buffer=self.shm.buf,
+                                offset=(self.HEADER + self.num_readers) * 8)
+
+    def __getstate__(self):
+        return {'num_params': self.num_params, 'num_readers': self.num_readers, 'name': self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['num_params'], state['num_readers'], state['name'])
+
+    @classmethod
+    def for_network(cls, net, num_readers):
+        return cls(sum(p.numel() for p in net.parameters()), num_readers)
+
+    @property
+    def version(self):
+        return int(self.header[self.VERSION])
+
+    def publish(self, net):
+        # lato learner, senza lock e senza attese: False se qualche attore usa ancora lo slot libero
+        version = int(self.header[self.VERSION])
+        if (self.acks != version).any():
+            self.header[self.SKIPPED] += 1
+            return False
+        idle = 1 - int(self.header[self.ACTIVE])
+        offset = 0
+        with torch.no_grad():
+            for p in net.parameters():
+                n = p.numel()
+                self.slots[idle, offset:offset + n] = p.detach().reshape(-1).numpy()
+                offset += n
+        self.header[self.ACTIVE] = idle
+        self.header[self.VERSION] = version + 1 # pubblico solo dopo aver scritto i pesi
+        self.header[self.PUBLISHED] += 1
+        return True
+
+    def bind(self, net, reader):
+        # lato attore: i parametri di net diventano viste sullo slot attivo (nessuna copia), poi confermo la versione
+        version = int(self.header[self.VERSION])
+        slot = torch.from_numpy(self.slots[int(self.header[self.ACTIVE])])
+        offset = 0
+        for p in net.parameters():
+            n = p.numel()
+            p.data = slot[offset:offset + n].view_as(p)
+            offset += n
+        self.acks[reader] = version
+        return version
+
+    def stats(self):
+        return {'version': self.version, 'published': int(self.header[self.PUBLISHED]),
+                'skipped': int(self.header[self.SKIPPED])}
+
+    def close(self):
+        self.header = self.acks = self.slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,283 @@
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import random
+import time
+import numpy as np
+import torch
+
+# Ricerca degli iperparametri: tante run headless in parallelo (un processo per prova, un core ciascuno)
+# con stop anticipato in stile ASHA (successive halving asincrono).
+#
+#   python sweep.py --config sweep.json --out-dir runs/sweep1
+#
+# Ogni prova si allena fino al primo "gradino" (rung) di frame, viene valutata con evaluate.py e riporta
+# la metrica. Se al gradino è sotto il quantile (1 - 1/reduction_factor) delle prove che ci sono già arrivate
+# viene fermata, altrimenti continua fino al gradino dopo (frame * reduction_factor).
+# Lo stop è cooperativo: la prova ha un Event che controlla ogni STOP_CHECK frame ed esce da sola
+# (terminate() su un processo che sta scrivendo nella coda condivisa può corromperla o bloccarla).
+# Una prova non aspetta il verdetto e continua ad allenarsi: i report che ha già messo in coda
+# dopo essere stata fermata vengono ignorati.
+# La prima prova che arriva a un gradino continua sempre: nessuno aspetta nessuno.
+#
+# Le metriche intermedie finiscono in metrics.jsonl man mano che arrivano, la classifica in results.json/.csv.
+#
+# Nomi degli iperparametri in "space" / "fixed":
+#   lr, batch_size, gamma, memory_size, target_update, tau, prioritized ... -> DQNAgent (paddle e palla)
+#   paddle.lr, ball.gamma ...                                            -> solo per un agente
+#   epsilon, epsilon_min, epsilon_decay, swap_interval                    -> Trainer
+#   rewards.paddle_goal, rewards.ball_hit ...                            -> game.REWARDS
+# Distribuzioni: {"choice": [...]}, {"uniform": [a, b]}, {"log_uniform": [a, b]}, {"int_uniform": [a, b]}
+
+DEFAULT_CONFIG = {
+    'trials': 16,
+    'workers': None, # None = un processo per core
+    'seed': 0,
+    'min_frames': 20000, # frame del primo gradino
+    'max_frames': 540000, # frame massimi di una prova
+    'reduction_factor': 3, # solo il miglior 1/3 passa al gradino successivo
+    'metric': 'hit_rate_paddle1', # chiave del report di evaluate.py (anche annidata: 'precision_factor.mean')
+    'mode': 'max',
+    'eval_episodes': 512,
+    'eval_envs': 256,
+    'space': {
+        'lr': {'log_uniform': [1e-4, 3e-3]},
+        'batch_size': {'choice': [32, 64, 128]},
+        'gamma': {'uniform': [0.95, 0.995]},
+        'epsilon_decay': {'choice': [0.9999, 0.99999, 0.999999]},
+        'memory_size': {'choice': [10000, 50000, 100000]},
+        'swap_interval': {'choice': [5000, 10000, 20000]},
+    },
+    'fixed': {},
+}
+
+STOP_CHECK = 1000 # ogni quanti frame una prova guarda se le è stato chiesto di fermarsi
+TRAINER_KEYS = ('epsilon', 'epsilon_min', 'epsilon_decay', 'swap_interval', 'paddle_repeat', 'ball_repeat')
+
+
+def load_config(path=None):
+    config = json.loads(json.dumps(DEFAULT_CONFIG)) # copia profonda
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+def sample_params(space, fixed, rng):
+    params = {}
+    for name, dist in space.items():
+        (kind, values), = dist.items()
+        if kind == 'choice':
+            params[name] = values[int(rng.integers(len(values)))]
+        elif kind == 'uniform':
+            params[name] = float(rng.uniform(*values))
+        elif kind == 'log_uniform':
+            params[name] = float(math.exp(rng.uniform(math.log(values[0]), math.log(values[1]))))
+        elif kind == 'int_uniform':
+            params[name] = int(rng.integers(values[0], values[1] + 1))
+        else:
+            raise ValueError(f"Distribuzione sconosciuta per {name}: {kind}")
+    params.update(fixed)
+    return params
+
+
+def rungs(config):
+    # frame di ogni gradino: min_frames, min_frames * eta, ... fino a max_frames
+    frames, out = config['min_frames'], []
+    while frames < config['max_frames']:
+        out.append(frames)
+        frames *= config['reduction_factor']
+    out.append(config['max_frames'])
+    return out
+
+
+def split_params(params):
+    # smista gli iperparametri tra agenti, Trainer e reward
+    paddle_kwargs, ball_kwargs, trainer_kwargs, rewards = {}, {}, {}, {}
+    for name, value in params.items():
+        if name.startswith('rewards.'):
+            rewards[name[len('rewards.'):]] = value
+        elif name.startswith('paddle.'):
+            paddle_kwargs[name[len('paddle.'):]] = value
+        elif name.startswith('ball.'):
+            ball_kwargs[name[len('ball.'):]] = value
+        elif name in TRAINER_KEYS:
+            trainer_kwargs[name] = value
+        else:
+            paddle_kwargs.setdefault(name, value)
+            ball_kwargs.setdefault(name, value)
+    return paddle_kwargs, ball_kwargs, trainer_kwargs, rewards
+
+
+def metric_value(report, metric):
+    value = report
+    for key in metric.split('.'):
+        value = value[key]
+    return float(value)
+
+
+def run_trial(trial_id, params, rung_frames, config, out_dir, reports, stop):
+    # gira in un processo separato: le importazioni pesanti stanno qui per non rallentare il processo principale
+    import game
+    from brain import Agent, BallAgent
+    from trainer import Trainer
+    from evaluate import evaluate
+
+    torch.set_num_threads(1) # un core per prova, il parallelismo è tra le prove
+    seed = config['seed'] * 1000 + trial_id
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    paddle_kwargs, ball_kwargs, trainer_kwargs, rewards = split_params(params)
+    game.REWARDS.update(rewards)
+    agent = Agent(5, 3, seed=seed, **paddle_kwargs)
+    ball_agent = BallAgent(6, 7, seed=seed + 1, **ball_kwargs)
+    trainer = Trainer(agent, ball_agent, **trainer_kwargs)
+
+    trial_dir = os.path.join(out_dir, f'trial_{trial_id:03d}')
+    os.makedirs(trial_dir, exist_ok=True)
+    start = time.time()
+    for rung, frames in enumerate(rung_frames):
+        while trainer.frame_count < frames:
+            trainer.step()
+            if trainer.frame_count % STOP_CHECK == 0 and stop.is_set():
+                return # fermata da ASHA: esco pulito, la coda resta integra
+        report = evaluate(agent.brain, ball_agent.brain, config['eval_episodes'], config['eval_envs'], seed=seed)
+        torch.save(agent.brain.state_dict(), os.path.join(trial_dir, 'paddle.pth'))
+        torch.save(ball_agent.brain.state_dict(), os.path.join(trial_dir, 'ball.pth'))
+        reports.put({'trial': trial_id, 'rung': rung, 'frames': frames, 'seconds': time.time() - start,
+                     'value': metric_value(report, config['metric']), 'report': report})
+
+
+class ASHA:
+    # decide al volo, quando una prova arriva a un gradino, se deve continuare
+    def __init__(self, reduction_factor, mode='max'):
+        self.eta = reduction_factor
+        self.sign = 1.0 if mode == 'max' else -1.0
+        self.recorded = {} # gradino -> valori della metrica (già con il segno giusto)
+
+    def should_stop(self, rung, value):
+        # si ferma chi è sotto il quantile (1 - 1/eta) delle prove arrivate finora a questo gradino
+        values = self.recorded.setdefault(rung, [])
+        values.append(self.sign * value)
+        cutoff = np.percentile(values, (1 - 1 / self.eta) * 100)
+        return self.sign * value < cutoff
+
+
+def run_sweep(config, out_dir, target=run_trial):
+    # target: funzione che gioca una prova (run_trial; i test ne passano una finta e veloce)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+
+    rng = np.random.default_rng(config['seed'])
+    trials = [sample_params(config['space'], config['fixed'], rng) for _ in range(config['trials'])]
+    rung_frames = rungs(config)
+    workers = config['workers'] or os.cpu_count() or 1
+    scheduler = ASHA(config['reduction_factor'], config['mode'])
+
+    ctx = mp.get_context('spawn') # come actor_pool: niente fork con i thread di PyTorch
+    reports = ctx.Queue()
+    pending = list(range(len(trials)))
+    running = {} # trial -> (processo, Event di stop)
+    exiting = {} # trial -> processo fermato o finito, in attesa che esca (join senza bloccare il loop)
+    results = {i: {'trial': i, 'params': trials[i], 'status': 'pending', 'rung': -1, 'frames': 0,
+                   'value': None, 'history': []} for i in range(len(trials))}
+
+    print(f"🔍 Sweep: {len(trials)} prove, {workers} in parallelo, gradini {rung_frames}, metrica {config['metric']}")
+    with open(os.path.join(out_dir, 'metrics.jsonl'), 'a') as metrics_log:
+        while pending or running or exiting:
+            # avvio nuove prove finché ci sono core liberi
+            while pending and len(running) < workers:
+                i = pending.pop(0)
+                stop = ctx.Event()
+                proc = ctx.Process(target=target, args=(i, trials[i], rung_frames, config, out_dir, reports, stop), daemon=True)
+                proc.start()
+                running[i] = (proc, stop)
+                results[i]['status'] = 'running'
+
+            try:
+                msg = reports.get(timeout=1.0)
+            except queue.Empty:
+                msg = None
+
+            if msg is not None and msg['trial'] not in running:
+                msg = None # report arrivato dopo lo stop (la prova non aspetta il verdetto del gradino prima)
+
+            if msg is not None:
+                i = msg['trial']
+                metrics_log.write(json.dumps(msg) + '\n')
+                metrics_log.flush()
+                r = results[i]
+                r.update(rung=msg['rung'], frames=msg['frames'], value=msg['value'], seconds=msg['seconds'])
+                r['history'].append({'rung': msg['rung'], 'frames': msg['frames'], 'value': msg['value']})
+                last = msg['rung'] == len(rung_frames) - 1
+                stop = not last and scheduler.should_stop(msg['rung'], msg['value'])
+                print(f"   prova {i:3d} | gradino {msg['rung']} ({msg['frames']} frame) | "
+                      f"{config['metric']} = {msg['value']:.4f}{' -> STOP' if stop else ''}")
+                if stop or last:
+                    proc, stop_event = running.pop(i)
+                    stop_event.set()
+                    exiting[i] = proc
+                    r['status'] = 'stopped' if stop else 'completed'
+
+            # prove morte con un errore (chi finisce bene esce con 0 dopo aver mandato l'ultimo report)
+            for i, (proc, _) in list(running.items()):
+                if not proc.is_alive() and proc.exitcode != 0:
+                    results[i]['status'] = f'failed (exit {proc.exitcode})'
+                    del running[i]
+            for i, proc in list(exiting.items()):
+                if not proc.is_alive():
+                    proc.join()
+                    del exiting[i]
+
+    return write_results(results, config, out_dir)
+
+
+def write_results(results, config, out_dir):
+    # classifica: prima chi è arrivato più lontano, poi la metrica all'ultimo gradino raggiunto
+    sign = 1.0 if config['mode'] == 'max' else -1.0
+    ranked = sorted(results.values(),
+                    key=lambda r: (r['rung'], sign * r['value'] if r['value'] is not None else -math.inf),
+                    reverse=True)
+    for rank, r in enumerate(ranked, 1):
+        r['rank'] = rank
+
+    with open(os.path.join(out_dir, 'results.json'), 'w') as f:
+        json.dump(ranked, f, indent=2)
+
+    param_names = sorted({k for r in ranked for k in r['params']})
+    with open(os.path.join(out_dir, 'results.csv'), 'w') as f:
+        f.write(','.join(['rank', 'trial', 'status', 'rung', 'frames', config['metric']] + param_names) + '\n')
+        for r in ranked:
+            row = [r['rank'], r['trial'], r['status'], r['rung'], r['frames'], r['value']]
+            row += [r['params'].get(k) for k in param_names]
+            f.write(','.join('' if v is None else str(v) for v in row) + '\n')
+
+    print(f"\n🏆 Classifica ({config['metric']}, {config['mode']}):")
+    for r in ranked[:10]:
+        value = f"{r['value']:.4f}" if r['value'] is not None else '-'
+        print(f"   #{r['rank']:<3} prova {r['trial']:3d} | {r['status']:<9} | {r['frames']:>8} frame | {value} | {r['params']}")
+    print(f"📄 {os.path.join(out_dir, 'results.csv')}")
+    return ranked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep di iperparametri con prove parallele e stop anticipato (ASHA)")
+    parser.add_argument('--config', default=None, help="file JSON che sovrascrive DEFAULT_CONFIG")
+    parser.add_argument('--out-dir', default='runs/sweep', help="cartella per metriche, pesi delle prove e classifica")
+    parser.add_argument('--workers', type=int, default=None, help="processi in parallelo (default: uno per core)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if args.workers:
+        config['workers'] = args.workers
+    run_sweep(config, args.out_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# i moduli del progetto sono piatti (from brain import Agent): li rendo importabili dai test
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,22 @@
+import pytest
+import game
+from backends import BACKENDS, check_equivalence, get_backend
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_fused_matches_python(seed):
+    # stesse azioni e stessi reset: stato e reward identici (anche nel tipo) dopo ogni funzione
+    assert check_equivalence('fused', frames=20000, seed=seed) == []
+
+
+def test_fused_follows_reward_changes(monkeypatch):
+    # le reward lette da game.REWARDS (es. da sweep.py) valgono anche per il backend fused
+    monkeypatch.setitem(game.REWARDS, 'paddle_goal', 7)
+    monkeypatch.setitem(game.REWARDS, 'ball_hit', -3)
+    assert check_equivalence('fused', frames=5000, seed=2) == []
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend('cuda')
+    assert set(BACKENDS) == {'python', 'fused'}
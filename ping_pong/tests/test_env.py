@@ -0,0 +1,57 @@
+import random
+import numpy as np
+import pytest
+import game
+from env import VecPongEnv, scripted_paddle_actions
+
+
+def _serve_like(env, i, game_state):
+    # i due reset pescano da generatori diversi: dopo un gol copio nell'ambiente la palla rimessa da game.py
+    env.ball_x[i], env.ball_y[i] = game_state['ballX'], game_state['ballY']
+    env.ball_vx[i], env.ball_vy[i] = game_state['ballVX'], game_state['ballVY']
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_vec_env_matches_game(seed):
+    # una partita di VecPongEnv deve seguire game.py passo per passo: stesse posizioni, reward, gol e punteggi
+    random.seed(seed)
+    rng = random.Random(seed)
+    state = game.new_game_state()
+    env = VecPongEnv(1, seed=seed)
+    env.reset()
+    _serve_like(env, 0, state)
+    goals = 0
+    for _ in range(8000):
+        action = game.scripted_paddle_action(state) if rng.random() < 0.8 else rng.randint(0, 2)
+        action_ball = rng.randint(0, 6)
+        game.move_ball_x(state)
+        game.steer_ball(state, action_ball)
+        reward_ball, _ = game.calculate_reward_ball(state, action_ball)
+        game.physics(state, action)
+        reward, done = game.calculate_reward(state)
+
+        _, _, env_reward, env_reward_ball, env_done = env.step([action], [action_ball])
+        # le reward sono somme di molti termini fatte in un ordine diverso: uguali a meno degli arrotondamenti
+        assert env_reward[0] == pytest.approx(reward) and env_reward_ball[0] == pytest.approx(reward_ball)
+        assert bool(env_done[0]) == done
+        if done:
+            goals += 1
+            _serve_like(env, 0, state)
+        assert (env.ball_x[0], env.ball_y[0], env.ball_vx[0], env.ball_vy[0]) == \
+               (state['ballX'], state['ballY'], state['ballVX'], state['ballVY'])
+        assert (env.paddle1_y[0], env.paddle2_y[0]) == (state['paddle1Y'], state['paddle2Y'])
+        assert (env.score1[0], env.score2[0]) == (state['score1'], state['score2'])
+    assert goals > 0
+
+
+def test_scripted_paddle_actions_match_game():
+    env = VecPongEnv(512, seed=3)
+    env.reset()
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        env.step(rng.integers(0, 3, 512), rng.integers(0, 7, 512))
+        actions = scripted_paddle_actions(env.ball_x, env.ball_y, env.ball_vx, env.ball_vy, env.paddle1_y)
+        for i in range(0, 512, 17):
+            state = {'ballX': env.ball_x[i], 'ballY': env.ball_y[i], 'ballVX': env.ball_vx[i],
+                     'ballVY': env.ball_vy[i], 'paddle1Y': env.paddle1_y[i]}
+            assert actions[i] == game.scripted_paddle_action(state)
@@ -0,0 +1,21 @@
+import pytest
+import torch
+from brain import Agent, DQN
+from inference import export_checked
+
+
+def test_publish_keeps_agreeing_export():
+    torch.manual_seed(0)
+    agent = Agent(5, 3, inference='script')
+    assert isinstance(agent.actor, torch.jit.ScriptModule)
+
+
+def test_disagreeing_export_falls_back_to_float():
+    torch.manual_seed(0)
+    net = Agent(6, 7).brain
+    with pytest.warns(RuntimeWarning, match='concordanza'):
+        actor = export_checked(net, 'int8', min_agreement=1.01) # soglia impossibile: nessuna rete esportata passa
+    assert isinstance(actor, DQN) and actor is not net
+    states = torch.rand(64, 6)
+    with torch.no_grad():
+        assert torch.equal(actor(states), net(states))
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+import torch
+from brain import Agent, BallAgent
+from env import VecPongEnv, scripted_paddle_actions
+from rooms import RoomScheduler
+
+
+@pytest.fixture
+def agents():
+    torch.manual_seed(0)
+    return Agent(5, 3, seed=0), BallAgent(6, 7, seed=1)
+
+
+def _weights(tmp_path, count):
+    # count file di pesi diversi per il paddle (stessa architettura)
+    paths = []
+    for i in range(count):
+        torch.manual_seed(100 + i)
+        path = tmp_path / f'paddle_{i}.pth'
+        torch.save(Agent(5, 3).brain.state_dict(), path)
+        paths.append(str(path))
+    return paths
+
+
+def test_removed_rooms_release_their_versions(agents, tmp_path):
+    scheduler = RoomScheduler(*agents, max_rooms=2, capacity=4)
+    bank = scheduler.banks['PADDLE']
+    for i, path in enumerate(_weights(tmp_path, 10)): # più di capacity specifiche diverse, una alla volta
+        scheduler.add_room(f'r{i}', seed=i, paddle=path, ball='straight')
+        scheduler.step()
+        assert scheduler.remove_room(f'r{i}')
+    assert bank.versions == {} and bank.refs == {} and bank.pools == {}
+
+
+def test_shared_spec_is_kept_until_last_room(agents, tmp_path):
+    path, = _weights(tmp_path, 1)
+    scheduler = RoomScheduler(*agents, max_rooms=2, capacity=4)
+    bank = scheduler.banks['PADDLE']
+    scheduler.add_room('a', paddle=path, ball='straight')
+    scheduler.add_room('b', paddle=path, ball='straight')
+    assert bank.refs[path] == 2 and sum(len(p) for p in bank.pools.values()) == 1
+    scheduler.remove_room('a')
+    assert bank.refs[path] == 1
+    scheduler.step() # la stanza rimasta gioca ancora con la sua versione
+    scheduler.remove_room('b')
+    assert path not in bank.versions
+
+
+def test_failed_add_room_does_not_leak_paddle_version(agents, tmp_path):
+    path, = _weights(tmp_path, 1)
+    scheduler = RoomScheduler(*agents, max_rooms=2, capacity=4)
+    with pytest.raises(OSError):
+        scheduler.add_room('bad', paddle=path, ball=str(tmp_path / 'missing.pth'))
+    assert scheduler.rooms == {}
+    assert scheduler.banks['PADDLE'].versions == {} and scheduler.banks['PADDLE'].pools == {}
+
+
+def test_room_plays_like_single_env(agents):
+    # una riga di RoomEnv deve giocare esattamente come VecPongEnv(1, seed) con le stesse politiche
+    agent, ball_agent = agents
+    scheduler = RoomScheduler(agent, ball_agent, max_rooms=4)
+    scheduler.add_room('other', seed=1, paddle='scripted', ball='random')
+    room = scheduler.add_room('room', seed=5)
+    env = VecPongEnv(1, seed=5)
+    obs_p, obs_b = env.reset()
+    with torch.no_grad():
+        for _ in range(3000):
+            scheduler.step()
+            paddle_actions = agent.brain(torch.from_numpy(obs_p)).argmax(1).numpy()
+            ball_actions = ball_agent.brain(torch.from_numpy(obs_b)).argmax(1).numpy()
+            obs_p, obs_b, _, _, _ = env.step(paddle_actions, ball_actions)
+            assert room.game_state['ballX'] == env.ball_x[0] and room.game_state['paddle1Y'] == env.paddle1_y[0]
+    assert env.episode_count[0] > 0 # ci sono stati dei gol (e quindi dei reset)
+    assert [room.game_state['score1'], room.game_state['score2']] == [env.score1[0], env.score2[0]]
@@ -0,0 +1,31 @@
+import os
+import time
+import sweep
+
+
+def fake_trial(trial_id, params, rung_frames, config, out_dir, reports, stop):
+    # prova finta: mette in coda TUTTI i gradini senza aspettare il verdetto (come una prova vera che continua
+    # ad allenarsi), poi aspetta lo stop cooperativo. La prova 1 arriva dopo ed è peggiore: ASHA la ferma
+    if trial_id == 1:
+        time.sleep(1.0)
+    for rung, frames in enumerate(rung_frames):
+        reports.put({'trial': trial_id, 'rung': rung, 'frames': frames, 'seconds': 0.0,
+                     'value': params['value'], 'report': {}})
+    if stop.wait(30):
+        open(os.path.join(out_dir, f'stopped_{trial_id}'), 'w').close()
+
+
+def test_reports_after_stop_are_ignored(tmp_path, monkeypatch):
+    config = sweep.load_config()
+    config.update(trials=2, workers=2, min_frames=1, max_frames=9, reduction_factor=3,
+                  space={}, fixed={})
+    values = iter([0.9, 0.1])
+    monkeypatch.setattr(sweep, 'sample_params', lambda space, fixed, rng: {'value': next(values)})
+    ranked = sweep.run_sweep(config, str(tmp_path), target=fake_trial)
+    results = {r['trial']: r for r in ranked}
+    assert results[0]['status'] == 'completed' and results[0]['rung'] == 2
+    # i gradini 1 e 2 della prova 1 erano già in coda quando è stata fermata
+    assert results[1]['status'] == 'stopped' and results[1]['rung'] == 0
+    assert [h['rung'] for h in results[1]['history']] == [0]
+    # lo stop arriva con l'Event, non con terminate()
+    assert os.path.exists(tmp_path / 'stopped_1')
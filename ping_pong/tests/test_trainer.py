@@ -0,0 +1,55 @@
+import random
+import numpy as np
+import torch
+from brain import Agent, BallAgent
+from checkpoint import save_checkpoint, load_checkpoint
+from trainer import Trainer
+
+
+def _trainer(seed=0, swap_interval=700):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    agent = Agent(5, 3, seed=seed, n_step=3)
+    ball_agent = BallAgent(6, 7, seed=seed + 1, n_step=3)
+    return Trainer(agent, ball_agent, swap_interval, paddle_repeat=2, ball_repeat=4)
+
+
+def _weights(trainer):
+    return [p.detach().clone() for p in list(trainer.agent.brain.parameters()) + list(trainer.ball_agent.brain.parameters())]
+
+
+def test_resume_is_bit_exact_with_action_repeat(tmp_path):
+    # a metà di una decisione ripetuta e con le finestre n-step aperte: il checkpoint deve bastare a ripartire identici
+    straight = _trainer()
+    for _ in range(2000):
+        straight.step()
+
+    first = _trainer()
+    for _ in range(1037):
+        first.step()
+    save_checkpoint(str(tmp_path), first)
+    resumed = _trainer(seed=99) # semi diversi: tutto deve arrivare dal checkpoint
+    load_checkpoint(str(tmp_path), resumed)
+    for _ in range(2000 - 1037):
+        resumed.step()
+
+    assert resumed.frame_count == straight.frame_count
+    assert all(torch.equal(a, b) for a, b in zip(_weights(straight), _weights(resumed)))
+
+
+def test_every_goal_closes_a_ball_transition():
+    # con ball_repeat > 1 anche una decisione a metà si chiude al gol, con done=True (niente ritorni oltre il reset)
+    trainer = _trainer(swap_interval=100000)
+    trainer.turn = 1 # impara la palla per tutto il test
+    closed = []
+    learn = trainer._learn
+
+    def spy(agent, *args):
+        if agent is trainer.ball_agent and args[-1]:
+            closed.append(trainer.frame_count)
+        return learn(agent, *args)
+
+    trainer._learn = spy
+    goals = [trainer.frame_count for _ in range(5000) if trainer.step()]
+    assert goals and closed == goals
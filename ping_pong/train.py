@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import random
+import signal
+import time
+import numpy as np
+import torch
+from brain import Agent, BallAgent, NETWORKS
+from learner import Learner
+from trainer import Trainer
+from actor_pool import train_with_pool, TRANSPORTS
+from checkpoint import save_checkpoint, load_checkpoint
+from profiling import Profiler
+from backends import BACKENDS
+from exploration import Exploration, LadderSchedule, parse_schedule
+from inference import INFERENCE_MODES
+from recorder import Recorder
+from pretrain import load_pretrained
+from league import League, EVICTIONS, WEIGHTINGS
+
+# Training HEADLESS da riga di comando: stessa simulazione e stesso addestramento del server
+# ma senza Flask, senza socket emit e senza sleep. Pensato per girare sui nodi di calcolo.
+#
+#   python train.py --frames 2000000 --swap-interval 10000 --seed 0 --out-dir runs/prova
+#   python train.py --frames 50000000 --actors 31 --envs-per-actor 32   # raccolta dati multi-processo
+#   python train.py --frames 5000000 --checkpoint-every 100000 --resume runs/prova/checkpoint
+#   python train.py --paddle-epsilon linear:1.0,0.05,500000 --ball-epsilon piecewise:0=1.0,100000=0.2,1000000=0.02
+#   python train.py --n-step 5   # ritorni a 5 passi: gol e colpi arrivano prima agli stati che li hanno causati
+#   python train.py --paddle-repeat 4 --ball-repeat 4   # ogni agente decide ogni 4 frame: 4 volte meno reti, memoria e Adam
+#   python train.py --pretrained runs/pretrain --paddle-epsilon linear:0.2,0.05,200000   # parte dai pesi di pretrain.py
+#   python train.py --league 16 --league-weighting hard   # avversari pescati dalle versioni passate dell'altro agente
+#   python train.py --record runs/prova/trajectory   # ogni frame su disco per controllare le reward (vedi recorder.py)
+#   python train.py --paddle-network dueling_ln --ball-network wide --inference script
+#   python train.py --actors 8 --paddle-epsilon ladder --ball-epsilon ladder:0.4,7   # epsilon fisso per partita (Ape-X)
+#
+# Checkpoint su richiesta: kill -USR1 <pid>. Con SIGTERM (nodo preemptible) salva ed esce.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Training headless di Pong AI (senza server web)")
+    parser.add_argument('--frames', type=int, default=1000000, help="frame totali da simulare")
+    parser.add_argument('--swap-interval', type=int, default=10000, help="ogni quanti frame cambia chi impara")
+    parser.add_argument('--seed', type=int, default=0, help="seed per random, NumPy e PyTorch")
+    parser.add_argument('--out-dir', default='runs', help="cartella dove salvare pesi e statistiche")
+    parser.add_argument('--async-learner', action='store_true', help="addestramento in un thread separato")
+    parser.add_argument('--actors', type=int, default=0, help="processi worker per la raccolta dati (0 = un solo game loop)")
+    parser.add_argument('--envs-per-actor', type=int, default=16, help="partite giocate in parallelo da ogni worker")
+    parser.add_argument('--transport', default='shm', choices=TRANSPORTS,
+                        help="come arrivano esperienze e pesi dai worker: memoria condivisa o multiprocessing.Queue")
+    parser.add_argument('--drop-when-full', action='store_true',
+                        help="con --transport shm i worker scartano le esperienze invece di aspettare se l'anello è pieno")
+    parser.add_argument('--prioritized', action='store_true', help="memoria con priorità")
+    parser.add_argument('--log-every', type=float, default=5.0, help="secondi tra una stampa e l'altra")
+    parser.add_argument('--checkpoint-every', type=int, default=0, help="ogni quanti frame salvare un checkpoint (0 = mai)")
+    parser.add_argument('--resume', default=None, help="cartella di un checkpoint da cui riprendere")
+    parser.add_argument('--backend', default='python', choices=sorted(BACKENDS), help="implementazione di fisica e reward")
+    parser.add_argument('--profile', action='store_true', help="misura i tempi di ogni fase del frame (p50/p95/p99)")
+    parser.add_argument('--stats-file', default=None, help="file JSON dove salvare tempi e contatori ad ogni log")
+    parser.add_argument('--paddle-epsilon', default=None, help="schedule di epsilon del paddle, es. linear:1.0,0.05,500000 (vedi exploration.py)")
+    parser.add_argument('--ball-epsilon', default=None, help="schedule di epsilon della palla, es. exp:1.0,0.05,0.99999")
+    parser.add_argument('--epsilon-clock', default='steps', choices=['steps', 'updates'],
+                        help="le schedule avanzano con i frame giocati dall'agente o con i suoi passi di addestramento")
+    parser.add_argument('--paddle-network', default='default', choices=sorted(NETWORKS), help="architettura della rete del paddle")
+    parser.add_argument('--ball-network', default='default', choices=sorted(NETWORKS), help="architettura della rete della palla")
+    parser.add_argument('--n-step', type=int, default=1, help="ritorni a n passi per entrambi gli agenti (1 = classico)")
+    parser.add_argument('--paddle-repeat', type=int, default=1, help="il paddle decide ogni k frame e ripete l'azione nel mezzo")
+    parser.add_argument('--ball-repeat', type=int, default=1, help="la palla decide ogni k frame e ripete l'azione nel mezzo")
+    parser.add_argument('--league', type=int, default=0, help="versioni passate tenute per agente come avversari (0 = niente lega)")
+    parser.add_argument('--league-eviction', default='oldest', choices=EVICTIONS, help="quale versione esce quando il pool è pieno")
+    parser.add_argument('--league-weighting', default='hard', choices=WEIGHTINGS, help="come pesare gli avversari in base alle vittorie")
+    parser.add_argument('--league-opponent-prob', type=float, default=0.5, help="probabilità di giocare contro una versione passata")
+    parser.add_argument('--pretrained', default=None, help="cartella con paddle.pth/ball.pth da cui partire (vedi pretrain.py)")
+    parser.add_argument('--record', default=None, help="cartella dove registrare stato, azioni e reward di ogni frame")
+    parser.add_argument('--record-compress', action='store_true', help="blocchi compressi (più piccoli, ma niente mmap in lettura)")
+    parser.add_argument('--record-chunk', type=int, default=65536, help="frame per blocco della registrazione")
+    parser.add_argument('--inference', default='float', choices=INFERENCE_MODES,
+                        help="rete usata per giocare: float, TorchScript congelato o int8 (vedi inference.py)")
+    return parser.parse_args(argv)
+
+
+def make_exploration(spec, clock, num_actors):
+    # None = default del Trainer (epsilon *= 0.999999 sui frame dell'agente)
+    if spec is None:
+        return None
+    return Exploration(parse_schedule(spec, num_actors), clock)
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    seed_everything(args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    # con gli attori a giocare sono i worker: la rete esportata serve solo a loro
+    inference = args.inference if args.actors == 0 else 'float'
+    agent = Agent(5, 3, prioritized=args.prioritized, seed=args.seed, network=args.paddle_network, inference=inference,
+                  n_step=args.n_step)
+    ball_agent = BallAgent(6, 7, prioritized=args.prioritized, seed=args.seed + 1, network=args.ball_network,
+                           inference=inference, n_step=args.n_step)
+    if args.pretrained:
+        # un checkpoint (--resume) ha la precedenza: viene caricato dopo e sovrascrive i pesi
+        load_pretrained(agent, args.pretrained, 'paddle')
+        load_pretrained(ball_agent, args.pretrained, 'ball')
+        print(f"🎓 Pesi pre-addestrati da {args.pretrained}")
+
+    league = League(agent, ball_agent, args.league, args.league_eviction, args.league_weighting,
+                    args.league_opponent_prob, seed=args.seed) if args.league > 0 else None
+
+    # con gli attori ogni partita di ogni worker ha la sua riga di epsilon (serve alla LadderSchedule)
+    num_actors = args.actors * args.envs_per_actor if args.actors > 0 else 1
+    paddle_exploration = make_exploration(args.paddle_epsilon, args.epsilon_clock, num_actors)
+    ball_exploration = make_exploration(args.ball_epsilon, args.epsilon_clock, num_actors)
+    for exploration in (paddle_exploration, ball_exploration):
+        if args.actors == 0 and exploration is not None and isinstance(exploration.schedule, LadderSchedule):
+            raise SystemExit("❌ La schedule 'ladder' serve solo con --actors (un epsilon per partita)")
+    if args.actors > 0 and (args.paddle_repeat > 1 or args.ball_repeat > 1):
+        raise SystemExit("❌ --paddle-repeat / --ball-repeat valgono solo per il game loop singolo (senza --actors)")
+    if args.actors > 0 and args.record:
+        raise SystemExit("❌ --record registra il game loop singolo (senza --actors)")
+
+    print(f"🏓 Training headless: {args.frames} frame, swap ogni {args.swap_interval}, seed {args.seed}")
+    start = time.time()
+
+    if args.actors > 0:
+        frames, _ = train_with_pool(agent, ball_agent, args.frames, num_workers=args.actors,
+                                    envs_per_worker=args.envs_per_actor, swap_interval=args.swap_interval,
+                                    seed=args.seed, paddle_exploration=paddle_exploration,
+                                    ball_exploration=ball_exploration, inference=args.inference,
+                                    transport=args.transport, drop_when_full=args.drop_when_full, league=league)
+        summary = {'frames': frames}
+    else:
+        profiler = Profiler(enabled=args.profile)
+        recorder = Recorder(args.record, args.record_chunk, args.record_compress) if args.record else None
+        trainer = Trainer(agent, ball_agent, args.swap_interval, profiler=profiler, backend=args.backend,
+                          paddle_exploration=paddle_exploration, ball_exploration=ball_exploration,
+                          paddle_repeat=args.paddle_repeat, ball_repeat=args.ball_repeat, recorder=recorder,
+                          league=league)
+        if args.resume:
+            load_checkpoint(args.resume, trainer)
+            print(f"♻️  Ripreso da {args.resume} al frame {trainer.frame_count} (ε: {trainer.epsilon:.3f})")
+        # i learner li creo dopo il caricamento così partono dai pesi del checkpoint
+        paddle_learner = Learner(agent, profiler=profiler, stage='train_step.paddle').start() if args.async_learner else None
+        ball_learner = Learner(ball_agent, profiler=profiler, stage='train_step.ball').start() if args.async_learner else None
+        trainer.paddle_learner = paddle_learner
+        trainer.ball_learner = ball_learner
+        game_state = trainer.game_state
+
+        checkpoint_dir = os.path.join(args.out_dir, 'checkpoint')
+        requests = {'save': False, 'stop': False}
+        signal.signal(signal.SIGUSR1, lambda *_: requests.update(save=True))
+        signal.signal(signal.SIGTERM, lambda *_: requests.update(save=True, stop=True))
+
+        last_log = time.time()
+        last_frames = trainer.frame_count
+        try:
+            while trainer.frame_count < args.frames:
+                trainer.step()
+
+                # salvo solo tra un frame e l'altro, mai a metà
+                if args.checkpoint_every and trainer.frame_count % args.checkpoint_every == 0:
+                    requests['save'] = True
+                if requests['save']:
+                    save_checkpoint(checkpoint_dir, trainer)
+                    if recorder is not None:
+                        recorder.flush() # la registrazione arriva almeno fino al checkpoint
+                    print(f"💾 Checkpoint al frame {trainer.frame_count} -> {checkpoint_dir}")
+                    requests['save'] = False
+                    if requests['stop']:
+                        break
+
+                if time.time() - last_log >= args.log_every:
+                    fps = (trainer.frame_count - last_frames) / (time.time() - last_log)
+                    print(f"📊 FPS: {fps:.0f} | Frame: {trainer.frame_count} | Episode: {trainer.episode_count} | "
+                          f"Score: {game_state['score1']}-{game_state['score2']} | ε: {trainer.epsilon:.3f}")
+                    if args.stats_file:
+                        stats = profiler.snapshot()
+                        stats.update(trainer.stats())
+                        stats['fps'] = fps
+                        Profiler.dump(args.stats_file, stats)
+                    last_log = time.time()
+                    last_frames = trainer.frame_count
+        finally:
+            if args.async_learner:
+                paddle_learner.stop()
+                ball_learner.stop()
+            if recorder is not None:
+                recorder.close()
+
+        summary = {
+            'frames': trainer.frame_count,
+            'episodes': trainer.episode_count,
+            'score1': game_state['score1'],
+            'score2': game_state['score2'],
+            'epsilon': trainer.stats()['epsilon'],
+        }
+        if recorder is not None:
+            summary['recorder'] = recorder.stats()
+            print(f"📼 Registrati {recorder.frames} frame in {len(recorder.chunks)} blocchi -> {args.record} (persi: {recorder.dropped})")
+        if args.profile:
+            summary['stages'] = profiler.snapshot()['stages']
+
+    elapsed = time.time() - start
+    if league is not None:
+        summary['league'] = league.stats() # versioni nel pool con partite giocate e vittorie di chi impara contro di loro
+        print(f"🏆 Lega: {len(league.pools['PADDLE'])} versioni del paddle, {len(league.pools['BALL'])} della palla")
+    summary.update({'seconds': elapsed, 'fps': summary['frames'] / elapsed, 'args': vars(args)})
+
+    torch.save(agent.brain.state_dict(), os.path.join(args.out_dir, 'paddle.pth'))
+    torch.save(ball_agent.brain.state_dict(), os.path.join(args.out_dir, 'ball.pth'))
+    with open(os.path.join(args.out_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ Fatto in {elapsed:.0f}s ({summary['fps']:.0f} FPS) -> {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+from contextlib import nullcontext
+import torch
+from game import new_game_state, get_state_array_paddle, get_state_array_ball
+from backends import get_backend
+from profiling import Profiler
+from exploration import Exploration, ExponentialSchedule
+from nstep import NStepBuffer
+from league import LATEST, learner_won
+
+# Un frame di gioco + addestramento, senza niente di Flask: lo usano sia il game loop del server (app.py)
+# sia il training headless da riga di comando (train.py)
+
+class Trainer:
+    def __init__(self, agent, ball_agent, swap_interval=10000,
+                 epsilon=1.0, epsilon_min=0.05, epsilon_decay=0.999999,
+                 paddle_learner=None, ball_learner=None, profiler=None, backend='python',
+                 paddle_exploration=None, ball_exploration=None, paddle_repeat=1, ball_repeat=1,
+                 recorder=None, league=None):
+        self.agent = agent
+        self.ball_agent = ball_agent
+        self.paddle_learner = paddle_learner # se presenti l'addestramento lo fanno i learner in background
+        self.ball_learner = ball_learner
+        self.swap_interval = swap_interval # ogni quanti frame cambia chi impara
+        self.backend = get_backend(backend) # fisica e reward: 'python' (game.py) o 'fused' (game_fused.py)
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False) # tempi per fase (spento = costo ~0)
+        self.recorder = recorder # se presente registra ogni frame su disco (vedi recorder.py)
+        # lega di avversari (vedi league.py): a fine turno i pesi di chi ha imparato vanno nel pool e chi impara
+        # gioca ogni punto contro una versione vecchia dell'altro (opponent) oppure contro quella attuale (LATEST)
+        self.league = league
+        self.opponent = LATEST
+
+        # Parametri Apprendimento: ogni agente ha la sua esplorazione (vedi exploration.py)
+        # di default la vecchia decrescita epsilon *= epsilon_decay, ma contata solo sui frame in cui l'agente impara
+        self.paddle_exploration = paddle_exploration or Exploration(ExponentialSchedule(epsilon, epsilon_min, epsilon_decay))
+        self.ball_exploration = ball_exploration or Exploration(ExponentialSchedule(epsilon, epsilon_min, epsilon_decay))
+        # ritorni a n passi tra il gioco e la memoria (solo per gli agenti con n_step > 1)
+        self.paddle_nstep = NStepBuffer(agent.n_step, agent.gamma, 1, 5) if agent.n_step > 1 else None
+        self.ball_nstep = NStepBuffer(ball_agent.n_step, ball_agent.gamma, 1, 6) if ball_agent.n_step > 1 else None
+
+        # Statistiche
+        self.game_state = new_game_state()
+        self.frame_count = 0
+        self.episode_count = 0
+        self.turn = 0 # mi serve per capire di chi è il turno di imparare
+        self.frames_by_mode = {'PADDLE': 0, 'BALL': 0} # frame giocati in ciascuna modalità (training_who)
+        self.state = get_state_array_paddle(self.game_state)
+
+        # action repeat: ogni agente decide ogni k frame e ripete l'azione nel mezzo; le reward dei k frame
+        # finiscono sommate in una sola esperienza (che si chiude prima se arriva un gol).
+        # Con k = 4 le chiamate alla rete, gli inserimenti in memoria e i passi di Adam sono 4 volte di meno
+        self.paddle_repeat = paddle_repeat
+        self.ball_repeat = ball_repeat
+        # decisione in corso: azione, frame che mancano, stato in cui è stata presa, reward sommate finora
+        self.paddle_option = {'action': None, 'left': 0, 'state': None, 'reward': 0}
+        self.ball_option = {'action': None, 'left': 0, 'state': None, 'reward': 0}
+
+    def step(self):
+        game_state = self.game_state
+        prof = self.profiler
+        backend = self.backend
+        self.frame_count += 1
+
+        if self.frame_count % self.swap_interval == 0:
+            # chi smette di imparare svuota la sua finestra a n passi (bootstrap dall'ultimo stato visto)
+            if self.turn % 2 == 0:
+                self._flush(self.agent, self.paddle_learner, self.paddle_nstep)
+            else:
+                self._flush(self.ball_agent, self.ball_learner, self.ball_nstep)
+            if self.league is not None:
+                finished, learner = ((self.agent, self.paddle_learner) if self.turn % 2 == 0
+                                     else (self.ball_agent, self.ball_learner))
+                # con il learner in background lo fermo tra un aggiornamento e l'altro: niente pesi a metà
+                with learner.paused() if learner is not None else nullcontext():
+                    self.league.snapshot(self.learner_who, finished.brain, self.frame_count)
+            self.turn += 1
+            if self.league is not None:
+                self.opponent = self.league.opponents(self.learner_who)[0]
+            # le decisioni a metà ripetizione si perdono: al prossimo frame entrambi decidono da capo
+            self.paddle_option['left'] = self.ball_option['left'] = 0
+        paddle_learns = self.turn % 2 == 0
+
+        t = prof.now()
+        option = self.paddle_option
+        if option['left'] == 0:
+            if paddle_learns:
+                # è il turno del paddle AI di imparare
+                # azione che AI ha scelto di compiere a partire da questo stato
+                action = self.agent.get_action(self.state, self.paddle_exploration.value(self.agent))
+                self.paddle_exploration.tick()
+            else:
+                # è il turno della palla AI di imparare
+                action = self._opponent_action(self.agent, 'PADDLE', self.state)
+            option.update(action=action, left=self.paddle_repeat, state=self.state, reward=0)
+        action = option['action']
+        option['left'] -= 1
+        t = prof.lap('action.paddle', t)
+
+        # azione per essere compiuta ha bisogno che venga applicata la fisica
+        # la palla sceglie la sua accelerazione dopo essersi spostata in orizzontale
+        backend.move_ball_x(game_state)
+        t = prof.lap('physics.move_x', t)
+        ball_option = self.ball_option
+        if ball_option['left'] == 0:
+            state_ball = get_state_array_ball(game_state)
+            if not paddle_learns:
+                action_ball = self.ball_agent.get_action(state_ball, self.ball_exploration.value(self.ball_agent))
+                self.ball_exploration.tick()
+            else:
+                action_ball = self._opponent_action(self.ball_agent, 'BALL', state_ball)
+            ball_option.update(action=action_ball, left=self.ball_repeat, state=state_ball, reward=0)
+        action_ball = ball_option['action']
+        ball_option['left'] -= 1
+        t = prof.lap('action.ball', t)
+        backend.steer_ball(game_state, action_ball)
+        t = prof.lap('physics.steer', t)
+
+        reward_ball = None
+        if not paddle_learns:
+            # a questo punto ho bisogno di calcolare la ricompensa per la palla in base alla sua nuova posizione
+            new_state_ball = get_state_array_ball(game_state)
+            reward_ball, done_ball = backend.calculate_reward_ball(game_state, action_ball)
+            prof.lap('reward.ball', t)
+            ball_option['reward'] += reward_ball
+            t = prof.now()
+
+        backend.physics(game_state, action)
+        t = prof.lap('physics', t)
+
+        # dallo stato iniziale se eseguo un azione arrivo a un new_state
+        new_state = get_state_array_paddle(game_state)
+
+        # calcolo le ricomepense che ho ricevuto nel passaggio al nuovo stato
+        conceded = game_state['score2']
+        reward_value, done = backend.calculate_reward(game_state)
+        prof.lap('reward.paddle', t)
+
+        if paddle_learns:
+            # imparo che dallo stato iniziale se svolgo una determinata azione arrivo ad uno stato nuovo e ricevo una certa ricompensa
+            # imparo anche se questa azione ha portato alla fine dell'episodio
+            option['reward'] += reward_value
+            if option['left'] == 0 or done:
+                self._learn(self.agent, self.paddle_learner, self.paddle_nstep, 'train_step.paddle',
+                            option['state'], action, option['reward'], new_state, done)
+        elif ball_option['left'] == 0 or done_ball or done:
+            # la palla impara dopo la reward del paddle: un gol chiude anche la sua esperienza (e la sua finestra
+            # n-step non scavalca il reset), come in actor_pool dove done vale per entrambi.
+            # Dopo un gol lo stato successivo è quello della palla rimessa al centro (come in VecPongEnv)
+            if done:
+                new_state_ball = get_state_array_ball(game_state)
+            self._learn(self.ball_agent, self.ball_learner, self.ball_nstep, 'train_step.ball',
+                        ball_option['state'], action_ball, ball_option['reward'], new_state_ball, done_ball or done)
+            ball_option['left'] = 0
+
+        if done:
+            # la partita è stata resettata: riparto dallo stato nuovo e non da quello prima del gol
+            self.episode_count += 1
+            new_state = get_state_array_paddle(game_state)
+            option['left'] = ball_option['left'] = 0 # dopo il gol entrambi decidono da capo
+            if self.league is not None:
+                # risultato del punto contro la versione avversaria, poi nuovo avversario per il punto dopo
+                goal_left = game_state['score2'] > conceded
+                self.league.record(self.learner_who, [self.opponent], learner_won(self.learner_who, [goal_left]))
+                self.opponent = self.league.opponents(self.learner_who)[0]
+
+        # visto che deve ripartire da capo il loop setto lo state = new_state
+        self.state = new_state
+
+        game_state['training_who'] = 'PADDLE' if paddle_learns else 'BALL'
+        self.frames_by_mode[game_state['training_who']] += 1
+
+        if self.recorder is not None:
+            t = prof.now()
+            self.recorder.record(self.frame_count, game_state, action, action_ball, reward_value, reward_ball, done)
+            prof.lap('record', t)
+
+        return done
+
+    @property
+    def learner_who(self):
+        return 'PADDLE' if self.turn % 2 == 0 else 'BALL'
+
+    def _opponent_action(self, agent, who, state):
+        # chi non impara gioca senza esplorare: con la versione attuale oppure con quella scelta dalla lega
+        if self.opponent == LATEST:
+            return agent.predict_action(state)
+        net = self.league.pools[who].network(self.opponent)
+        with torch.no_grad():
+            return net(torch.FloatTensor(state).unsqueeze(0)).argmax().item()
+
+    @property
+    def epsilon(self):
+        # epsilon attuale di chi sta imparando (per stampe e statistiche)
+        if self.turn % 2 == 0:
+            return self.paddle_exploration.value(self.agent)
+        return self.ball_exploration.value(self.ball_agent)
+
+    def _learn(self, agent, learner, nstep, stage, state, action, reward, next_state, done):
+        prof = self.profiler
+        t = prof.now()
+        if nstep is not None:
+            # l'esperienza entra nella finestra ed esce quella di n frame fa con il ritorno a n passi
+            out = nstep.add([state], [action], [reward], [next_state], [done])
+            if out is not None:
+                self._remember(agent, learner, out)
+        elif learner is not None:
+            learner.remember(state, action, reward, next_state, done)
+        else:
+            agent.remember(state, action, reward, next_state, done)
+        t = prof.lap('replay_insert', t)
+        if learner is not None:
+            # l'addestramento lo fa il learner in background, il game loop non aspetta i passi di Adam
+            return
+        # se ho memorizzato abbastanza informazioni da permettermi di fare un batch allora utilizzo queste informazioni per apprendere
+        if len(agent.memory) >= agent.batch_size:
+            agent.train_step()
+            prof.lap(stage, t)
+
+    def _remember(self, agent, learner, transitions):
+        target = learner if learner is not None else agent
+        for state, action, reward, next_state, done, discount in zip(*transitions):
+            target.remember(state, action, reward, next_state, done, discount)
+
+    def _flush(self, agent, learner, nstep):
+        if nstep is not None:
+            out = nstep.flush()
+            if out is not None:
+                self._remember(agent, learner, out)
+
+    def stats(self):
+        # contatori per la pagina /stats e per i dump periodici (i tempi per fase li ha il profiler)
+        stats = {
+            'frames': self.frame_count,
+            'episodes': self.episode_count,
+            'frames_by_mode': dict(self.frames_by_mode),
+            'training_who': self.game_state.get('training_who'),
+            'epsilon': {'paddle': self.paddle_exploration.value(self.agent),
+                        'ball': self.ball_exploration.value(self.ball_agent)},
+            'gradient_steps': {'paddle': self.agent.learn_steps, 'ball': self.ball_agent.learn_steps},
+            'replay_size': {'paddle': len(self.agent.memory), 'ball': len(self.ball_agent.memory)},
+        }
+        if self.recorder is not None:
+            stats['recorder'] = self.recorder.stats()
+        if self.league is not None:
+            stats['league'] = self.league.stats()
+            stats['opponent'] = int(self.opponent)
+        return stats
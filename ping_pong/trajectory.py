@@ -0,0 +1,41 @@
+import numpy as np
+
+# Predizione della traiettoria della palla in forma chiusa.
+# Una palla che rimbalza tra 0 e height si muove come un'onda triangolare di periodo 2*height:
+# invece di ribaltare la y finché non rientra nel campo (un giro del while per ogni rimbalzo) basta
+#   y = y mod 2*height      e poi      y = 2*height - y se y > height
+# Costo costante qualunque sia la distanza, e la stessa formula funziona su array NumPy.
+# Non importa game.py (che usa queste funzioni): le dimensioni del campo si passano come argomento.
+
+NO_ARRIVAL_FRAMES = 999 # se la palla non si muove in orizzontale non arriva mai: uso un orizzonte fisso
+
+
+def reflect(y, height):
+    # rimbalzi sui muri 0 e height di una y "libera" (calcolata come se i muri non ci fossero)
+    y = y % (2 * height)
+    return 2 * height - y if y > height else y
+
+
+def reflect_array(y, height):
+    # versione vettoriale di reflect()
+    y = np.mod(np.asarray(y, dtype=np.float64), 2 * height)
+    return np.where(y > height, 2 * height - y, y)
+
+
+def frames_to_arrival(ball_x, ball_vx, target_x):
+    # frame che mancano perché la palla arrivi alla x target_x
+    return abs(ball_x - target_x) / abs(ball_vx) if ball_vx != 0 else NO_ARRIVAL_FRAMES
+
+
+def frames_to_arrival_array(ball_x, ball_vx, target_x):
+    moving = ball_vx != 0
+    return np.where(moving, np.abs(ball_x - target_x) / np.where(moving, np.abs(ball_vx), 1.0), float(NO_ARRIVAL_FRAMES))
+
+
+def predict_y(ball_y, ball_vy, frames, height):
+    # y della palla tra frames frame supponendo velocità verticale costante
+    return reflect(ball_y + ball_vy * frames, height)
+
+
+def predict_y_array(ball_y, ball_vy, frames, height):
+    return reflect_array(ball_y + ball_vy * frames, height)